@@ -19,7 +19,7 @@ import base64
 import io
 
 # 导入基础系统组件
-from jichuxitong import ConfigManager, CacheManager, ErrorHandler, FactorAnalysisError, DataProcessingError, exception_handler, cache_result
+from jichuxitong import ConfigManager, CacheManager, ErrorHandler, FactorAnalysisError, DataProcessingError, exception_handler, cache_result, data_fingerprint
 import multiprocessing as mp
 from functools import partial
 import hashlib
@@ -216,7 +216,7 @@ class ReportGenerator:
             raise AnalysisError(f"不支持的报告格式: {format}")
         
         # 尝试从缓存加载
-        cache_key = f"factor_analysis_report_{format}_{hash(str(factor_data))}_{hash(str(return_data))}"
+        cache_key = f"factor_analysis_report_{format}_{data_fingerprint(factor_data, return_data)}"
         cached_result = self.cache.get(cache_key)
         if cached_result is not None:
             logging.info(f"从缓存加载{format}格式的因子分析报告")
@@ -16,16 +16,21 @@ from typing import Dict, List, Any, Optional, Callable, Union, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 from datetime import datetime
+from collections import OrderedDict
 import queue
+import asyncio
+import multiprocessing
+import multiprocessing.connection
 from concurrent.futures import ThreadPoolExecutor, Future, as_completed
 import networkx as nx
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import hashlib
+import heapq
 import inspect
 import traceback
-from functools import wraps
+from functools import partial, wraps
 import weakref
 
 # ==================== 配置管理系统 ====================
@@ -255,6 +260,14 @@ class ConfigurationError(FactorAnalysisError):
     """配置异常"""
     pass
 
+class TaskCancelledError(FactorAnalysisError):
+    """任务在执行中被取消"""
+    pass
+
+class UnfingerprintableError(FactorAnalysisError):
+    """对象没有可读取的内容状态（如锁、文件句柄），无法计算指纹，不能作为缓存键的一部分"""
+    pass
+
 class RetryStrategy:
     """重试策略"""
     
@@ -458,41 +471,209 @@ def exception_handler(error_handler: ErrorHandler = None):
 
 # ==================== 缓存系统 ====================
 
+# 可以直接按内存字节计算指纹的numpy类型：布尔、整数、浮点、复数、时间差、日期时间
+_BUFFER_DTYPE_KINDS = frozenset('biufcmM')
+
+def _update_array_fingerprint(hasher, values):
+    """把一维数组/Series/Index的值写入指纹：数值类型直接使用内存缓冲区，其他类型使用pandas的稳定逐元素哈希"""
+    hasher.update(f"{values.dtype}:".encode())
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind in _BUFFER_DTYPE_KINDS:
+        hasher.update(np.ascontiguousarray(values).view(np.uint8).data)
+    else:
+        if isinstance(values, np.ndarray):
+            values = pd.Series(values, copy=False)
+        hashed = pd.util.hash_pandas_object(values, index=False)
+        hasher.update(np.ascontiguousarray(hashed).data)
+
+def _update_fingerprint(hasher, obj, seen):
+    """按对象类型把内容逐块写入哈希对象；每个块前写入类型标记，避免不同结构产生相同的字节序列"""
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        hasher.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, np.generic):
+        hasher.update(f"np:{obj.dtype.str}:".encode())
+        hasher.update(obj.tobytes())
+    elif isinstance(obj, pd.DataFrame):
+        hasher.update(f"df:{obj.shape}:".encode())
+        _update_fingerprint(hasher, obj.index, seen)
+        # 逐列写入，不拼接整个数据缓冲区
+        for name, column in obj.items():
+            _update_fingerprint(hasher, name, seen)
+            _update_array_fingerprint(hasher, column)
+    elif isinstance(obj, pd.Series):
+        hasher.update(f"series:{len(obj)}:".encode())
+        _update_fingerprint(hasher, obj.name, seen)
+        _update_fingerprint(hasher, obj.index, seen)
+        _update_array_fingerprint(hasher, obj)
+    elif isinstance(obj, pd.RangeIndex):
+        hasher.update(f"range:{obj.start}:{obj.stop}:{obj.step}:".encode())
+        _update_fingerprint(hasher, obj.name, seen)
+    elif isinstance(obj, pd.Index):
+        hasher.update(f"index:{len(obj)}:".encode())
+        _update_fingerprint(hasher, list(obj.names), seen)
+        _update_array_fingerprint(hasher, obj)
+    elif isinstance(obj, np.ndarray):
+        hasher.update(f"ndarray:{obj.shape}:".encode())
+        _update_array_fingerprint(hasher, obj.reshape(-1))
+    elif id(obj) in seen:
+        hasher.update(b"cycle;")
+    else:
+        seen.add(id(obj))
+        if isinstance(obj, dict):
+            # 与json.dumps(sort_keys=True)一样与插入顺序无关
+            items = sorted((data_fingerprint(key), value) for key, value in obj.items())
+            hasher.update(f"dict:{len(items)}:".encode())
+            for key_digest, value in items:
+                hasher.update(key_digest.encode())
+                _update_fingerprint(hasher, value, seen)
+        elif isinstance(obj, (list, tuple)):
+            hasher.update(f"{type(obj).__name__}:{len(obj)}:".encode())
+            for item in obj:
+                _update_fingerprint(hasher, item, seen)
+        elif isinstance(obj, (set, frozenset)):
+            hasher.update(f"set:{len(obj)}:".encode())
+            for item_digest in sorted(data_fingerprint(item) for item in obj):
+                hasher.update(item_digest.encode())
+        elif isinstance(obj, partial):
+            hasher.update(b"partial:")
+            _update_fingerprint(hasher, (obj.func, obj.args, obj.keywords), seen)
+        elif inspect.ismodule(obj):
+            hasher.update(f"module:{obj.__name__};".encode())
+        elif inspect.ismethod(obj):
+            # 绑定方法还要区分所绑定的对象，否则不同实例的同一方法得到相同的键
+            hasher.update(b"method:")
+            _update_fingerprint(hasher, obj.__func__, seen)
+            _update_fingerprint(hasher, obj.__self__, seen)
+        elif callable(obj) and hasattr(obj, '__qualname__'):
+            # 函数按模块和限定名区分；匿名函数等同名函数再加上字节码和常量，闭包再加上捕获的变量值
+            hasher.update(f"callable:{getattr(obj, '__module__', '')}.{obj.__qualname__}:".encode())
+            code = getattr(obj, '__code__', None)
+            if code is not None:
+                hasher.update(code.co_code)
+                _update_fingerprint(hasher, tuple(c for c in code.co_consts if not hasattr(c, 'co_code')), seen)
+            for cell in getattr(obj, '__closure__', None) or ():
+                try:
+                    contents = cell.cell_contents
+                except ValueError:
+                    hasher.update(b"empty-cell;")
+                    continue
+                _update_fingerprint(hasher, contents, seen)
+            bound = getattr(obj, '__self__', None)
+            if bound is not None and not inspect.ismodule(bound):
+                # 内置类型的绑定方法（如list.append）
+                _update_fingerprint(hasher, bound, seen)
+        elif hasattr(obj, 'get_params'):
+            hasher.update(f"params:{type(obj).__module__}.{type(obj).__qualname__}:".encode())
+            _update_fingerprint(hasher, obj.get_params(), seen)
+        else:
+            # 其他对象按pickle协议导出的状态计算：普通对象即__dict__，也覆盖__slots__类和
+            # np.random.Generator、pd.Timestamp等状态不在__dict__中的扩展类型；
+            # 不使用repr，默认repr只含内存地址，不同内容的对象会得到相同或随地址变化的键
+            try:
+                reduced = obj.__reduce_ex__(4)
+            except Exception as e:
+                raise UnfingerprintableError(
+                    f"无法计算{type(obj).__module__}.{type(obj).__qualname__}对象的指纹: {e}") from e
+            hasher.update(f"reduce:{type(obj).__module__}.{type(obj).__qualname__}:".encode())
+            if isinstance(reduced, str):
+                # 模块级单例按名称导出
+                _update_fingerprint(hasher, reduced, seen)
+            else:
+                # 第4、5项是列表/字典子类元素的迭代器
+                _update_fingerprint(hasher, tuple(list(item) if i >= 3 and item is not None else item
+                                                  for i, item in enumerate(reduced)), seen)
+
+def data_fingerprint(*objs) -> str:
+    """计算对象内容的稳定指纹，用于缓存键
+    
+    DataFrame按形状、索引、列名、列类型和逐列数据缓冲区计算，不把整个数据转换为字符串；
+    容器、函数和带get_params的对象递归计算，其他对象按__dict__或pickle协议导出的状态计算。
+    结果与进程无关（不使用加盐的内置hash），重启后仍能命中磁盘缓存。
+    对象没有可读取的状态时抛出UnfingerprintableError，不会退回到内存地址。
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    seen = set()
+    for obj in objs:
+        _update_fingerprint(hasher, obj, seen)
+    return hasher.hexdigest()
+
+def fingerprint_key(prefix: str, *objs) -> Optional[str]:
+    """生成"前缀_指纹"形式的缓存键；对象无法计算指纹时返回None，CacheManager对None键不读写缓存"""
+    try:
+        return f"{prefix}_{data_fingerprint(*objs)}"
+    except UnfingerprintableError as e:
+        logging.debug(f"{prefix}: 参数无法计算指纹，不使用缓存: {e}")
+        return None
+
+class _CacheSentinel(Enum):
+    """缓存中代表特殊值的标记；枚举成员经pickle往返后仍是同一个对象，可以保存到磁盘缓存"""
+    NONE = "none"
+
+# 函数返回None时缓存中保存的值（CacheManager.get返回None表示未命中）
+_CACHED_NONE = _CacheSentinel.NONE
+
+# estimate_size递归计算的最大容器嵌套层数
+_SIZE_MAX_DEPTH = 64
+
+# get_or_compute的调用结果：命中、计算、等待其他调用方的计算、异常、键为None时不经缓存直接计算
+_CALL_OUTCOMES = ('hits', 'misses', 'coalesced', 'errors', 'uncached')
+
 class CacheKey:
     """缓存键生成器"""
     
     @staticmethod
     def generate(func_name: str, args: tuple = None, kwargs: dict = None) -> str:
-        """生成缓存键"""
-        key_data = {
-            'func': func_name,
-            'args': args,
-            'kwargs': kwargs
-        }
-        key_str = json.dumps(key_data, sort_keys=True, default=str)
-        return hashlib.md5(key_str.encode()).hexdigest()
+        """生成缓存键：对函数名和完整的参数内容计算指纹"""
+        return data_fingerprint(func_name, args, kwargs)
 
 class CacheManager:
-    """增强的缓存管理器，支持多级缓存和缓存策略"""
+    """增强的缓存管理器，支持多级缓存和缓存策略
+    
+    内存缓存是按访问顺序排列的OrderedDict（最近访问的在末尾），命中和淘汰都是O(1)；
+    按条目数(memory_size)和估算的字节数(memory_bytes)两个上限淘汰最久未访问的条目，
+    每个条目记录过期时间，过期后不再返回。
+    
+    磁盘缓存元数据由快照metadata.json和追加写入的日志metadata.journal组成：每次写入/删除只追加一行日志，
+    日志行数超过条目数（且不少于journal_compact_min）时合并为新的快照。
+    按写入时间和过期时间各维护一个最小堆，过期条目和超出磁盘字节上限(disk_bytes)时最旧的条目都能直接找到。
+    """
     
     def __init__(self, cache_dir: str = "cache", memory_size: int = 100, 
-                 disk_size: int = 1000, default_ttl: int = 3600):
+                 disk_size: int = 1000, default_ttl: int = 3600,
+                 memory_bytes: int = 256 * 1024 * 1024, disk_bytes: int = 1024 * 1024 * 1024,
+                 journal_compact_min: int = 1000):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         
-        self.memory_cache = {}
+        self.memory_cache = OrderedDict()
         self.memory_size = memory_size
+        self.memory_bytes = memory_bytes
+        self.memory_bytes_used = 0
         self.disk_size = disk_size
+        self.disk_bytes = disk_bytes
+        self.disk_bytes_used = 0
         self.default_ttl = default_ttl
+        self.journal_compact_min = journal_compact_min
         
-        self.memory_access_order = []
         self.disk_metadata = {}
+        self._journal_entries = 0
+        # (过期时间, 键) 和 (写入时间, 键) 最小堆；条目被覆盖或删除后堆中的旧记录在弹出时跳过
+        self._expiry_heap = []
+        self._age_heap = []
+        
+        # 正在计算的键 -> Future，同一个键的并发调用方共享一次计算（见get_or_compute）
+        self._inflight = {}
+        # 函数名 -> 命中/未命中/等待/异常次数和累计耗时（cache_result装饰的函数）
+        self.function_stats = {}
         
         self._lock = threading.RLock()
         self._load_disk_metadata()
     
+    @property
+    def _journal_file(self) -> Path:
+        return self.cache_dir / "metadata.journal"
+    
     def _load_disk_metadata(self):
-        """加载磁盘缓存元数据"""
+        """加载磁盘缓存元数据：读取快照后按顺序重放日志"""
         metadata_file = self.cache_dir / "metadata.json"
         if metadata_file.exists():
             try:
@@ -501,23 +682,107 @@ class CacheManager:
             except Exception as e:
                 logging.error(f"加载磁盘缓存元数据失败: {e}")
                 self.disk_metadata = {}
+        
+        if self._journal_file.exists():
+            with open(self._journal_file, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 写入中断留下的不完整行
+                        logging.warning("忽略磁盘缓存日志中不完整的记录")
+                        continue
+                    if record['op'] == 'set':
+                        self.disk_metadata[record['key']] = record['meta']
+                    else:
+                        self.disk_metadata.pop(record['key'], None)
+                    self._journal_entries += 1
+        
+        self.disk_bytes_used = sum(meta.get('size', 0) for meta in self.disk_metadata.values())
+        self._rebuild_disk_heaps()
+        if self._journal_entries:
+            self._save_disk_metadata()
+    
+    def _rebuild_disk_heaps(self):
+        """根据当前元数据重建过期时间堆和写入时间堆"""
+        self._expiry_heap = [(meta['timestamp'] + meta.get('ttl', self.default_ttl), key)
+                             for key, meta in self.disk_metadata.items()]
+        self._age_heap = [(meta['timestamp'], key) for key, meta in self.disk_metadata.items()]
+        heapq.heapify(self._expiry_heap)
+        heapq.heapify(self._age_heap)
     
     def _save_disk_metadata(self):
-        """保存磁盘缓存元数据"""
+        """保存磁盘缓存元数据快照并清空日志（日志合并）"""
         metadata_file = self.cache_dir / "metadata.json"
+        tmp_file = self.cache_dir / "metadata.json.tmp"
         try:
-            with open(metadata_file, 'w') as f:
+            with open(tmp_file, 'w') as f:
                 json.dump(self.disk_metadata, f)
+            os.replace(tmp_file, metadata_file)
+            if self._journal_file.exists():
+                self._journal_file.unlink()
+            self._journal_entries = 0
         except Exception as e:
             logging.error(f"保存磁盘缓存元数据失败: {e}")
-    
-    def get(self, key: str, use_disk: bool = True) -> Any:
-        """获取缓存值"""
+        
+        # 快照只包含现存条目，顺便清理堆中积累的旧记录
+        if len(self._age_heap) > 2 * len(self.disk_metadata) + 16:
+            self._rebuild_disk_heaps()
+    
+    def _append_journal(self, op: str, key: str, meta: Dict = None):
+        """追加一条元数据变更日志，日志过长时合并为快照"""
+        record = {'op': op, 'key': key}
+        if meta is not None:
+            record['meta'] = meta
+        try:
+            with open(self._journal_file, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+            self._journal_entries += 1
+        except Exception as e:
+            logging.error(f"写入磁盘缓存日志失败: {e}")
+            self._save_disk_metadata()
+            return
+        
+        if self._journal_entries >= max(self.journal_compact_min, len(self.disk_metadata)):
+            self._save_disk_metadata()
+    
+    def _delete_disk_entry(self, key: str):
+        """删除磁盘缓存文件和元数据，并记录日志"""
+        cache_file = self.cache_dir / f"{key}.pkl"
+        if cache_file.exists():
+            cache_file.unlink()
+        meta = self.disk_metadata.pop(key, None)
+        if meta is not None:
+            self.disk_bytes_used -= meta.get('size', 0)
+            self._append_journal('del', key)
+    
+    def _is_current_disk_entry(self, key: str, timestamp: float) -> bool:
+        """堆中的记录是否对应该键当前的元数据（被覆盖或删除的旧记录返回False）"""
+        meta = self.disk_metadata.get(key)
+        return meta is not None and meta['timestamp'] == timestamp
+    
+    def _purge_expired_disk_entries(self, now: float = None):
+        """按过期时间堆删除已过期的磁盘缓存"""
+        now = time.time() if now is None else now
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry_heap)
+            meta = self.disk_metadata.get(key)
+            if meta is not None and meta['timestamp'] + meta.get('ttl', self.default_ttl) == expires_at:
+                self._delete_disk_entry(key)
+    
+    def get(self, key: Optional[str], use_disk: bool = True) -> Any:
+        """获取缓存值；键为None（参数无法计算指纹）时总是未命中"""
+        if key is None:
+            return None
         with self._lock:
             # 先检查内存缓存
-            if key in self.memory_cache:
-                self._update_memory_access_order(key)
-                return self.memory_cache[key]['data']
+            entry = self.memory_cache.get(key)
+            if entry is not None:
+                if time.time() < entry['expires_at']:
+                    self.memory_cache.move_to_end(key)
+                    return entry['data']
+                # 内存缓存过期，删除
+                self._remove_from_memory_cache(key)
             
             # 检查磁盘缓存
             if use_disk and key in self.disk_metadata:
@@ -529,27 +794,28 @@ class CacheManager:
                         
                         # 检查TTL
                         metadata = self.disk_metadata[key]
-                        if time.time() - metadata['timestamp'] < metadata.get('ttl', self.default_ttl):
-                            # 加载到内存缓存
-                            self._add_to_memory_cache(key, data)
+                        expires_at = metadata['timestamp'] + metadata.get('ttl', self.default_ttl)
+                        if time.time() < expires_at:
+                            # 加载到内存缓存（保留磁盘缓存的过期时间）
+                            self._add_to_memory_cache(key, data, expires_at)
                             return data
                         else:
                             # 缓存过期，删除
-                            cache_file.unlink()
-                            del self.disk_metadata[key]
-                            self._save_disk_metadata()
+                            self._delete_disk_entry(key)
                     except Exception as e:
                         logging.error(f"加载磁盘缓存失败: {e}")
             
             return None
     
-    def set(self, key: str, value: Any, use_disk: bool = True, ttl: int = None):
-        """设置缓存值"""
+    def set(self, key: Optional[str], value: Any, use_disk: bool = True, ttl: int = None):
+        """设置缓存值；键为None时不缓存"""
+        if key is None:
+            return
         with self._lock:
             ttl = ttl or self.default_ttl
             
             # 设置内存缓存
-            self._add_to_memory_cache(key, value)
+            self._add_to_memory_cache(key, value, time.time() + ttl, use_disk)
             
             # 设置磁盘缓存
             if use_disk:
@@ -558,87 +824,243 @@ class CacheManager:
                     with open(cache_file, 'wb') as f:
                         pickle.dump(value, f)
                     
-                    # 更新元数据
-                    self.disk_metadata[key] = {
+                    # 更新元数据（只追加一行日志）
+                    old_meta = self.disk_metadata.get(key)
+                    if old_meta is not None:
+                        self.disk_bytes_used -= old_meta.get('size', 0)
+                    meta = {
                         'timestamp': time.time(),
                         'ttl': ttl,
                         'size': cache_file.stat().st_size
                     }
+                    self.disk_metadata[key] = meta
+                    self.disk_bytes_used += meta['size']
+                    heapq.heappush(self._expiry_heap, (meta['timestamp'] + ttl, key))
+                    heapq.heappush(self._age_heap, (meta['timestamp'], key))
+                    self._append_journal('set', key, meta)
                     
                     # 检查磁盘缓存大小限制
                     self._check_disk_cache_size()
-                    
-                    self._save_disk_metadata()
                 except Exception as e:
                     logging.error(f"保存磁盘缓存失败: {e}")
     
-    def _add_to_memory_cache(self, key: str, value: Any):
-        """添加到内存缓存"""
-        # 如果已存在，更新访问顺序
+    def _lookup_or_claim(self, key: str, use_disk: bool):
+        """查找缓存；未命中时返回正在进行的计算，或登记一个新的计算
+        
+        返回 (缓存值, Future, 是否由当前调用方计算)。查找和登记在同一把锁内完成，
+        新的调用方要么命中缓存，要么等待同一个Future。
+        """
+        with self._lock:
+            value = self.get(key, use_disk)
+            if value is not None:
+                return value, None, False
+            future = self._inflight.get(key)
+            if future is not None:
+                return None, future, False
+            future = Future()
+            self._inflight[key] = future
+            return None, future, True
+    
+    def _finish_compute(self, key: str, future: Future, result: Any = None, error: BaseException = None,
+                        use_disk: bool = True, ttl: int = None):
+        """保存计算结果（None保存为_CACHED_NONE，异常不缓存），然后唤醒等待同一个键的调用方
+        
+        保存失败只记录日志：计算已经成功，调用方和等待方仍然得到结果，登记的计算总会被移除。
+        """
+        try:
+            with self._lock:
+                if error is None:
+                    self.set(key, _CACHED_NONE if result is None else result, use_disk, ttl)
+        except Exception as e:
+            logging.error(f"保存计算结果到缓存失败: {key}: {e!r}")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+    
+    def _record_call(self, name: Optional[str], outcome: str, start: float):
+        """记录一次函数调用的结果（hits/misses/coalesced/errors/uncached）和从start开始的耗时"""
+        if not name:
+            return
+        seconds = time.perf_counter() - start
+        with self._lock:
+            stats = self.function_stats.get(name)
+            if stats is None:
+                stats = self.function_stats[name] = {kind: 0 for kind in _CALL_OUTCOMES}
+                stats.update({f'{kind}_seconds': 0.0 for kind in _CALL_OUTCOMES})
+            stats[outcome] += 1
+            stats[f'{outcome}_seconds'] += seconds
+    
+    def _compute_uncached(self, compute: Callable[[], Any], name: Optional[str], start: float) -> Any:
+        """键为None时不经缓存直接调用compute()"""
+        try:
+            result = compute()
+        except BaseException:
+            self._record_call(name, 'errors', start)
+            raise
+        self._record_call(name, 'uncached', start)
+        return result
+    
+    def get_or_compute(self, key: Optional[str], compute: Callable[[], Any], use_disk: bool = True,
+                       ttl: int = None, name: str = None) -> Any:
+        """读取缓存，未命中时调用compute()计算并缓存
+        
+        同一个键同时只有一个调用方执行compute()，其他线程等待并共享其结果或异常；
+        返回None的结果同样缓存。键为None时直接计算，不读写缓存。name不为空时记录到function_stats。
+        """
+        start = time.perf_counter()
+        if key is None:
+            return self._compute_uncached(compute, name, start)
+        value, future, leader = self._lookup_or_claim(key, use_disk)
+        if future is None:
+            outcome, result = 'hits', None if value is _CACHED_NONE else value
+        elif not leader:
+            outcome = 'coalesced'
+            try:
+                result = future.result()
+            except BaseException:
+                self._record_call(name, 'errors', start)
+                raise
+        else:
+            outcome = 'misses'
+            try:
+                result = compute()
+            except BaseException as e:
+                self._finish_compute(key, future, error=e)
+                self._record_call(name, 'errors', start)
+                raise
+            self._finish_compute(key, future, result, use_disk=use_disk, ttl=ttl)
+        self._record_call(name, outcome, start)
+        return result
+    
+    async def get_or_compute_async(self, key: Optional[str], compute: Callable[[], Any], use_disk: bool = True,
+                                   ttl: int = None, name: str = None) -> Any:
+        """get_or_compute的协程版本：compute()返回可等待对象，等待方不阻塞事件循环"""
+        start = time.perf_counter()
+        if key is None:
+            try:
+                result = await compute()
+            except BaseException:
+                self._record_call(name, 'errors', start)
+                raise
+            self._record_call(name, 'uncached', start)
+            return result
+        value, future, leader = self._lookup_or_claim(key, use_disk)
+        if future is None:
+            outcome, result = 'hits', None if value is _CACHED_NONE else value
+        elif not leader:
+            outcome = 'coalesced'
+            try:
+                result = await asyncio.wrap_future(future)
+            except BaseException:
+                self._record_call(name, 'errors', start)
+                raise
+        else:
+            outcome = 'misses'
+            try:
+                result = await compute()
+            except BaseException as e:
+                self._finish_compute(key, future, error=e)
+                self._record_call(name, 'errors', start)
+                raise
+            self._finish_compute(key, future, result, use_disk=use_disk, ttl=ttl)
+        self._record_call(name, outcome, start)
+        return result
+    
+    @staticmethod
+    def estimate_size(value: Any, _seen: set = None, _depth: int = 0) -> int:
+        """估算缓存值占用的内存字节数（DataFrame/Series按memory_usage(deep=True)，数组按nbytes）
+        
+        容器递归累加元素大小；已经计入的容器不重复计算（自引用的列表不会无限递归），
+        嵌套超过_SIZE_MAX_DEPTH层的容器只按sys.getsizeof计算。
+        """
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(deep=True).sum())
+        if isinstance(value, (pd.Series, pd.Index)):
+            return int(value.memory_usage(deep=True))
+        if isinstance(value, np.ndarray):
+            return int(value.nbytes)
+        if not isinstance(value, (dict, list, tuple, set, frozenset)):
+            return sys.getsizeof(value)
+        if _seen is None:
+            _seen = set()
+        if id(value) in _seen:
+            return 0
+        _seen.add(id(value))
+        if _depth >= _SIZE_MAX_DEPTH:
+            return sys.getsizeof(value)
+        items = value.items() if isinstance(value, dict) else ((item,) for item in value)
+        return sys.getsizeof(value) + sum(CacheManager.estimate_size(part, _seen, _depth + 1)
+                                          for item in items for part in item)
+    
+    def _add_to_memory_cache(self, key: str, value: Any, expires_at: float, use_disk: bool = True):
+        """添加到内存缓存，超出条目数或字节数上限时淘汰最久未访问的条目"""
         if key in self.memory_cache:
-            self._update_memory_access_order(key)
-            self.memory_cache[key]['data'] = value
+            self._remove_from_memory_cache(key)
+        
+        size = self.estimate_size(value)
+        if size > self.memory_bytes:
+            # 单个值超过整个内存缓存的字节上限：使用磁盘缓存时只保存在磁盘中，否则不会被缓存
+            if use_disk:
+                logging.debug(f"缓存值过大({size}字节)，不放入内存缓存，只保存在磁盘缓存中: {key}")
+            else:
+                logging.warning(f"缓存值过大({size}字节)，超过内存缓存上限({self.memory_bytes}字节)"
+                                f"且未使用磁盘缓存，该值不会被缓存: {key}")
             return
         
         # 检查内存缓存大小限制
-        while len(self.memory_cache) >= self.memory_size:
-            oldest_key = self.memory_access_order.pop(0)
-            del self.memory_cache[oldest_key]
+        while self.memory_cache and (len(self.memory_cache) >= self.memory_size
+                                     or self.memory_bytes_used + size > self.memory_bytes):
+            _, oldest = self.memory_cache.popitem(last=False)
+            self.memory_bytes_used -= oldest['size']
         
         # 添加新缓存
         self.memory_cache[key] = {
             'data': value,
-            'timestamp': time.time()
+            'timestamp': time.time(),
+            'expires_at': expires_at,
+            'size': size
         }
-        self.memory_access_order.append(key)
+        self.memory_bytes_used += size
     
-    def _update_memory_access_order(self, key: str):
-        """更新内存缓存访问顺序"""
-        if key in self.memory_access_order:
-            self.memory_access_order.remove(key)
-        self.memory_access_order.append(key)
+    def _remove_from_memory_cache(self, key: str):
+        """从内存缓存删除条目"""
+        entry = self.memory_cache.pop(key, None)
+        if entry is not None:
+            self.memory_bytes_used -= entry['size']
     
     def _check_disk_cache_size(self):
-        """检查磁盘缓存大小限制"""
-        while len(self.disk_metadata) > self.disk_size:
+        """检查磁盘缓存大小限制：先删除过期条目，再按写入时间从旧到新删除，直到总字节数和条目数都不超过上限"""
+        self._purge_expired_disk_entries()
+        while self._age_heap and (self.disk_bytes_used > self.disk_bytes
+                                  or len(self.disk_metadata) > self.disk_size):
             # 找到最旧的缓存
-            oldest_key = min(self.disk_metadata.keys(), 
-                            key=lambda k: self.disk_metadata[k]['timestamp'])
-            
-            # 删除缓存文件
-            cache_file = self.cache_dir / f"{oldest_key}.pkl"
-            if cache_file.exists():
-                cache_file.unlink()
-            
-            # 删除元数据
-            del self.disk_metadata[oldest_key]
+            timestamp, oldest_key = heapq.heappop(self._age_heap)
+            if self._is_current_disk_entry(oldest_key, timestamp):
+                self._delete_disk_entry(oldest_key)
     
     def clear(self, key: str = None):
         """清除缓存"""
         with self._lock:
             if key:
                 # 清除特定缓存
-                if key in self.memory_cache:
-                    del self.memory_cache[key]
-                    if key in self.memory_access_order:
-                        self.memory_access_order.remove(key)
-                
-                cache_file = self.cache_dir / f"{key}.pkl"
-                if cache_file.exists():
-                    cache_file.unlink()
-                
-                if key in self.disk_metadata:
-                    del self.disk_metadata[key]
-                    self._save_disk_metadata()
+                self._remove_from_memory_cache(key)
+                self._delete_disk_entry(key)
             else:
                 # 清除所有缓存
                 self.memory_cache.clear()
-                self.memory_access_order.clear()
+                self.memory_bytes_used = 0
                 
                 for file in self.cache_dir.glob("*.pkl"):
                     file.unlink()
                 
                 self.disk_metadata.clear()
+                self.disk_bytes_used = 0
+                self._expiry_heap.clear()
+                self._age_heap.clear()
                 self._save_disk_metadata()
     
     def get_stats(self) -> Dict:
@@ -647,37 +1069,59 @@ class CacheManager:
             return {
                 'memory_cache_size': len(self.memory_cache),
                 'memory_cache_limit': self.memory_size,
+                'memory_bytes_used': self.memory_bytes_used,
+                'memory_bytes_limit': self.memory_bytes,
                 'disk_cache_size': len(self.disk_metadata),
                 'disk_cache_limit': self.disk_size,
-                'disk_cache_dir': str(self.cache_dir)
+                'disk_bytes_used': self.disk_bytes_used,
+                'disk_bytes_limit': self.disk_bytes,
+                'journal_entries': self._journal_entries,
+                'disk_cache_dir': str(self.cache_dir),
+                'inflight': len(self._inflight),
+                'functions': {
+                    name: dict(stats, **{
+                        f'avg_{outcome}_seconds': stats[f'{outcome}_seconds'] / stats[outcome] if stats[outcome] else 0.0
+                        for outcome in _CALL_OUTCOMES
+                    })
+                    for name, stats in self.function_stats.items()
+                }
             }
 
 def cache_result(cache_manager: CacheManager = None, ttl: int = None, 
                 use_disk: bool = True, key_func: Callable = None):
-    """缓存结果装饰器"""
+    """缓存结果装饰器
+    
+    通过CacheManager.get_or_compute读取和计算：同一个键的并发调用只计算一次，返回None的结果也会缓存，
+    支持async函数。每个函数的命中/未命中/等待次数和耗时见cache_manager.get_stats()['functions']。
+    """
     def decorator(func):
+        name = func.__qualname__
+        
+        def make_key(args, kwargs):
+            # 生成缓存键；参数无法计算指纹时返回None，本次调用不使用缓存
+            if key_func:
+                return key_func(*args, **kwargs)
+            try:
+                return CacheKey.generate(func.__name__, args, kwargs)
+            except UnfingerprintableError as e:
+                logging.debug(f"{name}: 参数无法计算指纹，不使用缓存: {e}")
+                return None
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not cache_manager:
+                    return await func(*args, **kwargs)
+                return await cache_manager.get_or_compute_async(
+                    make_key(args, kwargs), lambda: func(*args, **kwargs), use_disk, ttl, name)
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # 生成缓存键
-            if key_func:
-                cache_key = key_func(*args, **kwargs)
-            else:
-                cache_key = CacheKey.generate(func.__name__, args, kwargs)
-            
-            # 尝试从缓存获取
-            if cache_manager:
-                cached_result = cache_manager.get(cache_key, use_disk)
-                if cached_result is not None:
-                    return cached_result
-            
-            # 执行函数
-            result = func(*args, **kwargs)
-            
-            # 缓存结果
-            if cache_manager:
-                cache_manager.set(cache_key, result, use_disk, ttl)
-            
-            return result
+            if not cache_manager:
+                return func(*args, **kwargs)
+            return cache_manager.get_or_compute(
+                make_key(args, kwargs), lambda: func(*args, **kwargs), use_disk, ttl, name)
         return wrapper
     return decorator
 
@@ -692,6 +1136,11 @@ class TaskStatus(Enum):
     CANCELLED = "cancelled"
     SKIPPED = "skipped"
 
+class ExecutionMode(Enum):
+    """任务执行方式：THREAD在线程中执行（I/O任务），PROCESS在工作进程中执行（CPU密集任务，可超时终止）"""
+    THREAD = "thread"
+    PROCESS = "process"
+
 @dataclass
 class TaskResult:
     """任务结果"""
@@ -712,11 +1161,13 @@ class Task(ABC):
     """抽象任务类"""
     
     def __init__(self, task_id: str, name: str = None, priority: int = 0, 
-                 timeout: Optional[float] = None, retry_count: int = 0):
+                 timeout: Optional[float] = None, retry_count: int = 0,
+                 execution: ExecutionMode = ExecutionMode.THREAD):
         self.task_id = task_id
         self.name = name or task_id
         self.priority = priority
         self.timeout = timeout
+        self.execution = execution
         self.retry_count = retry_count
         self.max_retries = retry_count
         self.dependencies = []
@@ -770,24 +1221,225 @@ class Task(ABC):
         with self._lock:
             return self.metadata.get(key, default)
     
+    def __getstate__(self):
+        """传给工作进程的状态：不包含锁和依赖任务（子进程只执行execute）"""
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['dependencies'] = []
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
     def __repr__(self):
         return f"Task({self.task_id}, status={self.status.value}, progress={self.progress:.2f})"
 
+def _task_process_main(conn):
+    """CPU任务工作进程：启动完成后发送就绪消息，然后循环接收(任务, 上下文)，执行后发回 (状态, 结果或异常, 元数据或错误堆栈)"""
+    conn.send('ready')
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        task, context = message
+        try:
+            reply = ('ok', task.execute(context), task.metadata)
+        except Exception as e:
+            reply = ('error', e, traceback.format_exc())
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # 结果或异常无法序列化
+            conn.send(('error', RuntimeError(f"任务 {task.task_id} 的返回值无法传回主进程: {e}"),
+                       traceback.format_exc()))
+
+class TaskProcessPool:
+    """CPU任务进程池
+    
+    与ProcessPoolExecutor不同，每个工作进程可以单独终止：任务超时或被取消时终止执行它的进程，
+    之后按需启动新的工作进程补足数量，其他任务不受影响。工作进程在第一次使用时启动并复用。
+    """
+    
+    def __init__(self, max_workers: int = None, start_method: str = "spawn"):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._mp_context = multiprocessing.get_context(start_method)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = 0
+        # 任务ID -> 正在执行它的(进程, 连接)，以及被请求取消的任务ID
+        self._running = {}
+        self._cancelled = set()
+    
+    def _start_worker(self):
+        parent_conn, child_conn = self._mp_context.Pipe()
+        process = self._mp_context.Process(target=_task_process_main, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        # 等待进程启动完成，任务超时只计算执行时间
+        parent_conn.recv()
+        return process, parent_conn
+    
+    def _acquire(self):
+        """取一个空闲的工作进程，没有空闲进程且未达到上限时启动新进程，否则等待；已退出的空闲进程被丢弃"""
+        while True:
+            with self._lock:
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    worker = None
+                    start_new = self._started < self.max_workers
+                    if start_new:
+                        self._started += 1
+            if worker is None and start_new:
+                try:
+                    return self._start_worker()
+                except Exception:
+                    with self._lock:
+                        self._started -= 1
+                    raise
+            if worker is None:
+                worker = self._idle.get()
+            if worker[0].is_alive():
+                return worker
+            self._discard(worker)
+    
+    def _discard(self, worker):
+        """终止并丢弃工作进程，释放名额"""
+        process, conn = worker
+        if process.is_alive():
+            process.kill()
+        process.join()
+        conn.close()
+        with self._lock:
+            self._started -= 1
+    
+    def run(self, task: Task, context: Dict, timeout: Optional[float] = None) -> Any:
+        """在工作进程中执行task.execute(context)并返回结果
+        
+        超时时终止工作进程并抛出TimeoutError，被cancel取消时抛出TaskCancelledError；
+        任务抛出的异常在主进程中重新抛出，工作进程中的元数据更新同步回task.metadata。
+        """
+        worker = self._acquire()
+        process, conn = worker
+        with self._lock:
+            self._running[task.task_id] = worker
+            cancelled = task.task_id in self._cancelled
+        try:
+            if cancelled:
+                # 在分配到工作进程之前已被取消
+                self._idle.put(worker)
+                raise TaskCancelledError(f"任务 {task.task_id} 已取消")
+            try:
+                conn.send((task, context))
+            except Exception as e:
+                # 任务或上下文无法序列化时工作进程没有收到任何数据，可以继续使用；连接断开时丢弃
+                if isinstance(e, OSError):
+                    self._discard(worker)
+                else:
+                    self._idle.put(worker)
+                raise
+            
+            ready = multiprocessing.connection.wait([conn, process.sentinel], timeout)
+            reply = None
+            if conn in ready:
+                try:
+                    reply = conn.recv()
+                except (EOFError, OSError):
+                    reply = None
+            
+            with self._lock:
+                cancelled = task.task_id in self._cancelled
+            if reply is None or cancelled:
+                # 进程已被终止（或正在被终止），不能再复用
+                self._discard(worker)
+            else:
+                self._idle.put(worker)
+            
+            if reply is None:
+                if cancelled:
+                    raise TaskCancelledError(f"任务 {task.task_id} 已取消")
+                if not ready:
+                    raise TimeoutError(f"任务 {task.task_id} 执行超过 {timeout} 秒，已终止工作进程")
+                raise RuntimeError(f"任务 {task.task_id} 的工作进程异常退出 (exitcode={process.exitcode})")
+            
+            status, value, detail = reply
+            if status == 'error':
+                logging.debug(f"任务 {task.task_id} 在工作进程中失败:\n{detail}")
+                raise value
+            with task._lock:
+                task.metadata.update(detail)
+            return value
+        finally:
+            with self._lock:
+                self._running.pop(task.task_id, None)
+                self._cancelled.discard(task.task_id)
+    
+    def cancel(self, task_id: str):
+        """取消task_id：正在执行时终止其工作进程，尚未分配到工作进程时在分配后立即取消"""
+        with self._lock:
+            self._cancelled.add(task_id)
+            worker = self._running.get(task_id)
+        if worker is not None:
+            worker[0].terminate()
+    
+    def shutdown(self):
+        """通知空闲的工作进程退出并等待结束"""
+        while True:
+            try:
+                process, conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(timeout=5)
+            self._discard((process, conn))
+
+# 任务结束但没有成功的状态：依赖这些任务的待执行任务无法再执行，会被跳过
+_UNSUCCESSFUL_STATUSES = (TaskStatus.FAILED, TaskStatus.CANCELLED, TaskStatus.SKIPPED)
+
 class DAGTaskScheduler:
-    """增强的基于DAG的任务调度器"""
+    """增强的基于DAG的任务调度器
+    
+    调度由事件驱动：运行开始时为每个待执行任务记录未完成的前置任务数，前置任务数为0的任务进入按优先级排序的就绪堆；
+    任务完成时只递减其后继任务的计数并把变为0的任务放入就绪堆，调度线程在条件变量上等待，不轮询也不扫描全部任务。
+    任务失败、取消或跳过时，依赖它的待执行任务被跳过。
+    
+    任务按execution选择执行方式：THREAD任务在调度线程池中执行，设置了timeout时在单独的守护线程中执行并限时等待，
+    从任务开始执行时计时（线程无法被终止，超时后任务记为失败，线程在后台结束，不占用任何线程池）；
+    PROCESS任务在TaskProcessPool的工作进程中执行，超时或cancel_task时终止该工作进程。
+    """
     
-    def __init__(self, max_workers: int = 4, config_manager: ConfigManager = None):
+    def __init__(self, max_workers: int = 4, config_manager: ConfigManager = None,
+                 process_workers: int = None, process_start_method: str = "spawn"):
         self.max_workers = max_workers
         self.config = config_manager
         self.tasks = {}
         self.dag = nx.DiGraph()
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # 调度线程池在每次run开始时创建、结束时关闭，同一个调度器可以多次运行
+        self.executor = None
+        # CPU任务的工作进程在第一次执行PROCESS任务时才启动
+        self.process_pool = TaskProcessPool(process_workers or min(max_workers, os.cpu_count() or 1),
+                                            process_start_method)
         self.results = {}
         self.running = False
         self.paused = False
         self._lock = threading.Lock()
         self._condition = threading.Condition(self._lock)
+        # 运行期间的调度状态：任务ID -> 未完成的前置任务数，就绪堆 (-优先级, 入堆序号, 任务ID)
+        self._pending_deps = {}
+        self._ready = []
+        self._ready_seq = 0
+        self._running_count = 0
+        self._unfinished_count = 0
         self._event_handlers = {}
+        # 持有锁时产生的事件 (事件名, 任务, 结果)，释放锁后由_flush_events触发，事件处理器可以查询调度器
+        self._deferred_events = []
         self._stats = {
             'total_tasks': 0,
             'completed_tasks': 0,
@@ -834,22 +1486,139 @@ class DAGTaskScheduler:
                 except Exception as e:
                     logging.error(f"事件处理器错误: {e}")
     
-    def _validate_dag(self) -> bool:
-        """验证DAG是否有效（无环）"""
-        try:
-            nx.find_cycle(self.dag)
-            return False  # 有环
-        except nx.NetworkXNoCycle:
-            return True  # 无环
+    def _defer_event(self, event: str, task: Task, result: TaskResult):
+        """记录持有锁时产生的事件（调用方持有锁）"""
+        self._deferred_events.append((event, task, result))
     
-    def _get_ready_tasks(self) -> List[Task]:
-        """获取准备执行的任务"""
+    def _flush_events(self):
+        """在不持有锁时按产生顺序触发延后的事件"""
         with self._lock:
-            ready_tasks = []
-            for task_id, task in self.tasks.items():
-                if task.can_execute():
-                    ready_tasks.append(task)
-            return ready_tasks
+            events, self._deferred_events = self._deferred_events, []
+        for event, task, result in events:
+            self._trigger_event(event, task, result)
+    
+    def _validate_dag(self) -> bool:
+        """验证DAG是否有效（无环）：拓扑排序，O(节点数+边数)"""
+        return nx.is_directed_acyclic_graph(self.dag)
+    
+    def _push_ready(self, task: Task):
+        """把任务放入就绪堆（调用方持有锁）；优先级高的先执行，优先级相同时按入堆顺序"""
+        heapq.heappush(self._ready, (-task.priority, self._ready_seq, task.task_id))
+        self._ready_seq += 1
+    
+    def _init_schedule(self):
+        """统计每个待执行任务未完成的前置任务数，初始化就绪堆（调用方持有锁）"""
+        self._pending_deps = {}
+        self._ready = []
+        self._running_count = 0
+        self._unfinished_count = 0
+        for task_id, task in self.tasks.items():
+            if task.status != TaskStatus.PENDING:
+                continue
+            self._unfinished_count += 1
+            self._pending_deps[task_id] = sum(
+                1 for dep_id in self.dag.predecessors(task_id)
+                if self.tasks[dep_id].status != TaskStatus.COMPLETED
+            )
+            if self._pending_deps[task_id] == 0:
+                self._push_ready(task)
+        
+        # 上一次运行中没有成功的任务，其后继任务无法执行
+        for task_id, task in self.tasks.items():
+            if task.status in _UNSUCCESSFUL_STATUSES:
+                self._skip_dependents(task_id)
+    
+    def _dispatch_ready(self, context: Dict):
+        """从就绪堆取出任务提交执行，直到达到max_workers（调用方持有锁）"""
+        while self._ready and self._running_count < self.max_workers:
+            _, _, task_id = heapq.heappop(self._ready)
+            task = self.tasks[task_id]
+            if task.status != TaskStatus.PENDING:
+                # 入堆后被取消或跳过
+                continue
+            self.executor.submit(self._execute_task, task, context)
+            # 提交成功后才计为运行中；执行线程需要获取锁才能报告结束，不会早于这里的更新
+            self._running_count += 1
+            with task._lock:
+                if task.status == TaskStatus.PENDING:
+                    task.status = TaskStatus.RUNNING
+    
+    def _untrack_task(self, task: Task, was_running: bool) -> bool:
+        """任务进入结束状态后从调度计数中移除（调用方持有锁），不在本次运行中调度的任务返回False"""
+        if not self.running or task.task_id not in self._pending_deps:
+            return False
+        if was_running:
+            self._running_count -= 1
+        self._unfinished_count -= 1
+        del self._pending_deps[task.task_id]
+        return True
+    
+    def _on_task_finished(self, task: Task, was_running: bool):
+        """任务进入结束状态后更新调度状态（调用方持有锁）：成功时释放后继任务，否则跳过依赖它的任务"""
+        if not self._untrack_task(task, was_running):
+            return
+        
+        if task.status == TaskStatus.COMPLETED:
+            for successor_id in self.dag.successors(task.task_id):
+                if successor_id in self._pending_deps:
+                    self._pending_deps[successor_id] -= 1
+                    if self._pending_deps[successor_id] == 0:
+                        self._push_ready(self.tasks[successor_id])
+        else:
+            self._skip_dependents(task.task_id)
+        self._condition.notify_all()
+    
+    def _skip_dependents(self, task_id: str):
+        """跳过直接或间接依赖task_id的所有待执行任务（调用方持有锁）"""
+        stack = [task_id]
+        while stack:
+            current_id = stack.pop()
+            for successor_id in self.dag.successors(current_id):
+                successor = self.tasks[successor_id]
+                if successor.status == TaskStatus.PENDING:
+                    self._mark_skipped(successor, f"依赖任务 {current_id} 未成功完成")
+                    self._untrack_task(successor, was_running=False)
+                    stack.append(successor_id)
+    
+    def _run_task_body(self, task: Task, context: Dict) -> Any:
+        """按任务的执行方式调用task.execute"""
+        if task.execution == ExecutionMode.PROCESS:
+            return self.process_pool.run(task, context, task.timeout)
+        
+        if task.timeout:
+            return self._run_thread_with_timeout(task, context)
+        
+        return task.execute(context)
+    
+    @staticmethod
+    def _run_thread_with_timeout(task: Task, context: Dict) -> Any:
+        """在单独的守护线程中执行带超时的线程任务，从线程开始执行时计时
+        
+        每个任务使用自己的线程，超时后仍在运行的线程不会让后面的任务排队，
+        因此超时只表示任务确实执行了timeout秒；线程无法启动时报告为未能开始执行。
+        """
+        outcome = {}
+        done = threading.Event()
+        
+        def target():
+            try:
+                outcome['result'] = task.execute(context)
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                done.set()
+        
+        thread = threading.Thread(target=target, name=f"task-{task.task_id}", daemon=True)
+        try:
+            # start()在线程开始运行后才返回
+            thread.start()
+        except RuntimeError as e:
+            raise RuntimeError(f"任务 {task.task_id} 未能开始执行: {e}") from e
+        if not done.wait(task.timeout):
+            raise TimeoutError(f"任务 {task.task_id} 执行超过 {task.timeout} 秒")
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
     
     def _execute_task(self, task: Task, context: Dict = None):
         """执行单个任务"""
@@ -862,15 +1631,7 @@ class DAGTaskScheduler:
             self._trigger_event('task_start', task, None)
             
             # 执行任务
-            if task.timeout:
-                future = self.executor.submit(task.execute, context or {})
-                try:
-                    result = future.result(timeout=task.timeout)
-                except Exception as e:
-                    future.cancel()
-                    raise e
-            else:
-                result = task.execute(context or {})
+            result = self._run_task_body(task, context or {})
             
             end_time = datetime.now()
             
@@ -899,21 +1660,23 @@ class DAGTaskScheduler:
             # 触发任务完成事件
             self._trigger_event('task_complete', task, task_result)
             
-            # 通知等待的线程
+            # 释放后继任务并通知调度线程
             with self._condition:
-                self._condition.notify_all()
+                self._on_task_finished(task, was_running=True)
+            self._flush_events()
             
         except Exception as e:
             end_time = datetime.now()
+            status = TaskStatus.CANCELLED if isinstance(e, TaskCancelledError) else TaskStatus.FAILED
             
             with task._lock:
-                task.status = TaskStatus.FAILED
+                task.status = status
                 task.error = e
                 task.end_time = end_time
             
             task_result = TaskResult(
                 task_id=task.task_id,
-                status=TaskStatus.FAILED,
+                status=status,
                 error=e,
                 start_time=task.start_time,
                 end_time=end_time,
@@ -922,16 +1685,24 @@ class DAGTaskScheduler:
             
             with self._lock:
                 self.results[task.task_id] = task_result
-                self._stats['failed_tasks'] += 1
-            
-            logging.error(f"任务 {task.task_id} 执行失败: {e}")
+                if status == TaskStatus.CANCELLED:
+                    self._stats['cancelled_tasks'] += 1
+                else:
+                    self._stats['failed_tasks'] += 1
             
-            # 触发任务失败事件
-            self._trigger_event('task_failed', task, task_result)
+            if status == TaskStatus.CANCELLED:
+                logging.info(f"任务 {task.task_id} 在执行中被取消")
+                self._trigger_event('task_cancelled', task, task_result)
+            else:
+                logging.error(f"任务 {task.task_id} 执行失败: {e}")
+                
+                # 触发任务失败事件
+                self._trigger_event('task_failed', task, task_result)
             
-            # 通知等待的线程
+            # 跳过依赖该任务的任务并通知调度线程
             with self._condition:
-                self._condition.notify_all()
+                self._on_task_finished(task, was_running=True)
+            self._flush_events()
     
     def run(self, context: Dict = None) -> Dict[str, TaskResult]:
         """运行所有任务"""
@@ -940,43 +1711,24 @@ class DAGTaskScheduler:
         
         self.running = True
         context = context or {}
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
         
         # 触发调度器开始事件
         self._trigger_event('scheduler_start', None, None)
         
         try:
-            while self.running:
-                with self._lock:
-                    if self.paused:
-                        self._condition.wait()
-                        continue
-                    
-                    ready_tasks = self._get_ready_tasks()
-                    
-                    if not ready_tasks:
-                        # 检查是否所有任务都已完成或失败
-                        all_done = all(
-                            task.status in [TaskStatus.COMPLETED, TaskStatus.FAILED, 
-                                          TaskStatus.CANCELLED, TaskStatus.SKIPPED] 
-                            for task in self.tasks.values()
-                        )
-                        if all_done:
-                            break
-                        
-                        # 等待任务状态变化
-                        self._condition.wait(timeout=0.1)
-                        continue
-                    
-                    # 按优先级排序
-                    ready_tasks.sort(key=lambda t: -t.priority)
-                    
-                    # 提交任务执行
-                    for task in ready_tasks[:self.max_workers]:
-                        self.executor.submit(self._execute_task, task, context)
-                
-                time.sleep(0.1)
+            with self._condition:
+                self._init_schedule()
+            self._flush_events()
+            with self._condition:
+                while self.running and self._unfinished_count > 0:
+                    if not self.paused:
+                        self._dispatch_ready(context)
+                    # 等待任务结束、恢复或停止
+                    self._condition.wait()
         finally:
             self.executor.shutdown(wait=True)
+            self.process_pool.shutdown()
             self.running = False
             
             # 触发调度器结束事件
@@ -996,11 +1748,16 @@ class DAGTaskScheduler:
             self._condition.notify_all()
     
     def cancel_task(self, task_id: str):
-        """取消任务"""
+        """取消任务：待执行的任务直接取消；正在工作进程中执行的任务终止其进程，由执行线程记为取消"""
         with self._lock:
             if task_id in self.tasks:
                 task = self.tasks[task_id]
-                if task.status == TaskStatus.PENDING:
+                if task.status == TaskStatus.RUNNING:
+                    if task.execution == ExecutionMode.PROCESS:
+                        self.process_pool.cancel(task_id)
+                    else:
+                        logging.warning(f"任务 {task_id} 正在线程中执行，无法取消")
+                elif task.status == TaskStatus.PENDING:
                     task.status = TaskStatus.CANCELLED
                     task.end_time = datetime.now()
                     
@@ -1015,7 +1772,9 @@ class DAGTaskScheduler:
                     self._stats['cancelled_tasks'] += 1
                     
                     # 触发任务取消事件
-                    self._trigger_event('task_cancelled', task, task_result)
+                    self._defer_event('task_cancelled', task, task_result)
+                    self._on_task_finished(task, was_running=False)
+        self._flush_events()
     
     def skip_task(self, task_id: str, reason: str = None):
         """跳过任务"""
@@ -1023,24 +1782,30 @@ class DAGTaskScheduler:
             if task_id in self.tasks:
                 task = self.tasks[task_id]
                 if task.status == TaskStatus.PENDING:
-                    task.status = TaskStatus.SKIPPED
-                    task.end_time = datetime.now()
-                    if reason:
-                        task.set_metadata('skip_reason', reason)
-                    
-                    task_result = TaskResult(
-                        task_id=task_id,
-                        status=TaskStatus.SKIPPED,
-                        start_time=task.start_time,
-                        end_time=task.end_time,
-                        metadata=task.metadata.copy()
-                    )
-                    
-                    self.results[task_id] = task_result
-                    self._stats['skipped_tasks'] += 1
-                    
-                    # 触发任务跳过事件
-                    self._trigger_event('task_skipped', task, task_result)
+                    self._mark_skipped(task, reason)
+                    self._on_task_finished(task, was_running=False)
+        self._flush_events()
+    
+    def _mark_skipped(self, task: Task, reason: str = None):
+        """把待执行任务标记为跳过、记录结果并记录跳过事件（调用方持有锁，释放锁后由_flush_events触发）"""
+        task.status = TaskStatus.SKIPPED
+        task.end_time = datetime.now()
+        if reason:
+            task.set_metadata('skip_reason', reason)
+        
+        task_result = TaskResult(
+            task_id=task.task_id,
+            status=TaskStatus.SKIPPED,
+            start_time=task.start_time,
+            end_time=task.end_time,
+            metadata=task.metadata.copy()
+        )
+        
+        self.results[task.task_id] = task_result
+        self._stats['skipped_tasks'] += 1
+        
+        # 触发任务跳过事件
+        self._defer_event('task_skipped', task, task_result)
     
     def stop(self):
         """停止调度器"""
@@ -1170,7 +1935,7 @@ class PreprocessDataTask(Task):
         # 尝试从缓存加载
         cache_manager = context.get('cache_manager')
         if cache_manager:
-            cache_key = f"preprocess_data_{hash(str(raw_data.values.tobytes()))}"
+            cache_key = f"preprocess_data_{data_fingerprint(raw_data)}"
             cached_data = cache_manager.get(cache_key)
             if cached_data is not None:
                 logging.info("从缓存加载预处理数据")
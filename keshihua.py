@@ -722,7 +722,7 @@ if __name__ == "__main__":
     
     # 创建可视化器
     config = ConfigManager("config.yaml", "production")
-    cache = CacheManager(100, 1000)
+    cache = CacheManager(memory_size=100, disk_size=1000)
     error_handler = ErrorHandler(config)
     
     visualizer = FactorVisualizer(config, cache, error_handler)
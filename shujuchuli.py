@@ -11,6 +11,8 @@ import logging
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from abc import ABC, abstractmethod
 import multiprocessing as mp
+from multiprocessing import shared_memory
+import contextlib
 from functools import partial
 import pickle
 import hashlib
@@ -18,7 +20,7 @@ import time
 from pathlib import Path
 
 # 导入基础系统组件
-from jichuxitong import ConfigManager, CacheManager, ErrorHandler, FactorAnalysisError, DataLoadError, DataProcessingError, exception_handler, cache_result
+from jichuxitong import ConfigManager, CacheManager, ErrorHandler, FactorAnalysisError, DataLoadError, DataProcessingError, exception_handler, cache_result, fingerprint_key
 
 class DataSource(ABC):
     """抽象数据源类"""
@@ -367,8 +369,103 @@ class DataPipeline:
                 params[name] = step.get_params()
         return params
 
+# 自适应分块：第一个试算块最多的行数、每个工作线程/进程平均分到的块数，
+# 以及每块的最短耗时（秒），保证调度、序列化等固定开销只占每块耗时的一小部分
+_PILOT_ROWS = 256
+_CHUNKS_PER_WORKER = 4
+_MIN_CHUNK_SECONDS = {ThreadPoolExecutor: 0.005, ProcessPoolExecutor: 0.05}
+
+class SharedFrame:
+    """把DataFrame的数值列放入共享内存，进程池的工作进程按行/列区间读取，不再整块pickle
+    
+    对象、分类等非数值列无法放入共享内存，分块时只随任务传入对应的切片。
+    需要在with块中使用，退出时释放共享内存：工作进程只在复制切片时打开共享内存段，
+    所有分块结束后才由创建它的进程unlink，资源跟踪进程中的登记随之注销，不会误删或报告泄漏。
+    """
+    
+    def __init__(self, data: pd.DataFrame):
+        self.data = data
+        self._segments: List[Optional[Tuple[str, str, int]]] = []
+        self._blocks: List[shared_memory.SharedMemory] = []
+    
+    def __enter__(self) -> 'SharedFrame':
+        try:
+            for position in range(self.data.shape[1]):
+                column = self.data.iloc[:, position]
+                if not isinstance(column.dtype, np.dtype) or column.dtype.kind not in 'biufcmM':
+                    self._segments.append(None)
+                    continue
+                values = column.to_numpy()
+                block = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+                self._blocks.append(block)
+                np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+                self._segments.append((block.name, values.dtype.str, len(values)))
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+        self._segments.clear()
+    
+    def chunk(self, start: int, stop: int, positions: Optional[range] = None,
+              as_series: bool = False) -> Dict[str, Any]:
+        """描述[start, stop)行、positions列的分块，由_run_shared_chunk在工作进程中重建"""
+        if positions is None:
+            positions = range(self.data.shape[1])
+        columns = []
+        for position in positions:
+            segment = self._segments[position]
+            values = self.data.iloc[start:stop, position].array if segment is None else None
+            columns.append((segment, values, self.data.dtypes.iloc[position]))
+        return {
+            'start': start,
+            'stop': stop,
+            'index': self.data.index[start:stop],
+            'labels': self.data.columns[list(positions)],
+            'columns': columns,
+            'as_series': as_series
+        }
+
+def _read_shared_segment(segment: Tuple[str, str, int], start: int, stop: int) -> np.ndarray:
+    """从共享内存复制出一列的[start, stop)切片，复制后即可关闭共享内存"""
+    name, dtype, length = segment
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        view = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+        values = view[start:stop].copy()
+        del view
+    finally:
+        block.close()
+    return values
+
+def _run_shared_chunk(func: Callable, spec: Dict[str, Any], kwargs: Dict[str, Any]) -> Any:
+    """工作进程入口：按SharedFrame.chunk的描述重建Series/DataFrame分块后调用func"""
+    # 显式指定dtype，避免对象列被推断为其他类型
+    index = spec['index']
+    columns = [
+        pd.Series(_read_shared_segment(segment, spec['start'], spec['stop']) if segment is not None else values,
+                  index=index, dtype=dtype, copy=False)
+        for segment, values, dtype in spec['columns']
+    ]
+    if spec['as_series']:
+        chunk = columns[0].rename(spec['labels'][0])
+    else:
+        chunk = pd.DataFrame(dict(enumerate(columns)), index=index)
+        chunk.columns = spec['labels']
+    return func(chunk, **kwargs)
+
 class ParallelProcessor:
-    """并行处理器"""
+    """并行处理器
+    
+    分块结果按输入顺序合并。未指定chunk_size时先在当前线程执行试算块，
+    按测得的每行耗时确定块大小，预计总耗时太短不值得并行时直接串行执行；
+    使用进程池时数值列通过共享内存传给工作进程。
+    """
     
     def __init__(self, max_workers: Optional[int] = None, use_processes: bool = False):
         self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
@@ -396,21 +493,18 @@ class ParallelProcessor:
         if column not in data.columns:
             raise DataProcessingError(f"列不存在: {column}")
         
-        # 分块处理
-        if chunk_size is None:
-            chunk_size = max(1, len(data) // self.max_workers)
+        series = data[column]
         
-        chunks = [data[i:i+chunk_size] for i in range(0, len(data), chunk_size)]
+        def run_local(start, stop):
+            return func(series.iloc[start:stop])
         
-        results = []
-        with self.executor_class(max_workers=self.max_workers) as executor:
-            futures = [executor.submit(func, chunk[column]) for chunk in chunks]
-            for future in as_completed(futures):
-                try:
-                    results.append(future.result())
-                except Exception as e:
-                    logging.error(f"并行处理失败: {e}")
-                    raise DataProcessingError(f"并行处理失败: {e}")
+        def submit(executor, shared, start, stop):
+            if shared is not None:
+                return executor.submit(_run_shared_chunk, func,
+                                       shared.chunk(start, stop, range(1), as_series=True), {})
+            return executor.submit(func, series.iloc[start:stop])
+        
+        results = self._map_chunks(len(data), run_local, submit, chunk_size, series.to_frame())
         
         # 合并结果
         return pd.concat(results, ignore_index=True)
@@ -418,29 +512,25 @@ class ParallelProcessor:
     def _parallel_apply_axis(self, data: pd.DataFrame, func: Callable, 
                             axis: int, chunk_size: Optional[int] = None) -> pd.DataFrame:
         """按轴并行处理"""
-        # 分块处理
-        if chunk_size is None:
-            if axis == 0:  # 按行分块
-                chunk_size = max(1, len(data) // self.max_workers)
-                chunks = [data.iloc[i:i+chunk_size] for i in range(0, len(data), chunk_size)]
-            else:  # 按列分块
-                chunk_size = max(1, len(data.columns) // self.max_workers)
-                chunks = [data.iloc[:, i:i+chunk_size] for i in range(0, len(data.columns), chunk_size)]
-        else:
-            if axis == 0:  # 按行分块
-                chunks = [data.iloc[i:i+chunk_size] for i in range(0, len(data), chunk_size)]
-            else:  # 按列分块
-                chunks = [data.iloc[:, i:i+chunk_size] for i in range(0, len(data.columns), chunk_size)]
+        # 按行分块或按列分块
+        n_items = len(data) if axis == 0 else data.shape[1]
         
-        results = []
-        with self.executor_class(max_workers=self.max_workers) as executor:
-            futures = [executor.submit(func, chunk, axis=axis) for chunk in chunks]
-            for future in as_completed(futures):
-                try:
-                    results.append(future.result())
-                except Exception as e:
-                    logging.error(f"并行处理失败: {e}")
-                    raise DataProcessingError(f"并行处理失败: {e}")
+        def take(start, stop):
+            return data.iloc[start:stop] if axis == 0 else data.iloc[:, start:stop]
+        
+        def run_local(start, stop):
+            return func(take(start, stop), axis=axis)
+        
+        def submit(executor, shared, start, stop):
+            if shared is not None:
+                if axis == 0:
+                    spec = shared.chunk(start, stop)
+                else:
+                    spec = shared.chunk(0, len(data), range(start, stop))
+                return executor.submit(_run_shared_chunk, func, spec, {'axis': axis})
+            return executor.submit(func, take(start, stop), axis=axis)
+        
+        results = self._map_chunks(n_items, run_local, submit, chunk_size, data)
         
         # 合并结果
         if axis == 0:
@@ -448,24 +538,87 @@ class ParallelProcessor:
         else:
             return pd.concat(results, axis=1)
     
+    def _map_chunks(self, n_items: int, run_local: Callable[[int, int], Any],
+                    submit: Callable, chunk_size: Optional[int],
+                    shared_source: pd.DataFrame) -> List[Any]:
+        """把[0, n_items)分块执行，结果按输入顺序返回
+        
+        run_local(start, stop)在当前线程处理一块；submit(executor, shared, start, stop)
+        把一块提交到执行器，使用进程池时shared为shared_source对应的SharedFrame，否则为None。
+        """
+        results = []
+        start = 0
+        if chunk_size is None:
+            if n_items == 0 or self.max_workers <= 1:
+                return [self._call_local(run_local, 0, n_items)]
+            
+            # 试算块：在当前线程从小到大执行，直到一块的耗时足以摊薄每次调用的固定开销，
+            # 由最后一块测出每行耗时；试算块的结果按顺序作为前几块
+            n_chunks = self.max_workers * _CHUNKS_PER_WORKER
+            min_chunk_seconds = _MIN_CHUNK_SECONDS.get(self.executor_class, 0.05)
+            pilot_rows = min(_PILOT_ROWS, max(1, n_items // n_chunks))
+            while start < n_items:
+                stop = min(n_items, start + pilot_rows)
+                pilot_start = time.perf_counter()
+                results.append(self._call_local(run_local, start, stop))
+                elapsed = time.perf_counter() - pilot_start
+                row_seconds = elapsed / (stop - start)
+                start = stop
+                if elapsed >= min_chunk_seconds / 2:
+                    break
+                pilot_rows *= 2
+            
+            remaining = n_items - start
+            if remaining <= 0:
+                return results
+            if row_seconds * remaining < 2 * min_chunk_seconds:
+                # 分不出两个值得调度的块，串行执行更快
+                results.append(self._call_local(run_local, start, n_items))
+                return results
+            chunk_size = max(-(-remaining // n_chunks), int(np.ceil(min_chunk_seconds / row_seconds)))
+        chunk_size = max(1, int(chunk_size))
+        
+        bounds = [(i, min(i + chunk_size, n_items)) for i in range(start, n_items, chunk_size)]
+        with contextlib.ExitStack() as stack:
+            shared = stack.enter_context(SharedFrame(shared_source)) if self.use_processes else None
+            executor = stack.enter_context(self.executor_class(max_workers=self.max_workers))
+            futures = [submit(executor, shared, chunk_start, chunk_stop) for chunk_start, chunk_stop in bounds]
+            try:
+                for future in futures:
+                    results.append(future.result())
+            except Exception as e:
+                for future in futures:
+                    future.cancel()
+                logging.error(f"并行处理失败: {e}")
+                raise DataProcessingError(f"并行处理失败: {e}")
+        
+        return results
+    
+    @staticmethod
+    def _call_local(run_local: Callable[[int, int], Any], start: int, stop: int) -> Any:
+        """在当前线程处理一块，异常与并行执行时一样包装为DataProcessingError"""
+        try:
+            return run_local(start, stop)
+        except Exception as e:
+            logging.error(f"并行处理失败: {e}")
+            raise DataProcessingError(f"并行处理失败: {e}")
+    
     def parallel_groupby_apply(self, data: pd.DataFrame, group_by: List[str], 
                               func: Callable) -> pd.DataFrame:
-        """并行分组应用函数"""
+        """并行分组应用函数，结果按分组顺序合并"""
         if not all(col in data.columns for col in group_by):
             raise DataProcessingError(f"分组列不存在: {group_by}")
         
         # 分组
         groups = data.groupby(group_by)
-        group_keys = list(groups.groups.keys())
         
         # 并行处理每个分组
         results = []
         with self.executor_class(max_workers=self.max_workers) as executor:
-            futures = {executor.submit(func, group): key for key, group in groups}
-            for future in as_completed(futures):
+            futures = [(key, executor.submit(func, group)) for key, group in groups]
+            for key, future in futures:
                 try:
                     result = future.result()
-                    key = futures[future]
                     if isinstance(result, pd.DataFrame):
                         result[group_by] = key
                         results.append(result)
@@ -528,7 +681,7 @@ class OptimizedDataProcessor:
             data_source = source
         
         # 尝试从缓存加载
-        cache_key = f"load_data_{hash(str(source))}_{hash(str(kwargs))}"
+        cache_key = fingerprint_key('load_data', source, kwargs)
         cached_data = self.cache.get(cache_key)
         if cached_data is not None:
             logging.info(f"从缓存加载数据: {source}")
@@ -546,7 +699,7 @@ class OptimizedDataProcessor:
     def preprocess_data(self, data: pd.DataFrame, transformers: List[DataTransformer]) -> pd.DataFrame:
         """预处理数据"""
         # 尝试从缓存加载
-        cache_key = f"preprocess_data_{hash(str(data.values.tobytes()))}_{hash(str([t.get_params() for t in transformers]))}"
+        cache_key = fingerprint_key('preprocess_data', data, transformers)
         cached_data = self.cache.get(cache_key)
         if cached_data is not None:
             logging.info("从缓存加载预处理数据")
@@ -568,7 +721,7 @@ class OptimizedDataProcessor:
                       chunk_size: Optional[int] = None) -> pd.DataFrame:
         """并行应用函数"""
         # 尝试从缓存加载
-        cache_key = f"parallel_apply_{hash(str(data.values.tobytes()))}_{hash(str(func))}_{column}_{axis}_{chunk_size}"
+        cache_key = fingerprint_key('parallel_apply', data, func, column, axis, chunk_size)
         cached_data = self.cache.get(cache_key)
         if cached_data is not None:
             logging.info("从缓存加载并行处理结果")
@@ -587,7 +740,7 @@ class OptimizedDataProcessor:
                               func: Callable) -> pd.DataFrame:
         """并行分组应用函数"""
         # 尝试从缓存加载
-        cache_key = f"parallel_groupby_apply_{hash(str(data.values.tobytes()))}_{hash(str(group_by))}_{hash(str(func))}"
+        cache_key = fingerprint_key('parallel_groupby_apply', data, group_by, func)
         cached_data = self.cache.get(cache_key)
         if cached_data is not None:
             logging.info("从缓存加载并行分组处理结果")
@@ -605,7 +758,7 @@ class OptimizedDataProcessor:
     def execute_pipeline(self, pipeline: DataPipeline, **kwargs) -> pd.DataFrame:
         """执行数据管道"""
         # 尝试从缓存加载
-        cache_key = f"execute_pipeline_{hash(str(pipeline.steps))}_{hash(str(kwargs))}"
+        cache_key = fingerprint_key('execute_pipeline', pipeline.steps, kwargs)
         cached_data = self.cache.get(cache_key)
         if cached_data is not None:
             logging.info("从缓存加载管道执行结果")
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试jichuxitong.CacheManager：内存缓存按最近访问顺序淘汰、按字节数上限淘汰、条目过期；
+磁盘缓存元数据日志的重放与合并、按总字节数淘汰、按过期时间堆清理；DataFrame内容指纹稳定且能区分内容变化；
+cache_result装饰器对同一个键的并发调用只计算一次、缓存None结果、支持async函数并记录每个函数的统计
+"""
+
+import asyncio
+import json
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import jichuxitong
+from jichuxitong import CacheKey, CacheManager, UnfingerprintableError, cache_result, data_fingerprint
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class _Clock:
+    """可手动推进的时钟，替换jichuxitong中的time模块"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_memory_cache_lru_order():
+    """测试命中会刷新访问顺序，超出条目数上限时淘汰最久未访问的条目"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = CacheManager(tmp_dir, memory_size=3)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key.upper(), use_disk=False)
+        assert cache.get('a', use_disk=False) == 'A'
+        cache.set('d', 'D', use_disk=False)
+        assert list(cache.memory_cache) == ['c', 'a', 'd']
+        assert cache.get('b', use_disk=False) is None
+
+        cache.set('c', 'C2', use_disk=False)
+        assert list(cache.memory_cache) == ['a', 'd', 'c']
+        cache.clear('a')
+        assert cache.memory_bytes_used == sum(entry['size'] for entry in cache.memory_cache.values())
+    print("✅ 内存缓存按最近访问顺序淘汰")
+
+
+def test_memory_cache_byte_budget():
+    """测试按DataFrame/数组的实际字节数计算占用，超出字节上限时淘汰，过大的值只保存在磁盘"""
+    frame = pd.DataFrame({'x': np.arange(1000, dtype=np.float64), 'name': ['股票'] * 1000})
+    assert CacheManager.estimate_size(frame) == frame.memory_usage(deep=True).sum()
+    assert CacheManager.estimate_size(np.zeros(500)) == 4000
+    # 自引用和很深的嵌套容器不会无限递归
+    cyclic = [np.zeros(500)]
+    cyclic.append(cyclic)
+    cyclic.append({'self': cyclic})
+    assert 4000 < CacheManager.estimate_size(cyclic) < 5000
+    nested = []
+    for _ in range(10000):
+        nested = [nested]
+    assert CacheManager.estimate_size(nested) > 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = CacheManager(tmp_dir, memory_size=100, memory_bytes=20000)
+        for i in range(5):
+            cache.set(f'array_{i}', np.full(1000, i, dtype=np.float64), use_disk=False)
+        assert list(cache.memory_cache) == ['array_3', 'array_4']
+        assert cache.memory_bytes_used == 16000 <= cache.get_stats()['memory_bytes_limit']
+
+        cache.set('large', np.zeros(5000))
+        assert 'large' not in cache.memory_cache
+        assert list(cache.memory_cache) == ['array_3', 'array_4']
+        np.testing.assert_array_equal(cache.get('large'), np.zeros(5000))
+
+        # 不使用磁盘缓存时过大的值不会被缓存，并给出警告
+        records = []
+        handler = logging.Handler(logging.WARNING)
+        handler.emit = records.append
+        logging.getLogger().addHandler(handler)
+        try:
+            cache.set('large_memory_only', np.zeros(5000), use_disk=False)
+        finally:
+            logging.getLogger().removeHandler(handler)
+        assert cache.get('large_memory_only') is None
+        assert any('不会被缓存' in record.getMessage() for record in records)
+    print("✅ 内存缓存按字节数上限淘汰")
+
+
+def test_memory_cache_ttl():
+    """测试内存缓存条目过期后不再返回，从磁盘载入的条目保留磁盘缓存的过期时间"""
+    clock = _Clock()
+    original_time = jichuxitong.time
+    jichuxitong.time = clock
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = CacheManager(tmp_dir, default_ttl=60)
+            cache.set('memory', 1, use_disk=False, ttl=10)
+            cache.set('disk', 2, ttl=30)
+            cache._remove_from_memory_cache('disk')
+
+            clock.sleep(20)
+            assert cache.get('memory', use_disk=False) is None
+            assert 'memory' not in cache.memory_cache
+            assert cache.get('disk') == 2
+            assert cache.memory_cache['disk']['expires_at'] == 1030.0
+
+            clock.sleep(15)
+            assert cache.get('disk') is None
+            assert cache.memory_bytes_used == 0 and 'disk' not in cache.disk_metadata
+    finally:
+        jichuxitong.time = original_time
+    print("✅ 内存缓存条目按TTL过期")
+
+
+def test_disk_metadata_journal_replay_and_compaction():
+    """测试写入只追加日志，重新打开时重放日志得到相同的元数据，日志达到阈值后合并为快照"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = CacheManager(tmp_dir, memory_size=2, journal_compact_min=10)
+        for i in range(6):
+            cache.set(f'k{i}', i)
+        cache.clear('k1')
+        journal = os.path.join(tmp_dir, 'metadata.journal')
+        with open(journal) as f:
+            assert len(f.readlines()) == cache.get_stats()['journal_entries'] == 7
+        with open(journal, 'a') as f:
+            f.write('{"op": "set", "key": "trunc')
+
+        reopened = CacheManager(tmp_dir, memory_size=2, journal_compact_min=10)
+        assert reopened.disk_metadata == cache.disk_metadata
+        assert reopened.disk_bytes_used == cache.disk_bytes_used
+        assert not os.path.exists(journal)
+        assert reopened.get('k5') == 5 and reopened.get('k1') is None
+
+        for i in range(9):
+            reopened.set(f'k{i % 3}', i)
+        assert reopened.get_stats()['journal_entries'] == 9
+        reopened.set('k0', 9)
+        assert reopened.get_stats()['journal_entries'] == 0
+        with open(os.path.join(tmp_dir, 'metadata.json')) as f:
+            assert json.load(f) == reopened.disk_metadata
+    print("✅ 磁盘缓存元数据日志重放与合并")
+
+
+def test_disk_cache_byte_budget():
+    """测试磁盘缓存按总字节数从最旧的条目开始淘汰，覆盖写入时按新大小计算"""
+    clock = _Clock()
+    original_time = jichuxitong.time
+    jichuxitong.time = clock
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            size = len(pickle.dumps(np.zeros(1000)))
+            cache = CacheManager(tmp_dir, memory_size=1, disk_size=100, disk_bytes=3 * size)
+            for i in range(4):
+                cache.set(f'a{i}', np.zeros(1000))
+                clock.sleep(1)
+            assert sorted(cache.disk_metadata) == ['a1', 'a2', 'a3']
+            assert not os.path.exists(os.path.join(tmp_dir, 'a0.pkl'))
+
+            cache.set('a1', np.zeros(1000))
+            clock.sleep(1)
+            cache.set('a4', np.zeros(1000))
+            assert sorted(cache.disk_metadata) == ['a1', 'a3', 'a4']
+            assert cache.disk_bytes_used == 3 * size == cache.get_stats()['disk_bytes_limit']
+    finally:
+        jichuxitong.time = original_time
+    print("✅ 磁盘缓存按总字节数淘汰")
+
+
+def test_disk_cache_expiry_heap():
+    """测试写入时按过期时间堆删除已过期的磁盘缓存，未过期的条目保留"""
+    clock = _Clock()
+    original_time = jichuxitong.time
+    jichuxitong.time = clock
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = CacheManager(tmp_dir, memory_size=1, default_ttl=100)
+            cache.set('short', 1, ttl=10)
+            cache.set('long', 2, ttl=1000)
+            cache.set('renewed', 3, ttl=10)
+            clock.sleep(5)
+            cache.set('renewed', 4, ttl=100)
+            clock.sleep(20)
+            cache.set('trigger', 5)
+            assert sorted(cache.disk_metadata) == ['long', 'renewed', 'trigger']
+            assert not os.path.exists(os.path.join(tmp_dir, 'short.pkl'))
+            assert cache.get('renewed') == 4
+    finally:
+        jichuxitong.time = original_time
+    print("✅ 磁盘缓存按过期时间堆清理")
+
+
+def _make_frame(n=5000):
+    """构造包含浮点、整数、分类、字符串、日期和可空整数列的数据"""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'x': rng.normal(size=n),
+        'n': rng.integers(0, 9, n),
+        'code': pd.Categorical(rng.choice(['300001', '300002'], n)),
+        'name': pd.Series(rng.choice(['甲', '乙', None], n), dtype=object),
+        'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 100, n), unit='D'),
+        'count': pd.array(rng.integers(0, 5, n), dtype='Int64')
+    })
+
+
+class _Scaler:
+    """按系数缩放，用于检验绑定方法的指纹"""
+
+    def __init__(self, k):
+        self.k = k
+
+    def apply(self, x):
+        return x * self.k
+
+
+class _Window:
+    """没有__dict__的__slots__类"""
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+
+def test_data_fingerprint_detects_changes():
+    """测试内容相同的数据指纹相同，数值、列名、索引、类型任一变化时指纹不同"""
+    df = _make_frame()
+    assert data_fingerprint(df) == data_fingerprint(df.copy())
+    changed = df.copy()
+    changed.iloc[4321, 0] += 1e-12
+    variants = [
+        changed,
+        df.rename(columns={'x': 'y'}),
+        df.set_axis(range(1, len(df) + 1)),
+        df.astype({'n': 'int32'}),
+        df.iloc[:-1],
+        df[['n', 'x', 'code', 'name', 'date', 'count']]
+    ]
+    assert len({data_fingerprint(df)} | {data_fingerprint(v) for v in variants}) == len(variants) + 1
+
+    # 旧的json.dumps(default=str)只比较截断后的字符串，中间行的变化不会改变缓存键
+    assert CacheKey.generate('f', (changed,), {'k': 1}) != CacheKey.generate('f', (df,), {'k': 1})
+    assert data_fingerprint({'a': 1, 'b': [2, 3]}) == data_fingerprint({'b': [2, 3], 'a': 1})
+    assert data_fingerprint(lambda x: x + 1) != data_fingerprint(lambda x: x + 2)
+
+    # 绑定方法区分所绑定的对象，闭包区分捕获的变量值
+    assert data_fingerprint(_Scaler(1).apply) != data_fingerprint(_Scaler(5).apply)
+    assert data_fingerprint(_Scaler(1).apply) == data_fingerprint(_Scaler(1).apply)
+    make_scaler = lambda k: lambda x: x * k
+    assert data_fingerprint(make_scaler(1)) != data_fingerprint(make_scaler(5))
+    assert data_fingerprint(make_scaler(1)) == data_fingerprint(make_scaler(1))
+    assert data_fingerprint([].append) != data_fingerprint([1].append)
+    print("✅ 数据指纹能区分内容、列名、索引和类型的变化")
+
+
+def test_data_fingerprint_uses_object_state():
+    """测试没有__dict__的对象按内容计算指纹而不是按内存地址，没有可读取状态的参数不使用缓存"""
+    assert data_fingerprint(np.random.default_rng(1)) != data_fingerprint(np.random.default_rng(2))
+    assert data_fingerprint(np.random.default_rng(1)) == data_fingerprint(np.random.default_rng(1))
+    assert data_fingerprint(_Window(1, 5)) != data_fingerprint(_Window(1, 6))
+    assert data_fingerprint(_Window(1, 5)) == data_fingerprint(_Window(1, 5))
+    assert data_fingerprint(pd.Timestamp('2024-01-01')) != data_fingerprint(pd.Timestamp('2024-01-02'))
+    try:
+        data_fingerprint(threading.Lock())
+        assert False, "应该抛出UnfingerprintableError"
+    except UnfingerprintableError:
+        pass
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = CacheManager(tmp_dir)
+        calls = []
+
+        @cache_result(cache)
+        def draw(rng, lock=None):
+            calls.append(lock)
+            return rng.random()
+
+        assert draw(np.random.default_rng(1)) == draw(np.random.default_rng(1))
+        assert draw(np.random.default_rng(1)) != draw(np.random.default_rng(2))
+        assert len(calls) == 2
+
+        lock = threading.Lock()
+        draw(np.random.default_rng(1), lock)
+        draw(np.random.default_rng(1), lock)
+        assert calls[2:] == [lock, lock]
+        stats = cache.get_stats()['functions'][draw.__qualname__]
+        assert stats['uncached'] == 2 and stats['misses'] == 2 and stats['hits'] == 2
+    print("✅ 随机数生成器和__slots__对象按状态计算指纹，无法计算指纹的参数不使用缓存")
+
+
+def test_data_fingerprint_stable_across_processes():
+    """测试指纹不依赖进程的哈希随机化，重启后仍能得到相同的缓存键"""
+    probe = (f"import sys; sys.path.insert(0, {PACKAGE_DIR!r}); "
+             "from test_cache_manager import _make_frame; from jichuxitong import data_fingerprint; "
+             "print(data_fingerprint(_make_frame(), {'method': 'ic'}))")
+    digests = {
+        subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True,
+                       env=dict(os.environ, PYTHONHASHSEED=seed)).stdout.strip()
+        for seed in ('1', '2')
+    }
+    assert digests == {data_fingerprint(_make_frame(), {'method': 'ic'})}
+    print("✅ 数据指纹在不同进程中相同")
+
+
+def test_cache_result_single_flight_and_none():
+    """测试多个线程同时请求同一个键时只计算一次，None结果被缓存（重启后从磁盘命中），异常传给所有等待方且不缓存"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = CacheManager(tmp_dir)
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        @cache_result(cache)
+        def load(x):
+            calls.append(x)
+            started.set()
+            release.wait(5)
+            if x < 0:
+                raise ValueError(x)
+            return None if x == 0 else x * 2
+
+        for x, expected in ((1, 2), (0, None)):
+            started.clear()
+            release.clear()
+            with ThreadPoolExecutor(max_workers=6) as executor:
+                futures = [executor.submit(load, x) for _ in range(6)]
+                started.wait(5)
+                release.set()
+                assert [f.result() for f in futures] == [expected] * 6
+        assert calls == [1, 0]
+        assert load(0) is None and calls == [1, 0]
+
+        release.set()
+        for _ in range(2):
+            try:
+                load(-1)
+                assert False, "应该抛出ValueError"
+            except ValueError:
+                pass
+        assert calls == [1, 0, -1, -1]
+
+        stats = cache.get_stats()['functions'][load.__qualname__]
+        # 晚到的线程可能在计算完成后才查找，计为命中
+        assert stats['misses'] == 2 and stats['errors'] == 2 and stats['coalesced'] + stats['hits'] == 11
+        assert stats['avg_misses_seconds'] >= stats['avg_hits_seconds'] and cache.get_stats()['inflight'] == 0
+
+        reopened = CacheManager(tmp_dir)
+        reloaded = cache_result(reopened)(load.__wrapped__)
+        assert reloaded(0) is None and calls == [1, 0, -1, -1]
+    print("✅ 并发调用只计算一次，None结果被缓存")
+
+
+def test_cache_result_async():
+    """测试async函数的并发调用共享一次计算，之后命中缓存"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = CacheManager(tmp_dir)
+        calls = []
+
+        @cache_result(cache, use_disk=False)
+        async def fetch(x):
+            calls.append(x)
+            await asyncio.sleep(0.05)
+            return {'value': x}
+
+        async def run():
+            first = await asyncio.gather(*[fetch(3) for _ in range(5)])
+            return first, await fetch(3)
+
+        first, again = asyncio.run(run())
+        assert first == [{'value': 3}] * 5 and again == {'value': 3}
+        assert calls == [3]
+        stats = cache.get_stats()['functions'][fetch.__qualname__]
+        assert (stats['misses'], stats['coalesced'], stats['hits']) == (1, 4, 1)
+    print("✅ async函数的并发调用共享一次计算")
+
+
+def test_store_failure_returns_result():
+    """测试计算成功但保存到缓存失败时仍返回结果，登记的计算被移除，之后的调用重新计算而不是一直等待"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = CacheManager(tmp_dir)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return [1, 2]
+
+        with mock.patch.object(cache, 'set', side_effect=RecursionError("估算大小失败")):
+            assert cache.get_or_compute('k', compute) == [1, 2]
+            assert cache.get_stats()['inflight'] == 0
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                assert executor.submit(cache.get_or_compute, 'k', compute).result(timeout=5) == [1, 2]
+        assert calls == [1, 1]
+    print("✅ 保存缓存失败时仍返回计算结果")
+
+
+if __name__ == "__main__":
+    test_memory_cache_lru_order()
+    test_memory_cache_byte_budget()
+    test_memory_cache_ttl()
+    test_disk_metadata_journal_replay_and_compaction()
+    test_disk_cache_byte_budget()
+    test_disk_cache_expiry_heap()
+    test_data_fingerprint_detects_changes()
+    test_data_fingerprint_uses_object_state()
+    test_data_fingerprint_stable_across_processes()
+    test_cache_result_single_flight_and_none()
+    test_cache_result_async()
+    test_store_failure_returns_result()
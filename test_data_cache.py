@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试数据文件列式缓存：缓存读取结果与直接解析Excel一致，按大小/修改时间/内容哈希判断缓存是否有效，支持列投影
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from yinzifenxi1119 import FactorAnalysis, load_table_cached
+
+
+def _make_workbook(path, seed=0, n=200):
+    """写入一个含字符串缺失值、日期和整数列的Excel文件"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        '股票代码': rng.integers(300000, 301000, n),
+        '股票名称': rng.choice(['甲', '乙', '丙'], n),
+        '信号日期': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 300, n), unit='D'),
+        '信号发出时上市天数': rng.integers(100, 5000, n),
+        '持股2日收益率': rng.normal(0, 0.05, n)
+    })
+    df['股票名称'] = df['股票名称'].where(rng.random(n) > 0.1)
+    df.to_excel(path, index=False)
+
+
+class _CountingReader:
+    """记录Excel被实际解析的次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        return pd.read_excel(path)
+
+
+def test_cache_matches_read_excel_and_projects_columns():
+    """测试缓存读取结果（全部列和投影列）与直接解析Excel一致，第二次读取不再解析Excel"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'data.xlsx')
+        _make_workbook(path)
+        expected = pd.read_excel(path)
+        reader = _CountingReader()
+
+        first = load_table_cached(path, reader=reader)
+        second = load_table_cached(path, reader=reader)
+        assert reader.calls == 1
+        pd.testing.assert_frame_equal(first, expected)
+        pd.testing.assert_frame_equal(second, expected)
+
+        projected = load_table_cached(path, columns=['信号日期', '股票名称', '不存在的列'], reader=reader)
+        assert reader.calls == 1
+        assert list(projected.columns) == ['股票名称', '信号日期']
+        pd.testing.assert_frame_equal(projected, expected[['股票名称', '信号日期']])
+    print("✅ 缓存读取与直接解析Excel一致，支持列投影")
+
+
+def test_cache_invalidation():
+    """测试文件仅修改时间变化时继续使用缓存，内容变化时重建缓存"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'data.xlsx')
+        _make_workbook(path, seed=1)
+        reader = _CountingReader()
+        load_table_cached(path, reader=reader)
+
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        load_table_cached(path, reader=reader)
+        assert reader.calls == 1
+
+        _make_workbook(path, seed=2)
+        changed = load_table_cached(path, reader=reader)
+        assert reader.calls == 2
+        pd.testing.assert_frame_equal(changed, pd.read_excel(path))
+    print("✅ 缓存按文件大小、修改时间和内容哈希失效")
+
+
+def test_reader_errors_propagate_and_columns_stay_mapped():
+    """测试解析文件失败时直接抛出且只解析一次，损坏的缓存被重建，从缓存读取的数值列直接使用内存映射的数组"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'data.xlsx')
+        _make_workbook(path, seed=4)
+        calls = []
+
+        def broken_reader(file_path):
+            calls.append(file_path)
+            raise ValueError("无法解析")
+
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                load_table_cached(path, reader=broken_reader)
+            assert False, "应该抛出解析错误"
+        except ValueError as e:
+            assert str(e) == "无法解析"
+        assert len(calls) == 1 and '数据缓存不可用' not in output.getvalue()
+
+        reader = _CountingReader()
+        load_table_cached(path, reader=reader)
+        cached = load_table_cached(path, reader=reader)
+        assert reader.calls == 1
+        values = cached['持股2日收益率'].to_numpy()
+        while not isinstance(values, np.memmap) and values.base is not None:
+            values = values.base
+        assert isinstance(values, np.memmap)
+
+        cache_dir = os.path.join(tmp_dir, '.yinzifenxi_cache', 'data.xlsx')
+        with open(os.path.join(cache_dir, 'manifest.json'), 'w') as f:
+            f.write('{损坏')
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            rebuilt = load_table_cached(path, reader=reader)
+        assert reader.calls == 2 and '数据缓存不可用' in output.getvalue()
+        pd.testing.assert_frame_equal(rebuilt, cached)
+        assert load_table_cached(path, reader=reader) is not None and reader.calls == 2
+    print("✅ 解析错误直接抛出，缓存数值列保持内存映射")
+
+
+def test_factor_analysis_load_data_with_projection():
+    """测试FactorAnalysis.load_data按required_columns只读取分析需要的列"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'data.xlsx')
+        _make_workbook(path, seed=3)
+        analyzer = FactorAnalysis(file_path=path)
+        full = analyzer.data
+        assert analyzer.load_data(columns=analyzer.required_columns())
+        assert list(analyzer.data.columns) == [c for c in full.columns if c in analyzer.required_columns()]
+        pd.testing.assert_frame_equal(analyzer.data, full[analyzer.data.columns])
+    print("✅ load_data按需要的列读取数据")
+
+
+if __name__ == "__main__":
+    test_cache_matches_read_excel_and_projects_columns()
+    test_cache_invalidation()
+    test_reader_errors_propagate_and_columns_stay_mapped()
+    test_factor_analysis_load_data_with_projection()
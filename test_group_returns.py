@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试单次排序的分组收益引擎：分组号与逐组生成方式一致，多种等分方式一次计算的结果与单独计算一致，
+参数区间扫描与逐区间分析结果一致，累计和阈值搜索（含二维网格）与逐阈值过滤结果一致
+"""
+
+import contextlib
+import glob
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from yinzifenxi1119 import (
+    FactorAnalysis, quantile_group_labels, sweep_factor_bins, threshold_search, threshold_grid_search,
+    FILTER_OPERATORS
+)
+
+
+def _make_analyzer(seed=0, n=1500):
+    """构造含重复因子值和缺失值的分析对象"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        '信号日期': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 600, n), unit='D'),
+        'x': np.round(rng.normal(size=n), 1),
+        '持股2日收益率': rng.normal(0, 0.05, n)
+    })
+    df.loc[rng.random(n) < 0.05, 'x'] = np.nan
+    analyzer = FactorAnalysis(data=df)
+    analyzer.processed_data = df
+    analyzer.factors = ['x']
+    return analyzer, df
+
+
+def test_quantile_group_labels_match_extend_loop():
+    """测试整数运算的分组号与逐组extend生成的标签一致"""
+    for n_samples in (0, 3, 7, 10, 101, 849):
+        for n_groups in (5, 10, 20):
+            size, remainder = divmod(n_samples, n_groups)
+            expected = []
+            for i in range(n_groups):
+                expected.extend([i + 1] * (size + (1 if i < remainder else 0)))
+            assert list(quantile_group_labels(n_samples, n_groups)) == expected
+    print("✅ 分组号与逐组生成方式一致")
+
+
+def test_group_returns_multi_matches_single_calls():
+    """测试一次计算5/10/20等分的结果与逐个调用calculate_group_returns一致"""
+    analyzer, df = _make_analyzer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tables = analyzer.calculate_group_returns_multi('x', n_groups_list=(5, 10, 20))
+        singles = {n: analyzer.calculate_group_returns('x', n_groups=n) for n in (5, 10, 20)}
+
+    clean = df.dropna(subset=['x']).sort_values('x')
+    for n_groups in (5, 10, 20):
+        pd.testing.assert_frame_equal(tables[n_groups]['avg_returns'], singles[n_groups]['avg_returns'])
+        avg_returns = tables[n_groups]['avg_returns']
+        assert list(avg_returns['分组']) == list(range(1, n_groups + 1))
+        assert avg_returns['样本数量'].sum() == len(clean)
+
+        labels = quantile_group_labels(len(clean), n_groups)
+        expected_mean = clean['持股2日收益率'].groupby(labels).mean().values
+        np.testing.assert_array_equal(avg_returns['平均收益'].values, expected_mean)
+        assert tables[n_groups]['long_short_return'] == expected_mean[-1] - expected_mean[0]
+    print("✅ 多种等分方式一次计算的结果与单独计算一致")
+
+
+def test_group_returns_fills_missing_groups():
+    """测试样本数少于分组数时补齐默认分组记录"""
+    analyzer, _ = _make_analyzer(seed=1, n=8)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = analyzer.calculate_group_returns('x', n_groups=10)
+    avg_returns = result['avg_returns']
+    assert list(avg_returns['分组']) == list(range(1, 11))
+    assert (avg_returns.loc[avg_returns['样本数量'] == 0, '平均收益'] == 0.0).all()
+    print("✅ 缺失分组补齐默认记录")
+
+
+def test_sweep_factor_bins_matches_per_bin_analysis():
+    """测试参数区间扫描与逐区间替换processed_data后重新分析的结果一致，且不修改分析器状态"""
+    analyzer, df = _make_analyzer(seed=2, n=3000)
+    clean = df.dropna(subset=['x']).sort_values('x')
+    n_bins = 10
+    sweep = sweep_factor_bins(df['信号日期'].values, df['x'].values, df['持股2日收益率'].values, n_bins=n_bins)
+    threaded = sweep_factor_bins(df['信号日期'].values, df['x'].values, df['持股2日收益率'].values,
+                                 n_bins=n_bins, max_workers=4)
+    assert sweep == threaded
+    assert sum(p['data_count'] for p in sweep) == len(clean)
+
+    bin_size = len(clean) // n_bins
+    for i, performance in enumerate(sweep):
+        end = len(clean) if i == n_bins - 1 else (i + 1) * bin_size
+        bin_data = clean.iloc[i * bin_size:end]
+        checker = FactorAnalysis(data=bin_data, verbosity=0)
+        checker.processed_data = bin_data
+        with contextlib.redirect_stdout(io.StringIO()):
+            ic_mean, ic_std, _, _, _ = checker.calculate_ic('x')
+            group_results = checker.calculate_group_returns('x')
+        assert performance['factor_min'] == bin_data['x'].min()
+        assert performance['factor_max'] == bin_data['x'].max()
+        assert performance['ic_mean'] == ic_mean
+        assert abs(performance['long_short_return'] - group_results['long_short_return']) < 1e-12
+
+    before = analyzer.processed_data.copy()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyzer.optimize_factor_parameter('x', '>', 0, n_bins=50, max_workers=2)
+        finally:
+            os.chdir(cwd)
+        assert len(pd.read_csv(glob.glob(os.path.join(tmp_dir, '50等分测试_*.csv'))[0])) == 50
+    pd.testing.assert_frame_equal(analyzer.processed_data, before)
+    print("✅ 参数区间扫描与逐区间分析结果一致")
+
+
+def test_threshold_search_matches_mask_per_cut():
+    """测试累计和阈值搜索与逐个阈值用掩码过滤后计算的统计量一致"""
+    _, df = _make_analyzer(seed=3, n=2000)
+    factor = df['x'].values
+    returns = df['持股2日收益率'].values
+    valid = ~np.isnan(factor)
+    for operator in ('>', '>=', '<', '<='):
+        result = threshold_search(factor, returns, operator=operator, min_samples=20)
+        assert len(result['threshold']) > 0
+        for i, threshold in enumerate(result['threshold']):
+            kept = returns[valid & FILTER_OPERATORS[operator](factor, threshold)]
+            assert result['count'][i] == len(kept) >= 20
+            assert abs(result['mean_return'][i] - kept.mean()) < 1e-12
+            assert abs(result['std_return'][i] - kept.std(ddof=1)) < 1e-10
+            assert abs(result['win_rate'][i] - (kept > 0).mean() * 100) < 1e-9
+            assert abs(result['sharpe'][i] - kept.mean() / kept.std(ddof=1)) < 1e-8
+    print("✅ 累计和阈值搜索与逐阈值过滤结果一致")
+
+
+def test_threshold_table_feeds_filtered_analysis():
+    """测试阈值搜索结果表的过滤条件可直接传给run_filtered_factor_analysis，且不修改分析器状态"""
+    analyzer, df = _make_analyzer(seed=4, n=2000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        table = analyzer.search_filter_threshold('x', operator='>=', min_samples=100)
+    assert table['夏普比率'].is_monotonic_decreasing
+    best = table.loc[0]
+    assert (df['x'] >= best['阈值']).sum() == best['样本数']
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert analyzer.run_filtered_factor_analysis(best['过滤条件'])
+        finally:
+            os.chdir(cwd)
+    assert analyzer.processed_data is df
+    results = list(analyzer.filtered_analysis_results.values())[0]
+    assert results['x']['group_results']['avg_returns']['样本数量'].sum() == best['样本数']
+    print("✅ 阈值搜索结果可直接用于带条件的因子分析")
+
+
+def test_threshold_grid_matches_brute_force():
+    """测试二维累计和网格搜索的前top_k个单元与逐单元过滤后全量排序的结果一致"""
+    rng = np.random.default_rng(5)
+    n = 1500
+    factor_a = np.round(rng.normal(size=n), 1)
+    factor_b = rng.integers(0, 25, n).astype(float)
+    returns = rng.normal(0, 0.05, n) + 0.01 * factor_a
+    factor_b[rng.random(n) < 0.05] = np.nan
+    valid = ~np.isnan(factor_b)
+
+    for operator_a, operator_b in (('>', '<='), ('>=', '<'), ('<', '>')):
+        top = threshold_grid_search(factor_a, factor_b, returns, operator_a=operator_a, operator_b=operator_b,
+                                    n_bins=None, min_samples=40, top_k=15, metric='sharpe')
+        expected = []
+        for i, threshold_a in enumerate(np.unique(factor_a)):
+            for j, threshold_b in enumerate(np.unique(factor_b[valid])):
+                kept = returns[valid & FILTER_OPERATORS[operator_a](factor_a, threshold_a)
+                               & FILTER_OPERATORS[operator_b](factor_b, threshold_b)]
+                if len(kept) >= 40:
+                    expected.append((kept.mean() / kept.std(ddof=1), len(kept), threshold_a, threshold_b))
+        expected.sort(key=lambda item: -item[0])
+
+        assert len(top) == 15
+        for cell, (sharpe, count, threshold_a, threshold_b) in zip(top, expected):
+            assert abs(cell['sharpe'] - sharpe) < 1e-9
+            kept = valid & FILTER_OPERATORS[operator_a](factor_a, cell['threshold_a']) \
+                & FILTER_OPERATORS[operator_b](factor_b, cell['threshold_b'])
+            assert cell['count'] == kept.sum()
+            assert abs(cell['mean_return'] - returns[kept].mean()) < 1e-12
+    print("✅ 二维阈值网格搜索与逐单元过滤结果一致")
+
+
+if __name__ == "__main__":
+    test_quantile_group_labels_match_extend_loop()
+    test_group_returns_multi_matches_single_calls()
+    test_group_returns_fills_missing_groups()
+    test_sweep_factor_bins_matches_per_bin_analysis()
+    test_threshold_search_matches_mask_per_cut()
+    test_threshold_table_feeds_filtered_analysis()
+    test_threshold_grid_matches_brute_force()
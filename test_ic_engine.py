@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试向量化IC计算引擎与原有逐日计算结果一致，运行期内IC和分组收益结果的缓存复用，以及多进程因子分析
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from yinzifenxi1119 import (
+    FactorAnalysis, compute_daily_ic, custom_spearman_corr,
+    kendall_tau_corr, kendall_tau_b_grouped,
+    bootstrap_confidence_interval, bootstrap_indices, _bootstrap_statistic, BOOTSTRAP_CHUNK_ELEMENTS,
+    rolling_pooled_ic, rolling_ic_statistics,
+    ICDiagnostics, VERBOSITY_QUIET, VERBOSITY_DEBUG,
+    IC_STATUS_OK, IC_STATUS_INSUFFICIENT, IC_STATUS_FACTOR_VARIABILITY,
+    IC_STATUS_OVERALL_FALLBACK, _factor_analysis_worker, _write_table_cache
+)
+
+
+def _make_panel(seed=0, n_dates=60):
+    """构造每日样本数不等、含重复值和缺失值的测试面板"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for d in pd.date_range('2024-01-01', periods=n_dates):
+        n = int(rng.integers(1, 9))
+        factor = np.round(rng.normal(size=n), 1)
+        ret = rng.normal(size=n)
+        for f, r in zip(factor, ret):
+            rows.append({'信号日期': d, 'f': f, 'r': r})
+    df = pd.DataFrame(rows).sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    df.loc[df.sample(frac=0.05, random_state=seed).index, 'f'] = np.nan
+    return df
+
+
+def test_daily_ic_matches_groupby_loop():
+    """测试每日Spearman IC与逐日custom_spearman_corr结果完全一致"""
+    df = _make_panel()
+    result = compute_daily_ic(df['信号日期'].values, df['f'].values, df['r'].values)
+    min_samples = result['min_samples_per_day']
+
+    for i, (date, group) in enumerate(df.groupby('信号日期')):
+        valid = group.dropna(subset=['f', 'r'])
+        assert result['sample_counts'][i] == len(valid)
+        assert result['factor_nunique'][i] == valid['f'].nunique()
+        if len(valid) < min_samples:
+            assert result['status'][i] == IC_STATUS_INSUFFICIENT
+        elif valid['f'].nunique() < min_samples:
+            assert result['status'][i] in (IC_STATUS_FACTOR_VARIABILITY, IC_STATUS_OVERALL_FALLBACK)
+        else:
+            assert result['status'][i] == IC_STATUS_OK
+            assert result['daily_ic'][i] == custom_spearman_corr(valid['f'], valid['r'])
+    print("✅ 每日IC与逐日计算结果一致")
+
+
+def test_daily_ic_pearson_close_to_corrcoef():
+    """测试Pearson模式与np.corrcoef的结果一致（浮点误差范围内）"""
+    df = _make_panel(seed=1)
+    result = compute_daily_ic(df['信号日期'].values, df['f'].values, df['r'].values, use_pearson=True)
+    for i, (date, group) in enumerate(df.groupby('信号日期')):
+        if result['status'][i] == IC_STATUS_OK:
+            valid = group.dropna(subset=['f', 'r'])
+            expected = np.corrcoef(valid['f'], valid['r'])[0, 1]
+            assert abs(result['daily_ic'][i] - expected) < 1e-12
+    print("✅ Pearson每日IC与np.corrcoef一致")
+
+
+def test_ic_matrix_matches_single_factor():
+    """测试多因子IC矩阵与逐个因子计算结果一致"""
+    df = _make_panel(seed=2)
+    rng = np.random.default_rng(2)
+    df['g'] = rng.normal(size=len(df))
+    df['r2'] = rng.normal(size=len(df))
+    analyzer = FactorAnalysis(data=df)
+    analyzer.processed_data = df
+
+    matrix = analyzer.calculate_ic_matrix(factors=['f', 'g'], return_cols=['r', 'r2'])
+    assert list(matrix['daily_ic'].columns) == [('f', 'r'), ('f', 'r2'), ('g', 'r'), ('g', 'r2')]
+    for (factor, return_col), result in matrix['details'].items():
+        single = compute_daily_ic(df['信号日期'].values, df[factor].values, df[return_col].values)
+        np.testing.assert_array_equal(result['status'], single['status'])
+        np.testing.assert_array_equal(result['daily_ic'], single['daily_ic'])
+    print("✅ 多因子IC矩阵与单因子计算结果一致")
+
+
+def test_kendall_tau_b_matches_scipy():
+    """测试O(n log n) Kendall Tau-b与scipy结果一致（含重复值和分组批量计算）"""
+    from scipy.stats import kendalltau
+
+    rng = np.random.default_rng(3)
+    for _ in range(200):
+        n = int(rng.integers(2, 30))
+        x = rng.integers(0, 4, n).astype(float)
+        y = rng.integers(0, 5, n).astype(float)
+        expected = kendalltau(x, y)[0]
+        actual = kendall_tau_corr(x, y)
+        assert (np.isnan(actual) and np.isnan(expected)) or abs(actual - expected) < 1e-12
+
+    group_ids = np.repeat(np.arange(20), rng.integers(2, 15, 20))
+    x = rng.integers(0, 3, len(group_ids)).astype(float)
+    y = rng.normal(size=len(group_ids))
+    taus = kendall_tau_b_grouped(x, y, group_ids)
+    for g in range(20):
+        expected = kendalltau(x[group_ids == g], y[group_ids == g])[0]
+        assert (np.isnan(taus[g]) and np.isnan(expected)) or abs(taus[g] - expected) < 1e-12
+    print("✅ Kendall Tau-b与scipy结果一致")
+
+
+def test_bootstrap_reproducible_and_methods():
+    """测试Bootstrap置信区间可复现，且各重抽样方式的索引合法"""
+    rng = np.random.default_rng(4)
+    ic = rng.normal(0.05, 0.2, 300)
+    x = rng.normal(size=500)
+    y = 0.3 * x + rng.normal(size=500)
+
+    first = bootstrap_confidence_interval(x, y, n_bootstrap=2000, random_state=7)
+    second = bootstrap_confidence_interval(x, y, n_bootstrap=2000, random_state=7)
+    np.testing.assert_array_equal(first[2], second[2])
+    assert first[0] < np.corrcoef(x, y)[0, 1] < first[1]
+
+    for method in ('iid', 'stationary', 'block'):
+        indices = bootstrap_indices(len(ic), 50, np.random.default_rng(0), method=method)
+        assert indices.shape == (50, len(ic))
+        assert indices.min() >= 0 and indices.max() < len(ic)
+
+        lower, upper, stats = bootstrap_confidence_interval(ic, None, n_bootstrap=2000, random_state=1, method=method)
+        assert len(stats) == 2000
+        assert lower < ic.mean() < upper
+    print("✅ Bootstrap置信区间可复现且各重抽样方式正常")
+
+
+def test_bootstrap_peak_memory_within_chunk_bound():
+    """测试各重抽样方式的峰值内存不超过BOOTSTRAP_CHUNK_ELEMENTS个8字节元素，相关系数与整体计算一致"""
+    rng = np.random.default_rng(6)
+    x = rng.normal(size=20000)
+    y = 0.5 * x + rng.normal(size=20000)
+    bound = BOOTSTRAP_CHUNK_ELEMENTS * 8
+    for method in ('iid', 'stationary', 'block'):
+        for other in (None, y):
+            tracemalloc.start()
+            try:
+                bootstrap_confidence_interval(x, other, n_bootstrap=1000, random_state=2, method=method)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            assert peak < bound * 1.1, (method, other is not None, peak / bound)
+
+    indices = np.tile(np.arange(len(x)), (2, 1))
+    indices[1] = indices[1][::-1]
+    np.testing.assert_allclose(_bootstrap_statistic(x, y, indices, 'correlation'), np.corrcoef(x, y)[0, 1])
+    print("✅ Bootstrap峰值内存不超过分块上限")
+
+
+def test_rolling_pooled_ic_matches_window_loop():
+    """测试多窗口滚动IC与逐窗口筛选后调用custom_spearman_corr的结果一致"""
+    df = _make_panel(seed=5, n_dates=80)
+    window_sizes = [5, 20, 40]
+    result = rolling_pooled_ic(df['信号日期'].values, df['f'].values, df['r'].values, window_sizes)
+
+    unique_dates = sorted(df['信号日期'].unique())
+    for window_size in window_sizes:
+        expected_dates, expected_ics = [], []
+        for i in range(len(unique_dates) - window_size + 1):
+            window_dates = unique_dates[i:i + window_size]
+            window_data = df[df['信号日期'].isin(window_dates)]
+            valid = window_data.dropna(subset=['f', 'r'])
+            if len(window_data) >= window_size * 2 and len(valid) >= window_size:
+                ic = custom_spearman_corr(valid['f'], valid['r'])
+                if np.isfinite(ic):
+                    expected_dates.append(pd.Timestamp(window_dates[-1]))
+                    expected_ics.append(ic)
+        assert list(result[window_size]['dates']) == expected_dates
+        assert list(result[window_size]['ic_values']) == expected_ics
+    print("✅ 多窗口滚动IC与逐窗口计算结果一致")
+
+
+def test_rolling_ic_statistics_matches_pandas():
+    """测试累计和滚动均值/标准差与pandas rolling结果一致"""
+    rng = np.random.default_rng(6)
+    ic = rng.normal(0.02, 0.1, 500)
+    ic[rng.random(500) < 0.1] = np.nan
+    series = pd.Series(ic)
+
+    for min_periods in (None, 10):
+        stats = rolling_ic_statistics(ic, [30, 120], min_periods=min_periods)
+        for window_size in (30, 120):
+            rolling = series.rolling(window_size, min_periods=min_periods)
+            np.testing.assert_allclose(stats[window_size]['mean'], rolling.mean().values, atol=1e-12)
+            np.testing.assert_allclose(stats[window_size]['std'], rolling.std().values, atol=1e-12)
+    print("✅ 滚动IC统计量与pandas rolling一致")
+
+
+def test_ic_diagnostics_counts_and_rendering():
+    """测试结构化诊断记录的计数、按需渲染的说明文字以及输出详细程度"""
+    df = _make_panel(seed=7)
+    result = compute_daily_ic(df['信号日期'].values, df['f'].values, df['r'].values)
+    diagnostics = ICDiagnostics()
+    diagnostics.record('f', result)
+
+    status = result['status']
+    computed = (status == IC_STATUS_OK) | (status == IC_STATUS_OVERALL_FALLBACK)
+    assert diagnostics.processed_dates('f') == computed.sum()
+    assert diagnostics.skipped_dates('f') == (~computed).sum()
+    assert sum(diagnostics.counts('f').values()) == len(status)
+    assert len(list(diagnostics.reasons('f'))) == diagnostics.skipped_dates('f')
+    assert len(diagnostics.events('f')) == (status != IC_STATUS_OK).sum()
+    assert diagnostics.render().startswith('f: ')
+
+    quiet_output = io.StringIO()
+    debug_output = io.StringIO()
+    for verbosity, output in ((VERBOSITY_QUIET, quiet_output), (VERBOSITY_DEBUG, debug_output)):
+        analyzer = FactorAnalysis(data=df, verbosity=verbosity)
+        analyzer.processed_data = df
+        analyzer.return_col = 'r'
+        with contextlib.redirect_stdout(output):
+            analyzer.calculate_ic('f')
+        stats = analyzer.anomaly_stats['ic_calculation']['f']
+        assert stats['skipped_dates'] == diagnostics.skipped_dates('f')
+    assert '调试: daily_ic' not in quiet_output.getvalue()
+    assert debug_output.getvalue().count('调试: daily_ic') == (status == IC_STATUS_OK).sum()
+    print("✅ IC诊断记录计数与按需渲染正确")
+
+
+def test_analysis_memo_reuses_ic_and_group_results():
+    """测试同一版本数据上重复的IC和分组收益计算由缓存返回，结果与重新计算一致，替换数据后缓存失效"""
+    df = _make_panel(seed=8, n_dates=120)
+    analyzer = FactorAnalysis(data=df, verbosity=VERBOSITY_QUIET)
+    analyzer.processed_data = df
+    analyzer.return_col = 'r'
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        full = analyzer.calculate_ic('f', use_robust_corr=True, use_kendall=True, use_nonparam_test=True,
+                                     compute_bootstrap_ci=True, n_bootstrap=200, random_state=1)
+        basic = analyzer.calculate_ic('f')
+        kendall_only = analyzer.calculate_ic('f', use_kendall=True)
+        pearson = analyzer.calculate_ic('f', use_pearson=True)
+        tables = analyzer.calculate_group_returns_multi('f', n_groups_list=(5, 10))
+        ten = analyzer.calculate_group_returns('f', n_groups=10)
+    assert analyzer.memo.stats() == {'ic': {'hits': 2, 'misses': 2},
+                                     'group_returns': {'hits': 1, 'misses': 2}}
+    assert basic[:4] == full[:4] and basic[4] == {}
+    assert set(kendall_only[4]) == {'kendall_tau'} & set(full[4])
+    assert ten is tables[10]
+
+    fresh = FactorAnalysis(data=df, verbosity=VERBOSITY_QUIET)
+    fresh.processed_data = df
+    fresh.return_col = 'r'
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert fresh.calculate_ic('f')[:4] == basic[:4]
+        assert fresh.calculate_ic('f', use_pearson=True)[:4] == pearson[:4]
+
+    # 替换数据（即使是同一个对象）后版本号变化，重新计算
+    analyzer.processed_data = df
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.calculate_ic('f')
+    assert analyzer.memo.stats()['ic'] == {'hits': 2, 'misses': 3}
+    print("✅ IC和分组收益结果在同一版本数据上复用")
+
+
+def _make_analysis_data():
+    """构造含两个因子列和FactorAnalysis所需各列的数据"""
+    df = _make_panel(seed=9, n_dates=150)
+    rng = np.random.default_rng(9)
+    df['g'] = rng.normal(size=len(df))
+    df['持股2日收益率'] = df.pop('r')
+    df['股票代码'] = rng.integers(300000, 301000, len(df))
+    df['股票名称'] = '甲'
+    return df
+
+
+def test_run_factor_analysis_processes_match_serial():
+    """测试多进程因子分析的结果、输出顺序和IC统计与顺序分析一致"""
+    df = _make_analysis_data()
+
+    runs = {}
+    for max_workers in (None, 2):
+        analyzer = FactorAnalysis(data=df, verbosity=VERBOSITY_QUIET)
+        analyzer.factors = ['f', 'g']
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            assert analyzer.preprocess_data()
+            assert analyzer.run_factor_analysis(max_workers=max_workers)
+        runs[max_workers] = (analyzer, [line for line in output.getvalue().splitlines() if 'bootstrap_ci' not in line])
+
+    (serial, serial_lines), (parallel, parallel_lines) = runs[None], runs[2]
+    assert '多进程因子分析失败' not in '\n'.join(parallel_lines)
+    assert parallel_lines == serial_lines
+    assert list(parallel.analysis_results) == list(serial.analysis_results) == ['f', 'g']
+    for factor, expected in serial.analysis_results.items():
+        actual = parallel.analysis_results[factor]
+        np.testing.assert_array_equal([actual[k] for k in ('ic_mean', 'ic_std', 't_stat', 'p_value')],
+                                      [expected[k] for k in ('ic_mean', 'ic_std', 't_stat', 'p_value')])
+        for n_groups, table in expected['group_tables'].items():
+            pd.testing.assert_frame_equal(actual['group_tables'][n_groups]['avg_returns'], table['avg_returns'])
+    assert parallel.anomaly_stats['ic_calculation'] == serial.anomaly_stats['ic_calculation']
+    assert parallel.ic_diagnostics.render() == serial.ic_diagnostics.render()
+
+    # 子进程中的计算结果合并到缓存后，后续计算直接命中
+    with contextlib.redirect_stdout(io.StringIO()):
+        parallel.calculate_ic('g')
+        parallel.calculate_group_returns('g', n_groups=10)
+    assert parallel.memo.stats()['ic']['hits'] == 1 and parallel.memo.stats()['group_returns']['hits'] == 1
+    print("✅ 多进程因子分析结果与顺序分析一致")
+
+
+def test_failed_factor_process_reruns_only_that_factor():
+    """测试子进程中某个因子失败时，其他因子的结果只输出和合并一次，只有失败的因子在本进程中重新分析"""
+    analyzer = FactorAnalysis(data=_make_analysis_data(), verbosity=VERBOSITY_QUIET)
+    analyzer.factors = ['f', 'g']
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        assert analyzer.preprocess_data()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, 'columns')
+            manifest = _write_table_cache(analyzer.processed_data, cache_path, {})
+            f_outcome = _factor_analysis_worker(cache_path, manifest, 'f', '持股2日收益率', False, VERBOSITY_QUIET,
+                                                analyzer._analyze_data_characteristics())
+        outcomes = {'f': f_outcome, 'g': RuntimeError("子进程退出")}
+        with mock.patch.object(FactorAnalysis, '_run_factors_in_processes', return_value=outcomes), \
+                mock.patch.object(analyzer, '_analyze_single_factor',
+                                  wraps=analyzer._analyze_single_factor) as analyze:
+            assert analyzer.run_factor_analysis(max_workers=2)
+
+    text = output.getvalue()
+    assert '多进程因子分析失败' not in text and '因子 g 在子进程中分析失败' in text
+    assert text.count('=== 分析因子: f ===') == 1 and text.count('=== 分析因子: g ===') == 1
+    assert [call.args[0] for call in analyze.call_args_list] == ['g']
+    assert list(analyzer.analysis_results) == ['f', 'g']
+    assert analyzer.analysis_results['f']['ic_mean'] == f_outcome[1]['ic_mean']
+    print("✅ 子进程中失败的因子单独重新分析，其他因子不重复输出")
+
+
+if __name__ == "__main__":
+    test_daily_ic_matches_groupby_loop()
+    test_daily_ic_pearson_close_to_corrcoef()
+    test_ic_matrix_matches_single_factor()
+    test_kendall_tau_b_matches_scipy()
+    test_bootstrap_reproducible_and_methods()
+    test_bootstrap_peak_memory_within_chunk_bound()
+    test_rolling_pooled_ic_matches_window_loop()
+    test_rolling_ic_statistics_matches_pandas()
+    test_ic_diagnostics_counts_and_rendering()
+    test_analysis_memo_reuses_ic_and_group_results()
+    test_run_factor_analysis_processes_match_serial()
+    test_failed_factor_process_reruns_only_that_factor()
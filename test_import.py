@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试模块导入：没有数据文件时也能导入，导入时不加载scipy和matplotlib，模块自身的导入耗时在预算之内
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 模块自身（不含pandas/numpy）的导入耗时预算（秒）
+IMPORT_BUDGET_SECONDS = 0.3
+
+_PROBE = """
+import json, sys, time
+sys.path.insert(0, {package_dir!r})
+start = time.perf_counter()
+import numpy, pandas
+deps_seconds = time.perf_counter() - start
+start = time.perf_counter()
+import yinzifenxi1119
+module_seconds = time.perf_counter() - start
+print(json.dumps({{
+    'deps_seconds': deps_seconds,
+    'module_seconds': module_seconds,
+    'loaded': sorted(name for name in ('scipy', 'matplotlib', 'seaborn') if name in sys.modules)
+}}))
+"""
+
+
+def _probe_import(cwd):
+    """在新的解释器中导入模块，返回导入耗时和已加载的可选依赖"""
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE.format(package_dir=PACKAGE_DIR)],
+        cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_without_data_file_is_lazy():
+    """测试在没有数据文件的目录中导入模块不会退出，且不加载scipy/matplotlib/seaborn"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        _probe_import(tmp_dir)  # 第一次导入可能需要编译字节码
+        result = _probe_import(tmp_dir)
+    assert result['loaded'] == []
+    assert result['module_seconds'] < IMPORT_BUDGET_SECONDS
+    print(f"✅ 导入耗时: pandas/numpy {result['deps_seconds'] * 1000:.0f} ms, "
+          f"yinzifenxi1119 {result['module_seconds'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    test_import_without_data_file_is_lazy()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试带缓冲的Logger：内容完整、close()时全部写入，以及与逐次打开文件写入方式的吞吐量对比
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from yinzifenxi1119 import Logger
+
+
+class _OpenPerWriteLogger:
+    """原有的日志写入方式：每次write都以追加模式打开并关闭文件（仅用于吞吐量对比）"""
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.terminal = sys.stdout
+        with open(self.log_file, 'w', encoding='utf-8') as f:
+            f.write("")
+
+    def write(self, message):
+        self.terminal.write(message)
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(message)
+
+    def close(self):
+        pass
+
+
+def _write_lines(logger, n_lines):
+    start = time.perf_counter()
+    for i in range(n_lines):
+        logger.write(f"  日期 2024-01-01: IC = {i * 0.001:.6f}, 样本数 = 12\n")
+    logger.close()
+    return time.perf_counter() - start
+
+
+def test_logger_writes_everything_on_close():
+    """测试缓冲区内容在close()时全部写入，且close()可重复调用"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = os.path.join(tmp_dir, 'log.txt')
+        with contextlib.redirect_stdout(io.StringIO()) as terminal:
+            logger = Logger(log_file, buffer_size=1 << 20, flush_interval=None)
+            for i in range(1000):
+                logger.write(f"第{i}行\n")
+            logger.close()
+            logger.close()
+
+        with open(log_file, encoding='utf-8') as f:
+            content = f.read()
+        assert terminal.getvalue() == ''.join(f"第{i}行\n" for i in range(1000))
+        assert ''.join(f"第{i}行\n" for i in range(1000)) in content
+        assert content.count("日志记录结束") == 1
+    print("✅ Logger在close()时写入全部缓冲内容")
+
+
+def test_logger_background_flush():
+    """测试后台线程按时间间隔把缓冲区写入文件"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = os.path.join(tmp_dir, 'log.txt')
+        with contextlib.redirect_stdout(io.StringIO()):
+            logger = Logger(log_file, buffer_size=1 << 20, flush_interval=0.05)
+            logger.write("后台写入测试\n")
+            deadline = time.time() + 5
+            while time.time() < deadline:
+                with open(log_file, encoding='utf-8') as f:
+                    if "后台写入测试" in f.read():
+                        break
+                time.sleep(0.02)
+            with open(log_file, encoding='utf-8') as f:
+                assert "后台写入测试" in f.read()
+            logger.close()
+    print("✅ Logger后台线程定时写入")
+
+
+def test_logger_throughput():
+    """对比带缓冲Logger与逐次打开文件写入方式的吞吐量"""
+    n_lines = 20000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            old_seconds = _write_lines(_OpenPerWriteLogger(os.path.join(tmp_dir, 'old.txt')), n_lines)
+            new_seconds = _write_lines(Logger(os.path.join(tmp_dir, 'new.txt')), n_lines)
+
+        with open(os.path.join(tmp_dir, 'new.txt'), encoding='utf-8') as f:
+            assert f.read().count("样本数 = 12") == n_lines
+
+    print(f"✅ 写入{n_lines}行: 逐次打开文件 {n_lines / old_seconds:,.0f} 行/秒, "
+          f"带缓冲Logger {n_lines / new_seconds:,.0f} 行/秒 ({old_seconds / new_seconds:.1f}倍)")
+
+
+if __name__ == "__main__":
+    test_logger_writes_everything_on_close()
+    test_logger_background_flush()
+    test_logger_throughput()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试shujuchuli.ParallelProcessor：串行、线程池和进程池的分块结果按输入顺序合并且与整体计算一致，
+按试算块的每行耗时确定块大小、耗时很短时直接串行，进程池通过共享内存读取数值列；
+并在因子列上比较三种方式的耗时
+"""
+
+import os
+import sys
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jichuxitong import DataProcessingError
+from shujuchuli import ParallelProcessor, SharedFrame, _run_shared_chunk
+
+FACTOR_COLUMNS = [
+    '信号发出时上市天数', '日最大跌幅百分比', '信号当日收盘涨跌幅', '信号后一日开盘涨跌幅',
+    '次日开盘后总体下跌幅度', '前10日最大涨幅', '当日回调'
+]
+
+
+def _make_factor_data(n=2000, seed=0):
+    """构造含因子列、日期列和对象列，且索引不是默认RangeIndex的数据"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({col: rng.normal(0, 0.05, n) for col in FACTOR_COLUMNS})
+    df['信号发出时上市天数'] = rng.integers(100, 5000, n)
+    df['信号日期'] = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 300, n), unit='D')
+    df['股票名称'] = pd.Series(rng.choice(['甲', '乙', '丙'], n), dtype=object)
+    df.index = rng.permutation(n) + 10000
+    return df
+
+
+def _first_chunk_slowest(series):
+    """包含首行的块最慢，使完成顺序与输入顺序相反"""
+    if series.index[0] == _FIRST_LABEL:
+        time.sleep(0.2)
+    return series * 2
+
+
+def _frame_rows(chunk, axis=0):
+    """逐行把对象列和日期列拼入结果，检验分块重建后的列类型"""
+    return pd.DataFrame({
+        'label': chunk['股票名称'] + chunk['信号日期'].dt.strftime('%m%d'),
+        'total': chunk[FACTOR_COLUMNS].sum(axis=1)
+    }, index=chunk.index)
+
+
+def _frame_columns(chunk, axis=1):
+    """按列标准化"""
+    return (chunk - chunk.mean()) / chunk.std()
+
+
+def _scaled_rank(series):
+    """逐个元素的Python计算，每行有可测量的耗时"""
+    return series.map(lambda v: round(float(np.tanh(v * 10)), 6))
+
+
+def _fail(series):
+    """总是失败"""
+    raise ValueError("分块计算失败")
+
+
+_FIRST_LABEL = _make_factor_data().index[0]
+
+
+class _FakeClock:
+    """代替time.perf_counter的时钟，只在分块函数处理数据时按固定的每行耗时前进"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        with self.lock:
+            self.now += seconds
+
+
+class _CostedFunc:
+    """记录每次处理的行数，并让时钟按每行row_seconds前进"""
+
+    def __init__(self, clock, row_seconds):
+        self.clock = clock
+        self.row_seconds = row_seconds
+        self.sizes = []
+
+    def __call__(self, series):
+        self.sizes.append(len(series))
+        self.clock.advance(len(series) * self.row_seconds)
+        return series + 1
+
+
+def _processors():
+    return {
+        'serial': ParallelProcessor(max_workers=1),
+        'thread': ParallelProcessor(max_workers=4),
+        'process': ParallelProcessor(max_workers=2, use_processes=True)
+    }
+
+
+def test_results_keep_input_order():
+    """测试各种方式下先完成的后面的块不会排到前面，结果与整体计算一致"""
+    df = _make_factor_data()
+    expected = df['日最大跌幅百分比'] * 2
+    for mode, processor in _processors().items():
+        result = processor.parallel_apply(df, _first_chunk_slowest, column='日最大跌幅百分比', chunk_size=300)
+        np.testing.assert_array_equal(result.values, expected.values)
+
+        rows = processor.parallel_apply(df, _frame_rows, axis=0, chunk_size=300)
+        pd.testing.assert_frame_equal(rows, _frame_rows(df).reset_index(drop=True))
+
+        factors = df[FACTOR_COLUMNS]
+        columns = processor.parallel_apply(factors, _frame_columns, axis=1, chunk_size=2)
+        pd.testing.assert_frame_equal(columns, _frame_columns(factors))
+    print("✅ 串行、线程池和进程池的结果都按输入顺序合并")
+
+
+def test_adaptive_chunk_size():
+    """测试按试算块测得的每行耗时确定分块：耗时很短时试算块逐步加倍直到处理完全部数据，
+    耗时较长时第一个试算块之后按max_workers*4块均分（时钟固定，与机器负载无关）"""
+    df = _make_factor_data(n=20000)
+    processor = ParallelProcessor(max_workers=4)
+    clock = _FakeClock()
+    with mock.patch('shujuchuli.time.perf_counter', clock):
+        cheap = _CostedFunc(clock, row_seconds=1e-8)
+        result = processor.parallel_apply(df, cheap, column='当日回调')
+        costly = _CostedFunc(clock, row_seconds=1e-4)
+        processor.parallel_apply(df, costly, column='当日回调')
+        # 线程池每块至少5 ms：均分的块太小时块大小由最短耗时决定（每行2**-15秒，5 ms约164行）
+        medium = _CostedFunc(clock, row_seconds=2 ** -15)
+        processor.parallel_apply(df.iloc[:2000], medium, column='当日回调')
+
+    np.testing.assert_array_equal(result.values, (df['当日回调'] + 1).values)
+    assert cheap.sizes == [256, 512, 1024, 2048, 4096, 8192, 3872]
+    assert costly.sizes[0] == 256 and sorted(costly.sizes[1:]) == [1234] * 16
+    assert medium.sizes[0] == 125 and sorted(medium.sizes[1:]) == [71] + [164] * 11
+    print(f"✅ 自适应分块: 短计算 {len(cheap.sizes)} 块, 长计算 {len(costly.sizes)} 块")
+
+
+def test_shared_frame_chunks():
+    """测试从共享内存重建的行分块、列分块与直接切片一致，非数值列随任务传入"""
+    df = _make_factor_data(n=50)
+    with SharedFrame(df) as shared:
+        rebuilt = _run_shared_chunk(lambda chunk: chunk, shared.chunk(10, 20), {})
+        pd.testing.assert_frame_equal(rebuilt, df.iloc[10:20])
+        rebuilt = _run_shared_chunk(lambda chunk: chunk, shared.chunk(0, len(df), range(2, 4)), {})
+        pd.testing.assert_frame_equal(rebuilt, df.iloc[:, 2:4])
+        spec = shared.chunk(5, 8, range(df.columns.get_loc('当日回调'), df.columns.get_loc('当日回调') + 1),
+                            as_series=True)
+        pd.testing.assert_series_equal(_run_shared_chunk(lambda s: s, spec, {}), df['当日回调'].iloc[5:8])
+        assert spec['columns'][0][1] is None
+        assert shared.chunk(0, 5)['columns'][-1][1] is not None
+    print("✅ 共享内存分块与直接切片一致")
+
+
+def test_errors_are_wrapped():
+    """测试试算块和并行块中的异常都包装为DataProcessingError"""
+    df = _make_factor_data(n=100)
+    for processor in _processors().values():
+        for chunk_size in (None, 10):
+            try:
+                processor.parallel_apply(df, _fail, column='当日回调', chunk_size=chunk_size)
+                assert False, "应该抛出DataProcessingError"
+            except DataProcessingError as e:
+                assert '分块计算失败' in str(e)
+    print("✅ 分块计算中的异常包装为DataProcessingError")
+
+
+def test_benchmark_modes_on_factor_columns():
+    """在因子列上比较串行、线程池和进程池的耗时，三种方式的结果一致"""
+    df = _make_factor_data(n=20000, seed=1)
+    timings = {}
+    baseline = None
+    for mode, processor in _processors().items():
+        start = time.perf_counter()
+        results = [processor.parallel_apply(df, _scaled_rank, column=col) for col in FACTOR_COLUMNS]
+        timings[mode] = time.perf_counter() - start
+        if baseline is None:
+            baseline = results
+        for result, expected in zip(results, baseline):
+            np.testing.assert_array_equal(result.values, expected.values)
+    print("✅ 因子列耗时: " + ", ".join(f"{mode} {seconds * 1000:.0f} ms" for mode, seconds in timings.items()))
+
+
+if __name__ == "__main__":
+    test_results_keep_input_order()
+    test_adaptive_chunk_size()
+    test_shared_frame_chunks()
+    test_errors_are_wrapped()
+    test_benchmark_modes_on_factor_columns()
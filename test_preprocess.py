@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试共用的数据预处理：百分比字符串一次解析的结果与逐列转换一致，分类类型和日序号正确，
+两个分析器通过PreparedDataset共用预处理结果而不重复解析、不复制数据
+"""
+
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from yinzifenxi1119 import (
+    FactorAnalysis, ParameterizedFactorAnalyzer, PreparedDataset, prepare_analysis_data,
+    PERCENTAGE_COLUMNS, SIGNAL_DAY_COL
+)
+
+
+def _make_raw_data(seed=0, n=300):
+    """构造百分比列为字符串（含缺失值和无法解析的值）的原始数据"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        '股票代码': rng.choice([300001, 300002, 300003, 300004], n),
+        '股票名称': pd.Series(rng.choice(['甲', '乙', '丙', '丁'], n), dtype=object),
+        '信号日期': (pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 500, n), unit='D')).astype(str),
+        '信号发出时上市天数': rng.integers(100, 5000, n)
+    })
+    for col in PERCENTAGE_COLUMNS:
+        df[col] = pd.Series([f"{v:.2f}%" for v in rng.normal(0, 5, n)], dtype=object)
+    df.loc[rng.random(n) < 0.05, '当日回调'] = np.nan
+    df.loc[3, '前10日最大涨幅'] = 'abc%'
+    return df
+
+
+def test_percent_parsing_matches_per_column_conversion():
+    """测试一次解析所有百分比列的结果与逐列astype(str)+to_numeric的结果一致，且不修改输入"""
+    raw = _make_raw_data()
+    original = raw.copy()
+    df, report = prepare_analysis_data(raw, ['信号发出时上市天数', '当日回调'], '持股2日收益率')
+
+    pd.testing.assert_frame_equal(raw, original)
+    assert report['percent_columns'] == PERCENTAGE_COLUMNS
+    for col in PERCENTAGE_COLUMNS:
+        expected = pd.to_numeric(raw[col].astype(str).str.replace('%', ''), errors='coerce') / 100
+        np.testing.assert_array_equal(df[col].values, expected.values)
+    assert np.isnan(df.loc[3, '前10日最大涨幅'])
+    assert report['memory_after'] < report['memory_before']
+    print("✅ 百分比字符串一次解析结果与逐列转换一致")
+
+
+def test_categories_and_day_numbers():
+    """测试标识列转为分类类型、日序号与信号日期一致，已处理的数据原样返回"""
+    raw = _make_raw_data(seed=1)
+    df, report = prepare_analysis_data(raw, ['信号发出时上市天数'], '持股2日收益率')
+
+    assert set(report['category_columns']) == {'股票代码', '股票名称'}
+    assert list(df['股票名称'].astype(object)) == list(raw['股票名称'])
+    dates = pd.to_datetime(raw['信号日期'])
+    expected_days = (dates - pd.Timestamp('1970-01-01')).dt.days.values
+    np.testing.assert_array_equal(df[SIGNAL_DAY_COL].values, expected_days)
+
+    again, again_report = prepare_analysis_data(df, ['信号发出时上市天数'], '持股2日收益率')
+    assert again is df
+    assert again_report['percent_columns'] == [] and again_report['category_columns'] == []
+    print("✅ 分类类型和日序号正确，已处理数据不重复解析")
+
+
+def test_prepared_dataset_masks_and_versions():
+    """测试数据集的有效值掩码筛选与dropna一致、数组只读、版本号唯一"""
+    raw = _make_raw_data(seed=3)
+    dataset = PreparedDataset.from_data(raw, ['信号发出时上市天数', '当日回调'], '持股2日收益率')
+    assert PreparedDataset.from_data(dataset, [], '持股2日收益率') is dataset
+    assert dataset.is_derived_from(raw) and dataset.is_derived_from(dataset.frame)
+
+    columns = ['持股2日收益率', '当日回调', '前10日最大涨幅']
+    view = dataset.view(columns)
+    pd.testing.assert_frame_equal(view, dataset.frame.dropna(subset=columns))
+    assert dataset.view(columns) is view
+    assert dataset.valid_mask(columns).sum() == len(view)
+    assert not dataset.column('当日回调').flags.writeable
+
+    other = PreparedDataset.from_data(raw, ['信号发出时上市天数'], '持股2日收益率')
+    assert other.version != dataset.version
+    print("✅ 数据集掩码筛选与dropna一致，数组只读，版本号唯一")
+
+
+def test_analyzers_share_prepared_data():
+    """测试ParameterizedFactorAnalyzer使用FactorAnalysis的数据集时共用同一份有效数据，且不修改共享数据"""
+    raw = _make_raw_data(seed=2)
+    analyzer = FactorAnalysis(data=raw)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert analyzer.preprocess_data()
+    prepared = analyzer.dataset.frame
+    snapshot = prepared.copy()
+
+    parameterized = ParameterizedFactorAnalyzer(analyzer.dataset)
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        assert parameterized.preprocess_data()
+    assert '已转换列' not in output.getvalue()
+    assert parameterized.dataset is analyzer.dataset
+    assert parameterized.processed_data is analyzer.processed_data
+    expected = prepared.dropna(subset=[analyzer.return_col] + analyzer.factors)
+    pd.testing.assert_frame_equal(analyzer.processed_data, expected)
+    pd.testing.assert_frame_equal(prepared, snapshot)
+
+    standalone = ParameterizedFactorAnalyzer(raw)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert standalone.preprocess_data()
+    pd.testing.assert_frame_equal(standalone.processed_data, analyzer.processed_data)
+    print("✅ 两个分析器共用预处理结果")
+
+
+if __name__ == "__main__":
+    test_percent_parsing_matches_per_column_conversion()
+    test_categories_and_day_numbers()
+    test_prepared_dataset_masks_and_versions()
+    test_analyzers_share_prepared_data()
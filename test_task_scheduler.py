@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试jichuxitong.DAGTaskScheduler：按依赖和优先级执行、失败/取消的任务的后继被跳过、
+短任务链没有轮询延迟、10000个节点的DAG的每任务调度开销；
+带超时的线程任务不会占满线程池，进程任务在工作进程中执行、超时或取消时终止工作进程
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jichuxitong import DAGTaskScheduler, ExecutionMode, Task, TaskCancelledError, TaskProcessPool, TaskStatus
+
+
+class _RecordingTask(Task):
+    """记录执行顺序的任务，fail=True时抛出异常"""
+
+    def __init__(self, task_id, order, fail=False, **kwargs):
+        super().__init__(task_id, **kwargs)
+        self.order = order
+        self.fail = fail
+
+    def execute(self, context=None):
+        self.order.append(self.task_id)
+        if self.fail:
+            raise RuntimeError(f"{self.task_id} 失败")
+        return self.task_id
+
+
+class _SleepTask(Task):
+    """等待指定秒数后返回执行所在的进程号，并在元数据中记录"""
+
+    def __init__(self, task_id, seconds, **kwargs):
+        super().__init__(task_id, **kwargs)
+        self.seconds = seconds
+
+    def execute(self, context=None):
+        self.set_metadata('started', True)
+        time.sleep(self.seconds)
+        self.set_metadata('pid', os.getpid())
+        return os.getpid()
+
+
+def _build(edges, max_workers=1, priorities=None, failing=()):
+    """按(任务, 依赖的任务)列表构造调度器"""
+    order = []
+    priorities = priorities or {}
+    scheduler = DAGTaskScheduler(max_workers=max_workers)
+    task_ids = sorted({task_id for edge in edges for task_id in edge})
+    for task_id in task_ids:
+        scheduler.add_task(_RecordingTask(task_id, order, fail=task_id in failing,
+                                          priority=priorities.get(task_id, 0)))
+    for task_id, depends_on in edges:
+        scheduler.add_dependency(task_id, depends_on)
+    return scheduler, order
+
+
+def test_dependencies_and_priority_order():
+    """测试任务在依赖完成后执行，就绪任务按优先级从高到低执行"""
+    edges = [('b', 'a'), ('c', 'a'), ('d', 'a'), ('e', 'b'), ('e', 'c'), ('f', 'd')]
+    scheduler, order = _build(edges, priorities={'b': 1, 'c': 5, 'd': 3, 'f': 10})
+    results = scheduler.run()
+    assert order == ['a', 'c', 'd', 'f', 'b', 'e']
+    assert all(result.status == TaskStatus.COMPLETED for result in results.values())
+    assert scheduler.get_stats()['completed_tasks'] == 6
+    print("✅ 任务按依赖和优先级执行")
+
+
+def test_failed_and_cancelled_tasks_skip_dependents():
+    """测试失败或取消的任务的所有后继任务被跳过，不相关的分支照常执行"""
+    edges = [('b', 'a'), ('c', 'b'), ('d', 'c'), ('y', 'x'), ('z', 'y'), ('q', 'p')]
+    scheduler, order = _build(edges, max_workers=2, failing={'b'})
+    scheduler.cancel_task('y')
+    results = scheduler.run()
+
+    assert results['b'].status == TaskStatus.FAILED
+    assert results['y'].status == TaskStatus.CANCELLED
+    for task_id in ('c', 'd', 'z'):
+        assert results[task_id].status == TaskStatus.SKIPPED
+        assert 'skip_reason' in results[task_id].metadata
+    assert sorted(order) == ['a', 'b', 'p', 'q', 'x']
+    stats = scheduler.get_stats()
+    assert (stats['failed_tasks'], stats['cancelled_tasks'], stats['skipped_tasks']) == (1, 1, 3)
+    assert stats['pending_tasks'] == 0
+    print("✅ 失败或取消的任务的后继任务被跳过")
+
+
+def test_scheduler_can_run_again():
+    """测试同一个调度器可以再次运行：已完成的任务不重复执行，新任务依赖上次失败的任务时被跳过"""
+    scheduler, order = _build([('b', 'a')], max_workers=2, failing={'x'})
+    scheduler.add_task(_RecordingTask('x', order, fail=True))
+    scheduler.run()
+
+    scheduler.add_task(_RecordingTask('c', order))
+    scheduler.add_task(_RecordingTask('y', order))
+    scheduler.add_dependency('c', 'b')
+    scheduler.add_dependency('y', 'x')
+    results = scheduler.run()
+    assert sorted(order) == ['a', 'b', 'c', 'x']
+    assert results['c'].status == TaskStatus.COMPLETED
+    assert results['y'].status == TaskStatus.SKIPPED
+    assert all(task.status != TaskStatus.RUNNING for task in scheduler.tasks.values())
+    print("✅ 调度器可以再次运行")
+
+
+def test_event_handlers_can_query_scheduler():
+    """测试跳过和取消事件在释放调度器的锁后触发，事件处理器中查询调度器不会死锁"""
+    scheduler, order = _build([('b', 'a'), ('c', 'b'), ('y', 'x')], max_workers=2, failing={'a'})
+    seen = []
+
+    def record(task, result):
+        seen.append((task.task_id, result.status, scheduler.get_stats()['skipped_tasks']))
+
+    scheduler.add_event_handler('task_skipped', record)
+    scheduler.add_event_handler('task_cancelled', record)
+    scheduler.cancel_task('x')
+    runner = threading.Thread(target=scheduler.run, daemon=True)
+    runner.start()
+    runner.join(10)
+    assert not runner.is_alive(), "事件处理器查询调度器时死锁"
+
+    # y在开始调度时跳过，b和c在a失败后一起跳过
+    assert seen[:2] == [('x', TaskStatus.CANCELLED, 0), ('y', TaskStatus.SKIPPED, 1)]
+    assert sorted(seen[2:]) == [('b', TaskStatus.SKIPPED, 3), ('c', TaskStatus.SKIPPED, 3)]
+    print("✅ 事件处理器可以查询调度器")
+
+
+def test_short_task_chain_has_no_polling_delay():
+    """测试200个短任务组成的依赖链在完成事件驱动下执行，不为每一层付出固定的等待时间"""
+    edges = [(f't{i:03d}', f't{i - 1:03d}') for i in range(1, 200)]
+    scheduler, order = _build(edges, max_workers=2)
+    start = time.perf_counter()
+    scheduler.run()
+    elapsed = time.perf_counter() - start
+    assert order == [f't{i:03d}' for i in range(200)]
+    assert elapsed < 2.0
+    print(f"✅ 200层依赖链耗时 {elapsed * 1000:.0f} ms")
+
+
+def test_large_dag_scheduling_overhead():
+    """测试10000个节点的分层DAG（每层100个任务，每个任务依赖上一层的两个任务）的每任务调度开销"""
+    logging.disable(logging.INFO)
+    try:
+        n_tasks, width = 10000, 100
+        edges = []
+        for i in range(width, n_tasks):
+            edges.append((f'n{i}', f'n{i - width}'))
+            edges.append((f'n{i}', f'n{i - width + 1 if (i + 1) % width else i - 2 * width + 1}'))
+        scheduler, order = _build(edges, max_workers=4)
+        start = time.perf_counter()
+        scheduler.run()
+        elapsed = time.perf_counter() - start
+    finally:
+        logging.disable(logging.NOTSET)
+
+    assert len(order) == n_tasks and scheduler.get_stats()['completed_tasks'] == n_tasks
+    position = {task_id: i for i, task_id in enumerate(order)}
+    assert all(position[depends_on] < position[task_id] for task_id, depends_on in edges)
+    assert elapsed < 30
+    print(f"✅ 10000个节点的DAG: {elapsed:.2f} s, 每任务 {elapsed / n_tasks * 1e6:.0f} µs")
+
+
+def test_pause_and_resume():
+    """测试暂停期间不提交新任务，恢复后继续执行"""
+    edges = [('b', 'a'), ('c', 'b')]
+    scheduler, order = _build(edges)
+    scheduler.pause()
+    runner = threading.Thread(target=scheduler.run)
+    runner.start()
+    time.sleep(0.2)
+    assert order == []
+    scheduler.resume()
+    runner.join(5)
+    assert not runner.is_alive() and order == ['a', 'b', 'c']
+    print("✅ 暂停和恢复调度")
+
+
+def test_thread_timeouts_do_not_starve_pool():
+    """测试所有任务都带超时时不会因为在同一个线程池中等待自己而全部超时，超时的任务记为失败"""
+    scheduler = DAGTaskScheduler(max_workers=2)
+    for i in range(6):
+        scheduler.add_task(_SleepTask(f'quick{i}', 0.05, timeout=5))
+    scheduler.add_task(_SleepTask('slow', 2, timeout=0.2))
+    scheduler.add_task(_SleepTask('after_slow', 0, timeout=5))
+    scheduler.add_dependency('after_slow', 'slow')
+
+    start = time.perf_counter()
+    results = scheduler.run()
+    assert all(results[f'quick{i}'].status == TaskStatus.COMPLETED for i in range(6))
+    assert results['slow'].status == TaskStatus.FAILED and isinstance(results['slow'].error, TimeoutError)
+    assert results['after_slow'].status == TaskStatus.SKIPPED
+    assert time.perf_counter() - start < 2
+
+    # 多个超时任务的线程仍在运行时，后面的带超时任务照常开始执行，各自从开始执行时计时
+    scheduler = DAGTaskScheduler(max_workers=2)
+    for i in range(4):
+        scheduler.add_task(_SleepTask(f'hung{i}', 1, timeout=0.3))
+    scheduler.add_task(_SleepTask('quick', 0.05, timeout=0.3))
+    results = scheduler.run()
+    for i in range(4):
+        assert results[f'hung{i}'].status == TaskStatus.FAILED
+        assert isinstance(results[f'hung{i}'].error, TimeoutError)
+        assert results[f'hung{i}'].metadata.get('started')
+        assert results[f'hung{i}'].execution_time >= 0.29
+    assert results['quick'].status == TaskStatus.COMPLETED
+    print("✅ 带超时的线程任务不占满线程池")
+
+
+def test_process_tasks_timeout_and_cancel():
+    """测试进程任务在工作进程中执行并传回元数据，超时和取消时终止工作进程，之后的任务使用新的工作进程"""
+    scheduler = DAGTaskScheduler(max_workers=2, process_workers=2)
+    scheduler.add_task(_SleepTask('cpu', 0, execution=ExecutionMode.PROCESS))
+    scheduler.add_task(_SleepTask('hang', 60, timeout=0.5, execution=ExecutionMode.PROCESS))
+    scheduler.add_task(_SleepTask('cancelled', 60, execution=ExecutionMode.PROCESS))
+    scheduler.add_task(_SleepTask('after_hang', 0, execution=ExecutionMode.PROCESS))
+    scheduler.add_task(_SleepTask('after_cancel', 0))
+    scheduler.add_dependency('after_hang', 'hang')
+    scheduler.add_dependency('after_cancel', 'cancelled')
+    scheduler.add_dependency('cancelled', 'cpu')
+
+    def cancel_when_running(task, result):
+        if task.task_id == 'cancelled':
+            threading.Timer(0.5, scheduler.cancel_task, args=('cancelled',)).start()
+
+    scheduler.add_event_handler('task_start', cancel_when_running)
+    start = time.perf_counter()
+    results = scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    assert results['cpu'].status == TaskStatus.COMPLETED
+    assert results['cpu'].result != os.getpid() and results['cpu'].metadata['pid'] == results['cpu'].result
+    assert results['hang'].status == TaskStatus.FAILED and isinstance(results['hang'].error, TimeoutError)
+    assert results['after_hang'].status == TaskStatus.SKIPPED
+    assert results['cancelled'].status == TaskStatus.CANCELLED
+    assert isinstance(results['cancelled'].error, TaskCancelledError)
+    assert results['after_cancel'].status == TaskStatus.SKIPPED
+    assert scheduler.get_stats()['cancelled_tasks'] == 1
+    assert elapsed < 30
+    print(f"✅ 进程任务超时和取消时终止工作进程，耗时 {elapsed:.1f} s")
+
+
+def test_process_pool_replaces_killed_workers():
+    """测试超时终止工作进程后启动新的工作进程，任务中的异常在主进程中重新抛出，无法序列化的上下文不影响工作进程"""
+    pool = TaskProcessPool(max_workers=1)
+    try:
+        first_pid = pool.run(_SleepTask('first', 0), {})
+        try:
+            pool.run(_SleepTask('hang', 60), {}, timeout=0.3)
+            assert False, "应该超时"
+        except TimeoutError:
+            pass
+        try:
+            pool.run(_SleepTask('bad_context', 0), {'lock': threading.Lock()})
+            assert False, "上下文无法序列化"
+        except TypeError:
+            pass
+        second_pid = pool.run(_SleepTask('second', 0), {})
+        assert second_pid != first_pid
+        assert pool.run(_SleepTask('third', 0), {}) == second_pid
+        try:
+            pool.run(_RecordingTask('fails', [], fail=True), {})
+            assert False, "应该抛出任务中的异常"
+        except RuntimeError as e:
+            assert 'fails' in str(e)
+    finally:
+        pool.shutdown()
+    print("✅ 超时后替换工作进程，异常传回主进程")
+
+
+if __name__ == "__main__":
+    test_dependencies_and_priority_order()
+    test_failed_and_cancelled_tasks_skip_dependents()
+    test_scheduler_can_run_again()
+    test_event_handlers_can_query_scheduler()
+    test_short_task_chain_has_no_polling_delay()
+    test_large_dag_scheduling_overhead()
+    test_pause_and_resume()
+    test_thread_timeouts_do_not_starve_pool()
+    test_process_tasks_timeout_and_cancel()
+    test_process_pool_replaces_killed_workers()
@@ -20,7 +20,7 @@ from statsmodels.api import OLS
 from statsmodels.regression.rolling import RollingOLS
 
 # 导入基础系统组件
-from jichuxitong import ConfigManager, CacheManager, ErrorHandler, FactorAnalysisError, DataProcessingError, exception_handler, cache_result
+from jichuxitong import ConfigManager, CacheManager, ErrorHandler, FactorAnalysisError, DataProcessingError, exception_handler, cache_result, data_fingerprint
 
 class FactorTest(ABC):
     """抽象因子测试类"""
@@ -387,6 +387,8 @@ class FactorAnalyzer:
             tests = list(self.tests.keys())
         
         results = {}
+        # 数据指纹对所有测试相同，只计算一次
+        data_key = data_fingerprint(factor_data, return_data)
         
         for test_name in tests:
             if test_name not in self.tests:
@@ -394,7 +396,7 @@ class FactorAnalyzer:
                 continue
             
             # 尝试从缓存加载
-            cache_key = f"factor_test_{test_name}_{hash(str(factor_data.values.tobytes()))}_{hash(str(return_data.values.tobytes()))}"
+            cache_key = f"factor_test_{test_name}_{data_key}"
             cached_result = self.cache.get(cache_key)
             if cached_result is not None:
                 logging.info(f"从缓存加载{test_name}测试结果")
@@ -16,21 +16,39 @@
 """
 import sys
 import os
+import atexit
+import contextlib
+import hashlib
+import heapq
+import importlib.util
+import io
+import itertools
+import json
+import multiprocessing
+import pickle
+import shutil
+import tempfile
+import threading
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 
 import pandas as pd
 import numpy as np
-import scipy
-import matplotlib.pyplot as plt
 
 # 日志记录类
 class Logger:
-    def __init__(self, log_file=None):
+    def __init__(self, log_file=None, buffer_size=64 * 1024, flush_interval=1.0):
         """初始化日志记录器
         
+        日志文件只打开一次，写入内容先进入内存缓冲区：
+        缓冲区达到buffer_size个字符时立即写入文件，否则由后台线程每flush_interval秒写入一次。
+        close()和解释器退出时保证把缓冲区全部写入文件。
+        
         Args:
             log_file: 日志文件路径，如果为None则自动生成
+            buffer_size: 缓冲区字符数上限，达到后立即写入文件
+            flush_interval: 后台线程定时写入的间隔（秒），为None或0时不启动后台线程
         """
         if log_file is None:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -38,30 +56,80 @@ class Logger:
         
         self.log_file = log_file
         self.terminal = sys.stdout  # 保存原始终端输出
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        
+        self._buffer = []
+        self._buffered_chars = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        
+        # 创建日志文件（整个生命周期只打开一次）
+        self._file = open(self.log_file, 'w', encoding='utf-8')
+        self._file.write(f"因子分析日志 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        self._file.write("=" * 60 + "\n\n")
+        
+        self._stop_event = threading.Event()
+        self._flush_thread = None
+        if flush_interval:
+            self._flush_thread = threading.Thread(target=self._flush_loop, name='LoggerFlush', daemon=True)
+            self._flush_thread.start()
         
-        # 创建日志文件
-        with open(self.log_file, 'w', encoding='utf-8') as f:
-            f.write(f"因子分析日志 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("=" * 60 + "\n\n")
+        atexit.register(self.close)
     
     def write(self, message):
         """同时输出到终端和日志文件"""
         # 输出到终端
         self.terminal.write(message)
         
-        # 输出到日志文件
-        with open(self.log_file, 'a', encoding='utf-8') as f:
-            f.write(message)
+        # 写入缓冲区，超过上限时立即写入日志文件
+        with self._lock:
+            if self._closed:
+                return
+            self._buffer.append(message)
+            self._buffered_chars += len(message)
+            if self._buffered_chars >= self.buffer_size:
+                self._write_buffer()
+    
+    def _write_buffer(self):
+        """将缓冲区内容写入日志文件（调用方需持有锁）"""
+        if self._buffer:
+            self._file.write(''.join(self._buffer))
+            self._buffer = []
+            self._buffered_chars = 0
+    
+    def _flush_loop(self):
+        """后台线程：按时间间隔把缓冲区写入日志文件"""
+        while not self._stop_event.wait(self.flush_interval):
+            with self._lock:
+                if self._closed:
+                    break
+                self._write_buffer()
+                self._file.flush()
     
     def flush(self):
         """刷新输出"""
         self.terminal.flush()
+        with self._lock:
+            if not self._closed:
+                self._write_buffer()
+                self._file.flush()
         
     def close(self):
         """关闭日志记录器"""
-        with open(self.log_file, 'a', encoding='utf-8') as f:
-            f.write(f"\n\n日志记录结束 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("=" * 60 + "\n")
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._write_buffer()
+            self._file.write(f"\n\n日志记录结束 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            self._file.write("=" * 60 + "\n")
+            self._file.close()
+        
+        self._stop_event.set()
+        if self._flush_thread is not None and self._flush_thread is not threading.current_thread():
+            self._flush_thread.join()
+        atexit.unregister(self.close)
         
         # 恢复原始终端输出
         sys.stdout = self.terminal
@@ -97,36 +165,58 @@ def safe_ensure_list(obj, obj_name="object"):
 # 默认数据文件路径设置（方便用户修改）
 DEFAULT_DATA_FILE = "创业板单日下跌14%详细交易日数据（清理后）1114.xlsx"
 
-# 读取完整因子数据文件
-print(f"使用指定的数据文件: {DEFAULT_DATA_FILE}")
 
-# 检查文件是否存在
-if os.path.exists(DEFAULT_DATA_FILE):
-    print(f"数据文件路径: {os.path.abspath(DEFAULT_DATA_FILE)}")
-else:
+def check_data_file(file_path=DEFAULT_DATA_FILE):
+    """
+    检查数据文件是否存在并打印路径信息
+    
+    导入模块时不再检查数据文件，由main()在开始分析前调用
+    
+    Returns:
+        bool: 文件存在返回True
+    """
+    print(f"使用指定的数据文件: {file_path}")
+    if os.path.exists(file_path):
+        print(f"数据文件路径: {os.path.abspath(file_path)}")
+        return True
     print(f"错误: 数据文件不存在，请检查文件路径")
-    print(f"期望的文件: {DEFAULT_DATA_FILE}")
-    sys.exit(1)
+    print(f"期望的文件: {file_path}")
+    return False
+
+# scipy和matplotlib/seaborn导入较慢，导入本模块时只检查是否已安装，第一次使用时才真正导入
+HAS_SCIPY = importlib.util.find_spec('scipy') is not None
+HAS_PLOT = importlib.util.find_spec('matplotlib') is not None and importlib.util.find_spec('seaborn') is not None
+
+_PLOT_MODULES = None
 
-# 尝试导入scipy.stats，如果不可用则设置标志
-HAS_SCIPY = False
-try:
+
+def _scipy_stats():
+    """返回scipy.stats模块（第一次调用时导入）"""
     from scipy import stats
-    HAS_SCIPY = True
-except ImportError:
-    print("警告: scipy不可用，部分统计计算功能将被简化，但基本分析仍将继续")
-
-# 尝试导入matplotlib和seaborn，如果不可用则设置标志
-HAS_PLOT = False
-try:
-    import matplotlib.pyplot as plt
-    import seaborn as sns
-    # 设置中文字体
-    plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
-    plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
-    HAS_PLOT = True
-except ImportError:
-    print("警告: matplotlib或seaborn不可用，可视化功能将被禁用，但核心分析仍将继续")
+    return stats
+
+
+def _plotting():
+    """
+    返回(pyplot, seaborn)，第一次调用时导入并设置中文字体
+    """
+    global _PLOT_MODULES
+    if _PLOT_MODULES is None:
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        # 设置中文字体
+        plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
+        plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+        _PLOT_MODULES = (plt, sns)
+    return _PLOT_MODULES
+
+
+def report_optional_dependencies():
+    """打印缺少可选依赖时的提示"""
+    if not HAS_SCIPY:
+        print("警告: scipy不可用，部分统计计算功能将被简化，但基本分析仍将继续")
+    if not HAS_PLOT:
+        print("警告: matplotlib或seaborn不可用，可视化功能将被禁用，但核心分析仍将继续")
 
 # 稳健性统计方法辅助函数
 
@@ -182,29 +272,123 @@ def sample_sensitivity_analysis(df, factor_col, return_col,
                                sample_sizes=[0.8, 0.9, 1.0], n_iterations=100):
     """删除外部函数，只保留类内实现"""
     return {'error': '函数已移动到类内实现'}
+
+
+def _segment_tie_pairs(group_ids, n_groups, *sorted_keys):
+    """统计每组内完全相同的键值构成的样本对数量 sum(t*(t-1)/2)，输入需已按(分组, 键)排序"""
+    if len(group_ids) == 0:
+        return np.zeros(n_groups, dtype=np.float64)
+    run_start = np.ones(len(group_ids), dtype=bool)
+    changed = group_ids[1:] != group_ids[:-1]
+    for key in sorted_keys:
+        changed |= key[1:] != key[:-1]
+    run_start[1:] = changed
+    run_begin = np.flatnonzero(run_start)
+    run_len = np.diff(np.append(run_begin, len(group_ids))).astype(np.float64)
+    return np.bincount(group_ids[run_begin], weights=run_len * (run_len - 1) / 2, minlength=n_groups)
+
+
+def _count_inversions(codes, group_ids, n_groups):
+    """
+    自底向上归并排序统计每组内的逆序对数量（i<j且codes[i]>codes[j]）
+
+    所有分组同时归并：每一层把(分组内块号, 值)编码为一个整数键，
+    用searchsorted统计右块中每个元素在左块里比它大的元素个数，再用稳定排序合并相邻的有序块。
+    """
+    n = len(codes)
+    inversions = np.zeros(n_groups, dtype=np.float64)
+    if n < 2:
+        return inversions
+
+    starts, counts = _segment_starts(group_ids, n_groups)
+    pos = np.arange(n, dtype=np.int64) - starts[group_ids]
+    max_size = int(counts.max())
+    values = codes.astype(np.int64)
+    base = int(values.max()) + 1
+
+    width = 1
+    while width < max_size:
+        # 每组内的块对编号转换为全局编号
+        pairs_per_group = (counts + 2 * width - 1) // (2 * width)
+        pair_offset = np.zeros(n_groups, dtype=np.int64)
+        if n_groups > 1:
+            pair_offset[1:] = np.cumsum(pairs_per_group)[:-1]
+        pair = pair_offset[group_ids] + pos // (2 * width)
+        in_right = (pos % (2 * width)) >= width
+
+        keys = pair * base + values
+        left_keys = keys[~in_right]
+        right_keys = keys[in_right]
+        right_pair = pair[in_right]
+
+        pair_begin = np.searchsorted(left_keys, right_pair * base, side='left')
+        pair_end = np.searchsorted(left_keys, (right_pair + 1) * base, side='left')
+        not_greater = np.searchsorted(left_keys, right_keys, side='right') - pair_begin
+        greater = (pair_end - pair_begin) - not_greater
+        inversions += np.bincount(group_ids[in_right], weights=greater, minlength=n_groups)
+
+        # 合并相邻有序块：块对编号不变，块内按值排序
+        values = np.sort(keys, kind='stable') - pair * base
+        width *= 2
+
+    return inversions
+
+
+def kendall_tau_b_grouped(x, y, group_ids, n_groups=None):
+    """
+    批量计算多个截面（如每个交易日）的Kendall's Tau-b，O(n log n)（Knight算法）
+
+    Args:
+        x: 第一个数组（不含NaN）
+        y: 第二个数组（不含NaN）
+        group_ids: 每个样本所属的分组编号（0开始）
+        n_groups: 分组数量，默认为max(group_ids)+1
+
+    Returns:
+        np.ndarray: 每组的Tau-b，样本不足或某一变量全部相同时为NaN
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    group_ids = np.asarray(group_ids, dtype=np.int64)
+    if n_groups is None:
+        n_groups = int(group_ids.max()) + 1 if len(group_ids) else 0
+
+    # 按(分组, x, y)排序后，y中的逆序对即为不一致对
+    order = np.lexsort((y, x, group_ids))
+    g, xs, ys = group_ids[order], x[order], y[order]
+    _, y_codes = np.unique(ys, return_inverse=True)
+
+    counts = np.bincount(g, minlength=n_groups).astype(np.float64)
+    n0 = counts * (counts - 1) / 2
+    x_ties = _segment_tie_pairs(g, n_groups, xs)
+    xy_ties = _segment_tie_pairs(g, n_groups, xs, ys)
+    swaps = _count_inversions(y_codes, g, n_groups)
+
+    y_order = np.lexsort((ys, g))
+    y_ties = _segment_tie_pairs(g[y_order], n_groups, ys[y_order])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        numerator = n0 - x_ties - y_ties + xy_ties - 2 * swaps
+        denominator = np.sqrt((n0 - x_ties) * (n0 - y_ties))
+        tau = np.where(denominator > 0, numerator / denominator, np.nan)
+    return np.clip(tau, -1.0, 1.0)
+
+
 def kendall_tau_corr(x, y):
     """
-# 注意：删除了外部辅助函数kendall_tau_corr，保留类内实现
-# 删除了外部辅助函数robust_correlation，保留类内实现
-# 删除了外部辅助函数mann_whitney_u_test，保留类内实现
-# 删除了外部辅助函数bootstrap_confidence_interval，保留类内实现
-# 删除了外部辅助函数detect_outliers，保留类内实现
-# 删除了外部辅助函数sensitivity_analysis，保留类内实现
-# 删除了外部辅助函数false_discovery_control，保留类内实现
-# 删除了外部辅助函数rolling_window_analysis，保留类内实现
-# 删除了外部辅助函数temporal_stability_analysis，保留类内实现
-# 删除了外部辅助函数sample_sensitivity_analysis，保留类内实现
-    计算Kendall's Tau相关系数（不依赖scipy）
+    计算Kendall's Tau-b相关系数（不依赖scipy，正确处理重复值）
+    
+    使用基于归并排序的Knight算法，复杂度O(n log n)
     
     Args:
         x: 第一个数组
         y: 第二个数组
         
     Returns:
-        float: Kendall's Tau相关系数
+        float: Kendall's Tau-b相关系数
     """
-    x = np.asarray(x)
-    y = np.asarray(y)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
     
     if len(x) < 2 or len(y) < 2 or len(x) != len(y):
         return np.nan
@@ -212,19 +396,7 @@ def kendall_tau_corr(x, y):
     if np.isnan(x).any() or np.isnan(y).any():
         return np.nan
     
-    n = len(x)
-    concordant = 0
-    discordant = 0
-    
-    for i in range(n - 1):
-        for j in range(i + 1, n):
-            if (x[i] < x[j] and y[i] < y[j]) or (x[i] > x[j] and y[i] > y[j]):
-                concordant += 1
-            elif (x[i] < x[j] and y[i] > y[j]) or (x[i] > x[j] and y[i] < y[j]):
-                discordant += 1
-    
-    tau = (concordant - discordant) / (n * (n - 1) / 2)
-    return tau
+    return kendall_tau_b_grouped(x, y, np.zeros(len(x), dtype=np.int64), 1)[0]
 
 def robust_correlation(x, y, method='median'):
     """
@@ -333,7 +505,7 @@ def mann_whitney_u_test(x, y):
         
         # 使用scipy或自定义正态分布计算
         if HAS_SCIPY:
-            p_value = 2 * (1 - scipy.stats.norm.cdf(abs(z)))
+            p_value = 2 * (1 - _scipy_stats().norm.cdf(abs(z)))
         else:
             # 自定义正态分布累积分布函数近似
             import math
@@ -345,51 +517,128 @@ def mann_whitney_u_test(x, y):
         # 如果计算失败，返回安全的默认值
         return np.nan, np.nan
 
-def bootstrap_confidence_interval(x, y, statistic='correlation', n_bootstrap=1000, confidence_level=0.95):
+# Bootstrap每块同时存在的(重抽样次数, 样本数)临时数组的元素总数上限（约64MB的8字节元素），
+# 块的行数按生成索引和计算统计量时同时存在的数组个数(_bootstrap_live_arrays)确定
+BOOTSTRAP_CHUNK_ELEMENTS = 8_000_000
+
+
+def _bootstrap_live_arrays(method, paired):
+    """一块Bootstrap计算中同时存在的(重抽样次数, 样本数)8字节数组个数的峰值"""
+    # 平稳Bootstrap生成索引时块起点位置、块起点样本和结果同时存在，其他方式只有结果
+    index_arrays = 3 if method == 'stationary' else 1
+    # 计算统计量时索引矩阵和每个变量的重抽样值同时存在
+    statistic_arrays = 1 + (2 if paired else 1)
+    return max(index_arrays, statistic_arrays)
+
+
+def bootstrap_indices(n, n_bootstrap, rng, method='iid', block_size=None):
+    """
+    一次生成一整块Bootstrap重抽样索引矩阵
+
+    Args:
+        n: 样本数量
+        n_bootstrap: 本块的重抽样次数（矩阵行数）
+        rng: numpy.random.Generator
+        method: 'iid'（独立重抽样）、'stationary'（平稳Bootstrap，几何分布块长）
+                或'block'（固定块长的移动块Bootstrap）
+        block_size: 平均/固定块长，默认为n的立方根
+
+    Returns:
+        np.ndarray: 形状为(n_bootstrap, n)的索引矩阵
+    """
+    if method == 'iid':
+        return rng.integers(0, n, size=(n_bootstrap, n))
+    
+    if block_size is None:
+        block_size = max(1, int(round(n ** (1 / 3))))
+    block_size = int(min(max(block_size, 1), n))
+    
+    if method == 'stationary':
+        # 每个位置以1/block_size的概率开始新块，否则沿用上一位置的下一个样本（环形）；
+        # 尽量原地计算，同时存在的(n_bootstrap, n)整数数组不超过3个
+        new_block = rng.random((n_bootstrap, n)) < 1.0 / block_size
+        new_block[:, 0] = True
+        positions = np.arange(n)
+        last_start = np.where(new_block, positions, 0)
+        del new_block
+        np.maximum.accumulate(last_start, axis=1, out=last_start)
+        block_starts = rng.integers(0, n, size=(n_bootstrap, n))
+        indices = np.take_along_axis(block_starts, last_start, axis=1)
+        del block_starts
+        indices += positions
+        indices -= last_start
+        indices %= n
+        return indices
+    
+    if method == 'block':
+        n_blocks = -(-n // block_size)
+        block_starts = rng.integers(0, n - block_size + 1, size=(n_bootstrap, n_blocks))
+        indices = block_starts[:, :, None] + np.arange(block_size)
+        return indices.reshape(n_bootstrap, -1)[:, :n]
+    
+    raise ValueError(f"不支持的Bootstrap方法: {method}")
+
+
+def _bootstrap_statistic(x, y, indices, statistic):
+    """对索引矩阵的每一行计算统计量（向量化）；原地去均值、用einsum求行内积，除重抽样值外不产生整块临时数组"""
+    boot_x = x[indices]
+    if y is None:
+        return boot_x.mean(axis=1)
+    
+    boot_y = y[indices]
+    if statistic == 'correlation':
+        boot_x -= boot_x.mean(axis=1, keepdims=True)
+        boot_y -= boot_y.mean(axis=1, keepdims=True)
+        covariance = np.einsum('ij,ij->i', boot_x, boot_y)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return covariance / np.sqrt(np.einsum('ij,ij->i', boot_x, boot_x) * np.einsum('ij,ij->i', boot_y, boot_y))
+    return boot_x.mean(axis=1) - boot_y.mean(axis=1)
+
+
+def bootstrap_confidence_interval(x, y=None, statistic='correlation', n_bootstrap=1000, confidence_level=0.95,
+                                  random_state=None, method='iid', block_size=None):
     """
-    计算Bootstrap置信区间
+    计算Bootstrap置信区间（向量化、可复现）
+    
+    所有重抽样索引按块一次生成（每块同时存在的临时数组不超过BOOTSTRAP_CHUNK_ELEMENTS个元素），
+    统计量按行向量化计算。
     
     Args:
         x: 第一个数组
-        y: 第二个数组
-        statistic: 统计量 ('correlation', 'mean_diff')
+        y: 第二个数组；为None时对x的均值做Bootstrap（如每日IC序列）
+        statistic: 统计量 ('correlation', 'mean_diff')，y为None时固定为均值
         n_bootstrap: 重抽样次数
         confidence_level: 置信水平
+        random_state: 随机种子或numpy.random.Generator，用于结果复现
+        method: 重抽样方式 ('iid', 'stationary', 'block')，自相关序列建议使用'stationary'
+        block_size: 'stationary'的平均块长或'block'的固定块长，默认为样本数的立方根
         
     Returns:
-        tuple: (下界, 上界, 自举统计量)
+        tuple: (下界, 上界, 自举统计量数组)
     """
-    x = np.asarray(x)
-    y = np.asarray(y)
+    x = np.asarray(x, dtype=float)
+    if y is not None:
+        y = np.asarray(y, dtype=float)
+        if len(y) < 2 or len(x) != len(y):
+            return np.nan, np.nan, np.array([])
     
-    if len(x) < 2 or len(y) < 2 or len(x) != len(y):
-        return np.nan, np.nan, []
+    if len(x) < 2:
+        return np.nan, np.nan, np.array([])
     
+    rng = random_state if isinstance(random_state, np.random.Generator) else np.random.default_rng(random_state)
     n = len(x)
-    bootstrap_stats = []
-    
-    # 定义统计量函数
-    def correlation_stat(data1, data2):
-        return np.corrcoef(data1, data2)[0, 1]
-    
-    def mean_diff_stat(data1, data2):
-        return np.mean(data1) - np.mean(data2)
+    live_arrays = _bootstrap_live_arrays(method, paired=y is not None)
+    chunk = max(1, min(n_bootstrap, BOOTSTRAP_CHUNK_ELEMENTS // (n * live_arrays)))
     
-    stat_func = correlation_stat if statistic == 'correlation' else mean_diff_stat
+    bootstrap_stats = np.empty(n_bootstrap, dtype=float)
+    for start in range(0, n_bootstrap, chunk):
+        size = min(chunk, n_bootstrap - start)
+        # 不保留上一块的索引矩阵，生成下一块时不会多占一块内存
+        indices = bootstrap_indices(n, size, rng, method=method, block_size=block_size)
+        bootstrap_stats[start:start + size] = _bootstrap_statistic(x, y, indices, statistic)
+        del indices
     
-    for i in range(n_bootstrap):
-        # 重抽样
-        indices = np.random.choice(n, n, replace=True)
-        boot_x = x[indices]
-        boot_y = y[indices]
-        
-        # 计算统计量
-        try:
-            stat_value = stat_func(boot_x, boot_y)
-            if not np.isnan(stat_value) and np.isfinite(stat_value):
-                bootstrap_stats.append(stat_value)
-        except:
-            continue
+    bootstrap_stats = bootstrap_stats[np.isfinite(bootstrap_stats)]
     
     if len(bootstrap_stats) < 10:  # 至少需要10个有效样本
         return np.nan, np.nan, bootstrap_stats
@@ -619,7 +868,7 @@ def rolling_window_analysis(df, factor_col, return_col, window_sizes=[30, 60],
         save_plots: 是否保存图表
         
     Returns:
-        dict: 滚动窗口分析结果
+        dict: 滚动窗口分析结果（daily_ic_rolling为每日IC序列的滚动均值/标准差/IR）
     """
     results = {
         'window_sizes': window_sizes,
@@ -628,33 +877,26 @@ def rolling_window_analysis(df, factor_col, return_col, window_sizes=[30, 60],
         'stability_metrics': {}
     }
     
-    df = df.sort_values('信号日期')
-    unique_dates = sorted(df['信号日期'].unique())
+    # 日期只排序一次，所有窗口长度在一次扫描中完成
+    date_groups = build_date_groups(df['信号日期'].values)
+    factor_values = df[factor_col].values
+    return_values = df[return_col].values
+    pooled = rolling_pooled_ic(None, factor_values, return_values, window_sizes, date_groups=date_groups)
+    
+    # 每日IC序列的滚动均值/标准差/IR（累计和，多个窗口开销相同）
+    daily = compute_daily_ic(None, factor_values, return_values, date_groups=date_groups)
+    daily_ics = daily['daily_ic'][~np.isnan(daily['daily_ic'])]
+    daily_dates = daily['dates'][~np.isnan(daily['daily_ic'])]
+    daily_stats = rolling_ic_statistics(daily_ics, window_sizes)
+    results['daily_ic_rolling'] = {
+        window_size: dict(stats, dates=daily_dates) for window_size, stats in daily_stats.items()
+    }
     
     for window_size in window_sizes:
         print(f"\n分析窗口大小: {window_size} 个交易日")
         
-        rolling_ics = []
-        rolling_dates = []
-        
-        # 计算滚动IC值
-        for i in range(len(unique_dates) - window_size + 1):
-            window_dates = unique_dates[i:i + window_size]
-            window_data = df[df['信号日期'].isin(window_dates)]
-            
-            # 确保有足够的数据点
-            if len(window_data) >= window_size * 2:  # 至少每个交易日2个样本
-                valid_data = window_data.dropna(subset=[factor_col, return_col])
-                
-                if len(valid_data) >= window_size:
-                    try:
-                        # 计算Spearman相关系数
-                        ic = custom_spearman_corr(valid_data[factor_col], valid_data[return_col])
-                        if not np.isnan(ic) and np.isfinite(ic):
-                            rolling_ics.append(ic)
-                            rolling_dates.append(window_dates[-1])  # 使用窗口结束日期
-                    except:
-                        continue
+        rolling_ics = list(pooled[window_size]['ic_values'])
+        rolling_dates = list(pooled[window_size]['dates'])  # 使用窗口结束日期
         
         results['rolling_ic'][window_size] = {
             'dates': rolling_dates,
@@ -934,167 +1176,1158 @@ def custom_spearman_corr(x, y):
     # 由于浮点精度问题，可能会出现略微超出范围的情况，进行轻微的截断
     # 这是必要的数学处理，而不是人为修改结果
     corr = min(max(corr, -1.0), 1.0)
-    
+
     return corr
 
-def calculate_standard_annual_return(total_return_rate, observation_years, method='standard_compound'):
+
+# ================================
+# 向量化每日IC计算引擎
+# ================================
+# 每日IC的筛选结果代码（与calculate_ic中原有的跳过原因一一对应）
+IC_STATUS_OK = 0                  # 正常计算
+IC_STATUS_OVERALL_FALLBACK = 1    # 当日无变异性，使用整体数据计算IC
+IC_STATUS_INSUFFICIENT = 2        # 有效数据点不足
+IC_STATUS_FACTOR_STD_ZERO = 3     # 因子值标准差为零
+IC_STATUS_RETURN_STD_ZERO = 4     # 收益率值标准差为零
+IC_STATUS_FACTOR_VARIABILITY = 5  # 因子值变异性不足
+IC_STATUS_RETURN_VARIABILITY = 6  # 收益率值变异性不足
+IC_STATUS_NONFINITE = 7           # 计算结果为NaN或无穷大
+
+
+def select_daily_screening(avg_daily_samples):
     """
-    标准复利年化收益率计算 - 优化版本
-    
+    根据平均每日样本数量选择样本筛选方式
+
     Args:
-        total_return_rate: 总收益率（例如：0.2058表示20.58%的总收益）
-        observation_years: 观测期年数（例如：5.18年）
-        method: 计算方法，'standard_compound'（标准复利）或'log_based'（对数方法）
-        
+        avg_daily_samples: 平均每日有效样本数
+
     Returns:
-        tuple: (年化收益率, 计算详情字典)
-    
-    数学公式:
-    标准复利年化: (1 + 总收益率)^(1/年数) - 1
-    对数方法: exp(ln(1+总收益率)/年数) - 1（数值稳定性更好）
-    
-    示例验证:
-    如果日收益率5.8%，交易85天，总收益约为120.58%
-    观测期5.18年，则年化收益率 = (1.2058)^(1/5.18) - 1 ≈ 160.77%
+        tuple: (每日最少样本数/最少唯一值数, 模式名称)
     """
-    try:
-        # 输入参数验证
-        if total_return_rate is None or observation_years is None:
-            return np.nan, {'error': '输入参数包含None值'}
-        
-        if not np.isfinite(total_return_rate) or not np.isfinite(observation_years):
-            return np.nan, {'error': '输入参数包含无穷大或NaN值'}
-        
-        if total_return_rate <= -1:
-            return np.nan, {'error': f'总收益率不能小于-100%，实际值: {total_return_rate}'}
-        
-        if observation_years <= 0:
-            return np.nan, {'error': f'观测期年数必须大于0，实际值: {observation_years}'}
-        
-        if observation_years > 100:
-            return np.nan, {'error': f'观测期年数过大，可能导致数值不稳定: {observation_years}'}
-        
-        # 转换为最终价值倍数
-        final_value = total_return_rate + 1
-        
-        # 检查最终价值是否合理
-        if final_value <= 0:
-            return np.nan, {'error': f'最终价值倍数必须为正数，实际值: {final_value}'}
-        
-        # 根据方法选择计算方式
-        if method == 'log_based':
-            # 对数方法：数值稳定性更好
-            log_final_value = np.log(final_value)
-            if not np.isfinite(log_final_value):
-                return np.nan, {'error': '对数计算溢出，数值不稳定'}
-            
-            annual_log_return = log_final_value / observation_years
-            annual_return_rate = np.exp(annual_log_return) - 1
-            
-            calculation_details = {
-                'method': 'log_based',
-                'final_value': final_value,
-                'log_final_value': log_final_value,
-                'annual_log_return': annual_log_return,
-                'observation_years': observation_years
-            }
-            
-        else:
-            # 标准复利方法：直接幂运算
-            annual_return_rate = final_value ** (1/observation_years) - 1
-            
-            calculation_details = {
-                'method': 'standard_compound',
-                'final_value': final_value,
-                'observation_years': observation_years,
-                'calculation': f'{final_value}^(1/{observation_years}) - 1'
-            }
-        
-        # 数值稳定性检查
-        if not np.isfinite(annual_return_rate):
-            return np.nan, {'error': '年化收益率计算结果数值不稳定'}
-        
-        # 合理性检查：年化收益率不应该过于极端
-        if abs(annual_return_rate) > 10:  # 年化收益率超过1000%
-            return np.nan, {'error': f'年化收益率过于极端: {annual_return_rate:.2%}'}
-        
-        # 添加计算质量评估
-        calculation_details.update({
-            'annual_return_rate': annual_return_rate,
-            'annual_return_percent': annual_return_rate * 100,
-            'quality_assessment': {
-                'numerical_stability': 'stable' if abs(annual_return_rate) < 5 else ('moderate' if abs(annual_return_rate) < 10 else 'unstable'),
-                'return_magnitude': 'extreme_high' if annual_return_rate > 1 else ('high' if annual_return_rate > 0.5 else ('positive' if annual_return_rate > 0 else 'negative')),
-                'calculation_reliable': abs(annual_return_rate) < 5  # 超过500%的年化收益率需要额外验证
-            }
-        })
-        
-        # 反向验证计算结果（可选验证）
-        reconstructed_total_return = (1 + annual_return_rate) ** observation_years - 1
-        verification_error = abs(reconstructed_total_return - total_return_rate)
-        calculation_details['verification'] = {
-            'reconstructed_total_return': reconstructed_total_return,
-            'original_total_return': total_return_rate,
-            'verification_error': verification_error,
-            'verification_passed': verification_error < 1e-6
-        }
-        
-        return annual_return_rate, calculation_details
-        
-    except Exception as e:
-        return np.nan, {
-            'error': f'标准复利年化计算错误: {str(e)}',
-            'total_return_rate': total_return_rate,
-            'observation_years': observation_years
-        }
+    if avg_daily_samples >= 5:
+        return 5, "高样本量模式"
+    elif avg_daily_samples >= 3:
+        return 3, "中样本量模式"
+    return 2, "低样本量模式"
 
-def safe_calculate_annual_return(total_return, years, method='standard_compound'):
+
+def build_date_groups(dates):
     """
-    修复4: 安全版本的年化计算函数，确保输入类型正确
-    防止类型转换错误，提高代码健壮性
-    
+    对日期只排序一次，生成分组偏移量
+
     Args:
-        total_return: 总收益率（任意数值类型）
-        years: 观测年数（任意数值类型）
-        method: 计算方法
-        
+        dates: 日期数组（NaT不参与分组，与groupby行为一致）
+
     Returns:
-        tuple: (年化收益率, 计算详情字典)
+        dict: order（稳定排序后的行号，不含NaT）、group_ids（排序后每行的分组号）、
+              unique_dates（升序日期）、n_groups
     """
-    try:
-        # 类型转换与验证
-        if not isinstance(total_return, (int, float, np.number)):
-            print(f"  警告: 总收益率类型 {type(total_return)} 不兼容，尝试转换...")
-            if isinstance(total_return, str):
-                total_return = float(total_return)
-            else:
-                total_return = 0.0  # 使用默认值
-                
-        if not isinstance(years, (int, float, np.number)):
-            print(f"  警告: 观测年数类型 {type(years)} 不兼容，尝试转换...")
-            if isinstance(years, str):
-                years = float(years)
-            else:
-                years = 1.0  # 使用默认值
-        
-        # 调用原始计算函数
-        return calculate_standard_annual_return(total_return, years, method)
-    except Exception as e:
-        print(f"  年化计算出错: {str(e)}")
-        return np.nan, {'error': f'年化计算失败: {str(e)}'}
+    codes, unique_dates = pd.factorize(pd.Series(dates), sort=True)
+    codes = np.asarray(codes, dtype=np.int64)
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    return {
+        'order': order,
+        'group_ids': codes[order],
+        'unique_dates': unique_dates,
+        'n_groups': len(unique_dates)
+    }
 
-def validate_annual_return_calculation(annual_return, observation_years, original_total_return, tolerance=0.01):
+
+def _segment_starts(group_ids, n_groups):
+    """计算已按分组排序的数组中每组的起始位置和长度"""
+    counts = np.bincount(group_ids, minlength=n_groups)
+    starts = np.zeros(n_groups, dtype=np.int64)
+    if n_groups > 1:
+        starts[1:] = np.cumsum(counts)[:-1]
+    return starts, counts
+
+
+def _segment_sum(values, starts, counts):
+    """按分组求和（空分组返回0），与np.sum逐组求和结果一致"""
+    result = np.zeros(len(counts), dtype=np.float64)
+    nonempty = counts > 0
+    if nonempty.any():
+        result[nonempty] = np.add.reduceat(values, starts[nonempty])
+    return result
+
+
+def group_average_ranks(values, group_ids, starts):
     """
-    验证年化收益率计算的正确性（反向验证）- 优化版本
-    
+    一次性计算所有分组内的平均秩（处理重复值），与custom_spearman_corr中的秩完全一致
+
     Args:
-        annual_return: 年化收益率
-        observation_years: 观测期年数
-        original_total_return: 原始总收益率
-        tolerance: 相对误差容忍度，默认为1%
-        
+        values: 已按分组排序的数值数组
+        group_ids: 每个元素的分组号（非递减）
+        starts: 每组起始位置
+
     Returns:
-        dict: 验证结果，包含详细分析信息
+        tuple: (平均秩数组, 每组唯一值数量)
+    """
+    n = len(values)
+    ranks = np.empty(n, dtype=np.float64)
+    n_unique = np.zeros(len(starts), dtype=np.int64)
+    if n == 0:
+        return ranks, n_unique
+
+    order = np.lexsort((values, group_ids))
+    sorted_values = values[order]
+    sorted_groups = group_ids[order]
+
+    # 每个相同值区间（不跨组）的起点
+    run_start = np.ones(n, dtype=bool)
+    run_start[1:] = (sorted_groups[1:] != sorted_groups[:-1]) | (sorted_values[1:] != sorted_values[:-1])
+    run_begin = np.flatnonzero(run_start)
+    run_end = np.append(run_begin[1:], n)
+    run_groups = sorted_groups[run_begin]
+
+    # 组内位置i..j-1的平均秩为 (i + 1 + j) / 2
+    group_start = starts[run_groups]
+    run_rank = ((run_begin - group_start) + 1 + (run_end - group_start)) / 2
+    ranks[order] = np.repeat(run_rank, run_end - run_begin)
+    n_unique = np.bincount(run_groups, minlength=len(starts))
+    return ranks, n_unique
+
+
+def _segment_std(values, starts, counts):
+    """按分组计算样本标准差（ddof=1），计算方式与pandas的Series.std一致"""
+    sums = _segment_sum(values, starts, counts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        sq = (np.repeat(means, counts) - values) ** 2
+        return np.sqrt(_segment_sum(sq, starts, counts) / (counts - 1))
+
+
+def _segment_corr_from_ranks(rank_x, rank_y, starts, counts):
+    """按分组用皮尔逊公式计算秩相关系数，公式与custom_spearman_corr相同"""
+    n = counts.astype(np.float64)
+    sum_xy = _segment_sum(rank_x * rank_y, starts, counts)
+    sum_x = _segment_sum(rank_x, starts, counts)
+    sum_y = _segment_sum(rank_y, starts, counts)
+    sum_x2 = _segment_sum(rank_x ** 2, starts, counts)
+    sum_y2 = _segment_sum(rank_y ** 2, starts, counts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        numerator = n * sum_xy - sum_x * sum_y
+        denominator = np.sqrt((n * sum_x2 - sum_x ** 2) * (n * sum_y2 - sum_y ** 2))
+        corr = np.where(denominator == 0, np.nan, numerator / denominator)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _segment_pearson(x, y, starts, counts):
+    """按分组计算Pearson相关系数，运算顺序与np.corrcoef相同"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.repeat(_segment_sum(x, starts, counts) / counts, counts)
+        mean_y = np.repeat(_segment_sum(y, starts, counts) / counts, counts)
+        dx = x - mean_x
+        dy = y - mean_y
+        fact = 1 / (counts - 1.0)
+        cov = _segment_sum(dx * dy, starts, counts) * fact
+        std_x = np.sqrt(_segment_sum(dx * dx, starts, counts) * fact)
+        std_y = np.sqrt(_segment_sum(dy * dy, starts, counts) * fact)
+        corr = cov / std_x / std_y
+    return np.clip(corr, -1.0, 1.0)
+
+
+def rank_sorted_column(values, group_ids, starts, counts):
+    """
+    对已按日期排序的一列数据完成组内排序，结果可在多个因子之间复用
+
+    Returns:
+        dict: values、ranks（组内平均秩）、nunique（每组唯一值数）、std（每组标准差）
+    """
+    ranks, nunique = group_average_ranks(values, group_ids, starts)
+    return {
+        'values': values,
+        'ranks': ranks,
+        'nunique': nunique,
+        'std': _segment_std(values, starts, counts)
+    }
+
+
+def _screen_daily_ic(x_col, y_col, starts, counts, use_pearson, overall_ic_func):
+    """根据两列的组内排序结果计算每日IC，并逐项套用原有筛选顺序"""
+    n_groups = len(counts)
+    avg_daily_samples = float(np.mean(counts)) if n_groups > 0 else 0
+    min_samples_per_day, mode = select_daily_screening(avg_daily_samples)
+
+    factor_std = x_col['std']
+    return_std = y_col['std']
+    factor_nunique = x_col['nunique']
+    return_nunique = y_col['nunique']
+
+    if use_pearson:
+        corr = _segment_pearson(x_col['values'], y_col['values'], starts, counts)
+    else:
+        corr = _segment_corr_from_ranks(x_col['ranks'], y_col['ranks'], starts, counts)
+
+    status = np.full(n_groups, IC_STATUS_OK, dtype=np.int8)
+    enough = counts >= min_samples_per_day
+    zero_std = enough & ((factor_std <= 0) | (return_std <= 0))
+    variability_ok = (factor_nunique >= min_samples_per_day) & (return_nunique >= min_samples_per_day)
+    status[~enough] = IC_STATUS_INSUFFICIENT
+    status[enough & ~zero_std & ~variability_ok & (factor_nunique < min_samples_per_day)] = IC_STATUS_FACTOR_VARIABILITY
+    status[enough & ~zero_std & ~variability_ok & (factor_nunique >= min_samples_per_day)] = IC_STATUS_RETURN_VARIABILITY
+    status[enough & ~zero_std & variability_ok & ~np.isfinite(corr)] = IC_STATUS_NONFINITE
+
+    ic = np.where(status == IC_STATUS_OK, corr, np.nan)
+
+    # 无变异性的交易日：整体数据可用时使用整体Pearson IC，否则记录原因
+    if zero_std.any():
+        overall_ic = overall_ic_func()
+        if not np.isnan(overall_ic) and np.isfinite(overall_ic):
+            status[zero_std] = IC_STATUS_OVERALL_FALLBACK
+            ic[zero_std] = overall_ic
+        else:
+            status[zero_std & (factor_std <= 0)] = IC_STATUS_FACTOR_STD_ZERO
+            status[zero_std & ~(factor_std <= 0)] = IC_STATUS_RETURN_STD_ZERO
+
+    return {
+        'daily_ic': ic,
+        'status': status,
+        'sample_counts': counts,
+        'factor_std': factor_std,
+        'return_std': return_std,
+        'factor_nunique': factor_nunique,
+        'return_nunique': return_nunique,
+        'avg_daily_samples': avg_daily_samples,
+        'min_samples_per_day': min_samples_per_day,
+        'screening_mode': mode
+    }
+
+
+def _overall_pearson(factor_all, return_all, valid_all):
+    """整体数据的Pearson相关系数（每日无变异性时的备用IC）"""
+    if valid_all.sum() >= 3:
+        return np.corrcoef(factor_all[valid_all], return_all[valid_all])[0, 1]
+    return np.nan
+
+
+def compute_daily_ic_matrix(dates, factor_columns, return_columns, use_pearson=False, date_groups=None):
+    """
+    一次性计算多个因子对多个收益率列的每日IC
+
+    日期分组只计算一次；每个收益率列的组内秩在有效样本相同的因子之间复用，
+    因此每增加一个因子只增加一次组内排序。
+
+    Args:
+        dates: 信号日期数组
+        factor_columns: {因子名: 数值数组}
+        return_columns: {收益率列名: 数值数组}
+        use_pearson: 是否使用Pearson相关系数，默认为False（使用Spearman）
+        date_groups: build_date_groups的结果，可复用以避免重复排序
+
+    Returns:
+        dict: {(因子名, 收益率列名): compute_daily_ic格式的结果}
+    """
+    if date_groups is None:
+        date_groups = build_date_groups(dates)
+    order = date_groups['order']
+    sorted_group_ids = date_groups['group_ids']
+    n_groups = date_groups['n_groups']
+
+    returns = {name: np.asarray(values, dtype=np.float64) for name, values in return_columns.items()}
+    return_valid = {name: ~np.isnan(values) for name, values in returns.items()}
+
+    # 按有效样本掩码缓存组内排序结果：{掩码: (行号, 分组号, 起点, 长度, {列名: 排序结果})}
+    layouts = {}
+
+    def get_layout(valid_all):
+        key = valid_all.tobytes()
+        if key not in layouts:
+            valid_sorted = valid_all[order]
+            group_ids = sorted_group_ids[valid_sorted]
+            starts, counts = _segment_starts(group_ids, n_groups)
+            layouts[key] = (order[valid_sorted], group_ids, starts, counts, {})
+        return layouts[key]
+
+    results = {}
+    for factor_name, factor_values in factor_columns.items():
+        factor_all = np.asarray(factor_values, dtype=np.float64)
+        factor_valid = ~np.isnan(factor_all)
+        for return_name, return_all in returns.items():
+            valid_all = factor_valid & return_valid[return_name]
+            rows, group_ids, starts, counts, ranked = get_layout(valid_all)
+
+            if ('return', return_name) not in ranked:
+                ranked[('return', return_name)] = rank_sorted_column(return_all[rows], group_ids, starts, counts)
+            if ('factor', factor_name) not in ranked:
+                ranked[('factor', factor_name)] = rank_sorted_column(factor_all[rows], group_ids, starts, counts)
+
+            result = _screen_daily_ic(
+                ranked[('factor', factor_name)], ranked[('return', return_name)], starts, counts, use_pearson,
+                lambda: _overall_pearson(factor_all, return_all, valid_all)
+            )
+            result['dates'] = date_groups['unique_dates']
+            results[(factor_name, return_name)] = result
+    return results
+
+
+def compute_daily_ic(dates, factor_values, return_values, use_pearson=False, date_groups=None):
+    """
+    向量化计算每日IC值：按日期只排序一次，用NumPy一次完成所有交易日的排序和相关系数计算
+
+    筛选规则与FactorAnalysis.calculate_ic原有的逐日循环完全相同：
+    1. 根据平均每日有效样本数确定每日最少样本数和唯一值要求（5/3/2）
+    2. 因子或收益率标准差为零的交易日，改用整体数据的Pearson相关系数
+    3. 唯一值数量不足的交易日跳过
+
+    Args:
+        dates: 信号日期数组
+        factor_values: 因子值数组
+        return_values: 收益率数组
+        use_pearson: 是否使用Pearson相关系数，默认为False（使用Spearman）
+        date_groups: build_date_groups的结果，可复用以避免重复排序
+
+    Returns:
+        dict: 每日IC序列及每个交易日的筛选结果
+    """
+    results = compute_daily_ic_matrix(dates, {'factor': factor_values}, {'return': return_values},
+                                      use_pearson=use_pearson, date_groups=date_groups)
+    return results[('factor', 'return')]
+
+
+def format_daily_ic_reason(date, status, sample_count, factor_std, return_std,
+                           factor_nunique, return_nunique, min_samples_per_day):
+    """将每日筛选结果代码转换为原有格式的说明文字"""
+    if status == IC_STATUS_OVERALL_FALLBACK:
+        return f"日期 {date}: 使用整体数据计算IC (因子std: {factor_std:.6f}, 收益率std: {return_std:.6f})"
+    if status == IC_STATUS_INSUFFICIENT:
+        return f"日期 {date}: 有效数据点不足 (需要≥{min_samples_per_day}，实际: {sample_count})"
+    if status == IC_STATUS_FACTOR_STD_ZERO:
+        return f"日期 {date}: 因子值标准差为零 (无变异性)"
+    if status == IC_STATUS_RETURN_STD_ZERO:
+        return f"日期 {date}: 收益率值标准差为零 (无变异性)"
+    if status == IC_STATUS_FACTOR_VARIABILITY:
+        return f"日期 {date}: 因子值变异性不足 (唯一值: {factor_nunique}, 要求: {min_samples_per_day})"
+    if status == IC_STATUS_RETURN_VARIABILITY:
+        return f"日期 {date}: 收益率值变异性不足 (唯一值: {return_nunique}, 要求: {min_samples_per_day})"
+    if status == IC_STATUS_NONFINITE:
+        return f"日期 {date}: 计算结果为NaN或无穷大 (因子std: {factor_std:.6f}, 收益率std: {return_std:.6f})"
+    return ""
+
+
+# 输出详细程度：控制每日IC计算等热循环中是否逐条打印
+VERBOSITY_QUIET = 0   # 不打印逐日信息和汇总
+VERBOSITY_NORMAL = 1  # 每个因子只打印一行筛选汇总
+VERBOSITY_DEBUG = 2   # 逐日打印调试信息和跳过原因
+
+IC_STATUS_NAMES = {
+    IC_STATUS_OK: '正常计算',
+    IC_STATUS_OVERALL_FALLBACK: '使用整体数据计算IC',
+    IC_STATUS_INSUFFICIENT: '有效数据点不足',
+    IC_STATUS_FACTOR_STD_ZERO: '因子值标准差为零',
+    IC_STATUS_RETURN_STD_ZERO: '收益率值标准差为零',
+    IC_STATUS_FACTOR_VARIABILITY: '因子值变异性不足',
+    IC_STATUS_RETURN_VARIABILITY: '收益率值变异性不足',
+    IC_STATUS_NONFINITE: '计算结果为NaN或无穷大'
+}
+
+
+class ICDiagnostics:
+    """
+    每日IC计算的结构化诊断记录
+
+    每个因子只保存筛选结果代码的计数，以及非正常交易日的日期、代码、样本数、
+    标准差和唯一值数量数组；说明文字只在报告生成时按需渲染。
+    """
+
+    _EVENT_FIELDS = ('sample_counts', 'factor_std', 'return_std', 'factor_nunique', 'return_nunique')
+
+    def __init__(self):
+        self._records = {}
+
+    def record(self, factor_col, daily_result):
+        """记录compute_daily_ic的筛选结果，重复记录同一因子时覆盖旧结果"""
+        status = np.asarray(daily_result['status'])
+        events = status != IC_STATUS_OK
+        record = {
+            'counts': np.bincount(status, minlength=len(IC_STATUS_NAMES)),
+            'dates': daily_result['dates'][events],
+            'status': status[events],
+            'min_samples_per_day': daily_result['min_samples_per_day']
+        }
+        for field in self._EVENT_FIELDS:
+            record[field] = np.asarray(daily_result[field])[events]
+        self._records[factor_col] = record
+
+    def merge(self, other):
+        """合并另一个诊断记录中的因子（如子进程中的记录），同一因子以other为准"""
+        self._records.update(other._records)
+
+    @property
+    def factors(self):
+        """已记录的因子列表"""
+        return list(self._records)
+
+    def counts(self, factor_col):
+        """各筛选结果的交易日数 {名称: 天数}（只包含出现过的结果）"""
+        counts = self._records[factor_col]['counts']
+        return {IC_STATUS_NAMES[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def processed_dates(self, factor_col):
+        """计算出IC的交易日数（含使用整体数据的交易日）"""
+        counts = self._records[factor_col]['counts']
+        return int(counts[IC_STATUS_OK] + counts[IC_STATUS_OVERALL_FALLBACK])
+
+    def skipped_dates(self, factor_col):
+        """被跳过的交易日数"""
+        return int(self._records[factor_col]['counts'].sum()) - self.processed_dates(factor_col)
+
+    def events(self, factor_col):
+        """非正常交易日明细表"""
+        record = self._records[factor_col]
+        events = pd.DataFrame({field: record[field] for field in self._EVENT_FIELDS})
+        events.insert(0, 'status', record['status'])
+        events.insert(0, '信号日期', record['dates'])
+        events['reason'] = [IC_STATUS_NAMES[code] for code in record['status']]
+        return events
+
+    def reasons(self, factor_col, statuses=None):
+        """
+        按需生成说明文字（格式与原有的skipped_reasons相同）
+
+        Args:
+            factor_col: 因子列名
+            statuses: 只输出这些筛选结果代码，默认为全部被跳过的交易日
+        """
+        record = self._records[factor_col]
+        if statuses is None:
+            statuses = [code for code in IC_STATUS_NAMES if code not in (IC_STATUS_OK, IC_STATUS_OVERALL_FALLBACK)]
+        for i in np.flatnonzero(np.isin(record['status'], list(statuses))):
+            yield format_daily_ic_reason(
+                record['dates'][i], record['status'][i], record['sample_counts'][i],
+                record['factor_std'][i], record['return_std'][i],
+                record['factor_nunique'][i], record['return_nunique'][i],
+                record['min_samples_per_day']
+            )
+
+    def summary_line(self, factor_col):
+        """单行筛选汇总"""
+        return ", ".join(f"{name} {count}天" for name, count in self.counts(factor_col).items())
+
+    def render(self, factor_cols=None, max_reasons=5):
+        """
+        渲染诊断报告文字
+
+        Args:
+            factor_cols: 要输出的因子列表，默认为全部已记录因子
+            max_reasons: 每个因子最多列出的跳过原因条数
+        """
+        lines = []
+        for factor_col in (factor_cols or self.factors):
+            if factor_col not in self._records:
+                continue
+            lines.append(f"{factor_col}: 有效 {self.processed_dates(factor_col)}天, "
+                         f"跳过 {self.skipped_dates(factor_col)}天")
+            lines.append(f"  筛选结果: {self.summary_line(factor_col)}")
+            for i, reason in enumerate(self.reasons(factor_col)):
+                if i >= max_reasons:
+                    lines.append(f"  ... 其余 {self.skipped_dates(factor_col) - max_reasons} 条从略")
+                    break
+                lines.append(f"  {reason}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+# ================================
+# 滚动窗口IC引擎
+# ================================
+# 每批合并计算的窗口样本总数上限，控制临时数组的内存占用
+ROLLING_CHUNK_ELEMENTS = 4_000_000
+
+
+def _date_offsets(group_ids, n_groups, mask=None):
+    """日期→行偏移索引：offsets[i]:offsets[j]即第i到第j-1个交易日在按日期排序数组中的行区间"""
+    if mask is not None:
+        group_ids = group_ids[mask]
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(group_ids, minlength=n_groups))
+    return offsets
+
+
+def _dense_codes(values):
+    """将数值映射为稠密整数编码，编码顺序与数值顺序一致（相同数值编码相同）"""
+    return np.unique(values, return_inverse=True)[1].astype(np.int64).ravel()
+
+
+def _window_average_ranks(codes, segment_ids, starts, n_codes):
+    """
+    对拼接后的多个窗口计算窗口内平均秩（处理重复值）
+
+    codes为稠密整数编码，把(窗口号, 编码)合成为单个整数键后只需一次argsort，
+    秩的定义与group_average_ranks相同。
+    """
+    n = len(codes)
+    ranks = np.empty(n, dtype=np.float64)
+    if n == 0:
+        return ranks
+    keys = segment_ids * np.int64(n_codes) + codes
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+
+    run_start = np.ones(n, dtype=bool)
+    run_start[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    run_begin = np.flatnonzero(run_start)
+    run_end = np.append(run_begin[1:], n)
+
+    # 窗口内位置i..j-1的平均秩为 (i + 1 + j) / 2
+    group_start = starts[segment_ids[order[run_begin]]]
+    run_rank = ((run_begin - group_start) + 1 + (run_end - group_start)) / 2
+    ranks[order] = np.repeat(run_rank, run_end - run_begin)
+    return ranks
+
+
+def rolling_pooled_ic(dates, factor_values, return_values, window_sizes, min_rows_per_date=2, date_groups=None):
+    """
+    一次扫描计算多个窗口长度的滚动IC（窗口内全部样本合并计算Spearman相关系数）
+
+    数据只按日期排序一次，每个窗口都是排序后数组上的一段连续切片，
+    窗口边界直接从日期→行偏移索引中读取；所有窗口长度的窗口合并成批，
+    每批只做一次整数键排序即完成秩计算，结果与逐窗口调用custom_spearman_corr一致。
+
+    Args:
+        dates: 信号日期数组
+        factor_values: 因子值数组
+        return_values: 收益率数组
+        window_sizes: 窗口大小列表（交易日数）
+        min_rows_per_date: 窗口内平均每个交易日至少需要的样本数（含缺失值行）
+        date_groups: build_date_groups的结果，可复用以避免重复排序
+
+    Returns:
+        dict: {窗口大小: {'end_positions': 窗口结束日期的位置, 'dates': 窗口结束日期, 'ic_values': 滚动IC}}
+    """
+    if date_groups is None:
+        date_groups = build_date_groups(dates)
+    order = date_groups['order']
+    group_ids = date_groups['group_ids']
+    n_dates = date_groups['n_groups']
+    unique_dates = date_groups['unique_dates']
+
+    x = np.asarray(factor_values, dtype=np.float64)[order]
+    y = np.asarray(return_values, dtype=np.float64)[order]
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    nonfinite = valid & (np.isinf(x) | np.isinf(y))
+
+    row_offsets = _date_offsets(group_ids, n_dates)
+    valid_offsets = _date_offsets(group_ids, n_dates, valid)
+    nonfinite_offsets = _date_offsets(group_ids, n_dates, nonfinite)
+
+    # 有效样本按日期排序后的稠密编码，窗口内的并列关系与原始数值完全一致
+    codes_x = _dense_codes(x[valid])
+    codes_y = _dense_codes(y[valid])
+    n_codes_x = int(codes_x.max()) + 1 if len(codes_x) else 1
+    n_codes_y = int(codes_y.max()) + 1 if len(codes_y) else 1
+
+    # 收集所有窗口长度下满足样本要求的窗口
+    window_keys, window_ends, window_lo, window_hi = [], [], [], []
+    for window_size in window_sizes:
+        if window_size < 1 or n_dates < window_size:
+            continue
+        begin = np.arange(n_dates - window_size + 1)
+        end = begin + window_size
+        total_rows = row_offsets[end] - row_offsets[begin]
+        valid_rows = valid_offsets[end] - valid_offsets[begin]
+        has_nonfinite = (nonfinite_offsets[end] - nonfinite_offsets[begin]) > 0
+        eligible = (total_rows >= window_size * min_rows_per_date) & (valid_rows >= window_size) & ~has_nonfinite
+        window_keys.append(np.full(eligible.sum(), window_size, dtype=np.int64))
+        window_ends.append(end[eligible] - 1)
+        window_lo.append(valid_offsets[begin[eligible]])
+        window_hi.append(valid_offsets[end[eligible]])
+
+    window_keys = np.concatenate(window_keys) if window_keys else np.zeros(0, dtype=np.int64)
+    window_ends = np.concatenate(window_ends) if window_ends else np.zeros(0, dtype=np.int64)
+    window_lo = np.concatenate(window_lo) if window_lo else np.zeros(0, dtype=np.int64)
+    lengths = (np.concatenate(window_hi) if window_hi else np.zeros(0, dtype=np.int64)) - window_lo
+    ic = np.empty(len(lengths), dtype=np.float64)
+
+    # 按样本总数分批：每批内把各窗口切片拼接后统一计算组内秩和相关系数
+    cumulative = np.cumsum(lengths)
+    first = 0
+    while first < len(lengths):
+        base = cumulative[first] - lengths[first]
+        last = max(first + 1, int(np.searchsorted(cumulative, base + ROLLING_CHUNK_ELEMENTS, side='right')))
+        batch_lengths = lengths[first:last]
+        segment_ids = np.repeat(np.arange(last - first), batch_lengths)
+        batch_starts, _ = _segment_starts(segment_ids, last - first)
+        rows = np.arange(batch_lengths.sum()) + np.repeat(window_lo[first:last] - batch_starts, batch_lengths)
+
+        rank_x = _window_average_ranks(codes_x[rows], segment_ids, batch_starts, n_codes_x)
+        rank_y = _window_average_ranks(codes_y[rows], segment_ids, batch_starts, n_codes_y)
+        ic[first:last] = _segment_corr_from_ranks(rank_x, rank_y, batch_starts, batch_lengths)
+        first = last
+
+    results = {}
+    for window_size in window_sizes:
+        selected = (window_keys == window_size) & np.isfinite(ic)
+        end_positions = window_ends[selected]
+        results[window_size] = {
+            'end_positions': end_positions,
+            'dates': unique_dates[end_positions],
+            'ic_values': ic[selected]
+        }
+    return results
+
+
+def rolling_ic_statistics(ic_values, window_sizes, min_periods=None):
+    """
+    用累计和一次计算每日IC序列的滚动均值、标准差和IR
+
+    每个窗口长度只需对三条累计和序列做一次差分，
+    30/60/120/250日等多个窗口的开销与单个窗口基本相同。
+
+    Args:
+        ic_values: 每日IC序列（NaN视为缺失，不计入窗口）
+        window_sizes: 窗口大小列表（序列位置数）
+        min_periods: 窗口内至少需要的有效IC数量，默认为窗口大小（与pandas的rolling相同）
+
+    Returns:
+        dict: {窗口大小: {'mean', 'std', 'ir', 'count'}}，各数组与输入序列等长、按窗口结束位置对齐
+    """
+    values = np.asarray(ic_values, dtype=np.float64)
+    valid = np.isfinite(values)
+    # 先减去整体均值再累加，降低平方和相减时的精度损失
+    center = values[valid].mean() if valid.any() else 0.0
+    centered = np.where(valid, values - center, 0.0)
+
+    count_sum = np.concatenate(([0], np.cumsum(valid)))
+    first_sum = np.concatenate(([0.0], np.cumsum(centered)))
+    second_sum = np.concatenate(([0.0], np.cumsum(centered * centered)))
+
+    results = {}
+    end = np.arange(1, len(values) + 1)
+    for window_size in window_sizes:
+        required = max(window_size if min_periods is None else min_periods, 1)
+        begin = np.maximum(end - window_size, 0)
+        count = count_sum[end] - count_sum[begin]
+        s1 = first_sum[end] - first_sum[begin]
+        s2 = second_sum[end] - second_sum[begin]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            window_mean = s1 / count
+            window_var = np.maximum(s2 - s1 * window_mean, 0.0) / (count - 1)
+        enough = count >= required
+        mean = np.where(enough, window_mean + center, np.nan)
+        std = np.where(enough & (count > 1), np.sqrt(window_var), np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ir = np.where(std > 0, mean / std, np.nan)
+        results[window_size] = {'mean': mean, 'std': std, 'ir': ir, 'count': count}
+    return results
+
+
+# ================================
+# 分组收益引擎
+# ================================
+def quantile_group_labels(n_samples, n_groups):
+    """
+    按排序后的位置用整数运算分配等分组号（1..n_groups）
+
+    前remainder组各多分配1个样本，与逐组生成标签列表的结果相同。
+
+    Args:
+        n_samples: 已排序的样本数
+        n_groups: 分组数量
+
+    Returns:
+        np.ndarray: 每个位置的分组号（非递减）
+    """
+    positions = np.arange(n_samples)
+    group_size, remainder = divmod(n_samples, n_groups)
+    boundary = remainder * (group_size + 1)
+    labels = np.empty(n_samples, dtype=np.int64)
+    head = positions < boundary
+    labels[head] = positions[head] // (group_size + 1)
+    if group_size > 0:
+        labels[~head] = remainder + (positions[~head] - boundary) // group_size
+    return labels + 1
+
+
+def _sample_std(values):
+    """样本标准差（ddof=1，忽略NaN），计算方式与pandas的Series.std一致（缺失值按0参与求和）"""
+    missing = np.isnan(values)
+    n = len(values) - missing.sum()
+    if n < 2:
+        return np.nan
+    filled = np.where(missing, 0.0, values)
+    avg = filled.sum() / n
+    return np.sqrt(np.where(missing, 0.0, (avg - filled) ** 2).sum() / (n - 1))
+
+
+def _max_drawdown(returns):
+    """按样本顺序累乘净值计算最大回撤，与pandas的cumprod/expanding().max()结果一致"""
+    valid = ~np.isnan(returns)
+    if not valid.any():
+        return np.nan
+    wealth = np.cumprod(np.where(valid, 1 + returns, 1.0))
+    wealth = np.where(valid, wealth, np.nan)
+    running_max = np.fmax.accumulate(wealth)
+    drawdown = (wealth - running_max) / running_max
+    return abs(np.nanmin(drawdown))
+
+
+def _evaluate_parameter_bin(dates, factor_values, return_values, use_pearson=False, n_groups=5):
+    """
+    计算一个参数区间（已按因子值排序的连续切片）的IC均值、IR、多空收益和胜率
+
+    只读取传入的数组，不修改任何分析器状态，可在多个线程中并行调用。
+    """
+    data_count = len(factor_values)
+    performance = {
+        'factor_min': np.min(factor_values) if data_count else np.nan,
+        'factor_max': np.max(factor_values) if data_count else np.nan,
+        'data_count': data_count,
+        'long_short_return': 0.0,
+        'ir': 0.0,
+        'ic_mean': np.nan,
+        'win_rate': 0.0
+    }
+    if data_count == 0:
+        return performance
+
+    # 每日IC（与calculate_ic相同的筛选规则）
+    daily_ic = compute_daily_ic(dates, factor_values, return_values, use_pearson=use_pearson)['daily_ic']
+    daily_ic = daily_ic[np.isfinite(daily_ic)]
+    if len(daily_ic) > 0:
+        ic_mean = np.mean(daily_ic)
+        ic_std = np.std(daily_ic, ddof=1) if len(daily_ic) > 1 else np.nan
+        performance['ic_mean'] = ic_mean
+        performance['ir'] = ic_mean / ic_std if not np.isnan(ic_std) and ic_std != 0 else 0.0
+
+    # 区间内再等分（切片已按因子值排序，分组即连续子区间）；
+    # 与calculate_group_returns一致：空分组的平均收益记为0，收益全为缺失的分组为NaN
+    labels = quantile_group_labels(data_count, n_groups)
+    valid = ~np.isnan(return_values)
+    rows = np.bincount(labels, minlength=n_groups + 1)[1:]
+    counts = np.bincount(labels[valid], minlength=n_groups + 1)[1:]
+    sums = np.bincount(labels[valid], weights=return_values[valid], minlength=n_groups + 1)[1:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        group_means = np.where(rows > 0, sums / counts, 0.0)
+    if n_groups >= 2:
+        long_short_return = group_means[-1] - group_means[0]
+        performance['long_short_return'] = 0.0 if np.isnan(long_short_return) else long_short_return
+    # 胜率：平均收益为正的分组占比
+    performance['win_rate'] = (group_means > 0).sum() / n_groups * 100
+    return performance
+
+
+def sweep_factor_bins(dates, factor_values, return_values, n_bins=10, use_pearson=False, n_groups=5,
+                      max_workers=None):
+    """
+    按因子值排序后等分成n_bins个参数区间，逐区间计算IC和分组收益
+
+    数据只排序一次，每个区间是排序后数组上的一段切片（视图），不复制数据；
+    区间之间相互独立，max_workers大于1时用线程池并行计算，结果按区间顺序返回。
+
+    Args:
+        dates: 信号日期数组
+        factor_values: 因子值数组（NaN行被剔除）
+        return_values: 收益率数组
+        n_bins: 区间数量（前n_bins-1个区间各含len//n_bins个样本，余数并入最后一个区间）
+        use_pearson: 是否使用Pearson相关系数，默认为False（使用Spearman）
+        n_groups: 区间内计算多空收益时的分组数量
+        max_workers: 并行线程数，None或1时顺序计算
+
+    Returns:
+        list: 每个区间的性能字典（decile、factor_min、factor_max、data_count、
+              long_short_return、ir、ic_mean、win_rate）
+    """
+    factor_values = pd.to_numeric(pd.Series(factor_values), errors='coerce').values.astype(np.float64)
+    valid = ~np.isnan(factor_values)
+    order = np.flatnonzero(valid)[np.argsort(factor_values[valid], kind='quicksort')]
+    sorted_dates = np.asarray(dates)[order]
+    sorted_factor = factor_values[order]
+    sorted_returns = np.asarray(return_values, dtype=np.float64)[order]
+
+    total = len(order)
+    bin_size = total // n_bins
+    bounds = [(i * bin_size, total if i == n_bins - 1 else (i + 1) * bin_size) for i in range(n_bins)]
+
+    def evaluate(bound):
+        start, end = bound
+        return _evaluate_parameter_bin(sorted_dates[start:end], sorted_factor[start:end], sorted_returns[start:end],
+                                       use_pearson=use_pearson, n_groups=n_groups)
+
+    if max_workers and max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            performances = list(executor.map(evaluate, bounds))
+    else:
+        performances = [evaluate(bound) for bound in bounds]
+
+    return [dict(decile=i + 1, **performance) for i, performance in enumerate(performances)]
+
+
+# 过滤条件支持的操作符（run_filtered_factor_analysis使用）
+FILTER_OPERATORS = {
+    '>': np.greater,
+    '<': np.less,
+    '>=': np.greater_equal,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal
+}
+
+# 阈值搜索支持的操作符（保留一侧样本的区间条件）
+THRESHOLD_OPERATORS = ('>', '>=', '<', '<=')
+
+
+def threshold_search(factor_values, return_values, operator='>', min_samples=30):
+    """
+    对"因子 操作符 阈值"形式的过滤条件，一次计算所有候选阈值下保留样本的收益统计
+
+    因子只排序一次，对排序后的收益率、收益率平方和盈利次数做累计和，
+    每个候选阈值（因子的每个不同取值）保留的样本是排序结果的一段前缀或后缀，
+    其样本数、平均收益、胜率和夏普比率都由累计和的差在O(1)内得到，总复杂度O(n log n)。
+
+    Args:
+        factor_values: 过滤因子数组
+        return_values: 收益率数组（因子或收益率缺失的行被剔除）
+        operator: 过滤操作符，'>'、'>='、'<'或'<='
+        min_samples: 保留样本数少于该值的阈值不输出
+
+    Returns:
+        dict: threshold（阈值）、count（样本数）、mean_return（平均收益）、std_return（收益标准差）、
+              win_rate（胜率，百分比）、sharpe（平均收益/收益标准差，未年化）各一个数组
+    """
+    if operator not in THRESHOLD_OPERATORS:
+        raise ValueError(f"不支持的阈值搜索操作符: {operator}，可选: {', '.join(THRESHOLD_OPERATORS)}")
+
+    factor_values = pd.to_numeric(pd.Series(factor_values), errors='coerce').values.astype(np.float64)
+    return_values = np.asarray(return_values, dtype=np.float64)
+    valid = np.isfinite(factor_values) & np.isfinite(return_values)
+    factor_values = factor_values[valid]
+    return_values = return_values[valid]
+
+    order = np.argsort(factor_values, kind='mergesort')
+    sorted_factor = factor_values[order]
+    sorted_returns = return_values[order]
+    n = len(sorted_factor)
+
+    # 前缀累计和（首位补0，区间[start, end)的和为cum[end] - cum[start]）
+    cum_returns = np.concatenate(([0.0], np.cumsum(sorted_returns)))
+    cum_squares = np.concatenate(([0.0], np.cumsum(sorted_returns ** 2)))
+    cum_wins = np.concatenate(([0], np.cumsum(sorted_returns > 0)))
+
+    # 每个不同取值在排序结果中的起止位置：小于阈值的样本为[0, first)，小于等于阈值的样本为[0, last)
+    thresholds, first = np.unique(sorted_factor, return_index=True)
+    last = np.append(first[1:], n)
+    if operator in ('<', '<='):
+        start = np.zeros(len(thresholds), dtype=np.int64)
+        end = first if operator == '<' else last
+    else:
+        start = last if operator == '>' else first
+        end = np.full(len(thresholds), n, dtype=np.int64)
+
+    count = end - start
+    sum_returns = cum_returns[end] - cum_returns[start]
+    sum_squares = cum_squares[end] - cum_squares[start]
+    wins = cum_wins[end] - cum_wins[start]
+
+    keep = count >= max(min_samples, 1)
+    thresholds, count = thresholds[keep], count[keep]
+    sum_returns, sum_squares, wins = sum_returns[keep], sum_squares[keep], wins[keep]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_return = sum_returns / count
+        variance = np.maximum(sum_squares - sum_returns * mean_return, 0.0) / (count - 1)
+        std_return = np.where(count > 1, np.sqrt(variance), np.nan)
+        sharpe = np.where(std_return > 0, mean_return / std_return, np.nan)
+
+    return {
+        'threshold': thresholds,
+        'count': count,
+        'mean_return': mean_return,
+        'std_return': std_return,
+        'win_rate': wins / count * 100,
+        'sharpe': sharpe
+    }
+
+
+# 阈值搜索结果的指标名与报告表格列名对应关系
+THRESHOLD_METRIC_COLUMNS = {
+    'count': '样本数',
+    'mean_return': '平均收益',
+    'std_return': '收益标准差',
+    'win_rate': '胜率',
+    'sharpe': '夏普比率'
+}
+
+
+def _threshold_candidates(factor_values, n_bins=None):
+    """
+    生成候选阈值：n_bins为None时取因子的全部不同取值，否则取n_bins+1个等分位点（均为实际出现的因子值）
+    """
+    sorted_values = np.sort(factor_values)
+    if n_bins is None or len(sorted_values) == 0:
+        return np.unique(sorted_values)
+    positions = np.floor(np.linspace(0, 1, n_bins + 1) * (len(sorted_values) - 1)).astype(np.int64)
+    return np.unique(sorted_values[positions])
+
+
+def _threshold_codes(factor_values, thresholds, operator):
+    """
+    把因子值编码为0..len(thresholds)的整数，使"因子 operator thresholds[j]"成立等价于：
+    '>'/'>='时编码 > j，'<'/'<='时编码 <= j
+    """
+    side = 'left' if operator in ('>', '<=') else 'right'
+    return np.searchsorted(thresholds, factor_values, side=side)
+
+
+def _directional_cumsum(values, axis, operator):
+    """
+    沿axis对编码直方图做累计：'>'/'>='得到编码 > j 的后缀和，'<'/'<='得到编码 <= j 的前缀和；
+    输入沿axis长度为m+1，输出长度为m（对应m个候选阈值）
+    """
+    prefix = np.cumsum(values, axis=axis)
+    m = values.shape[axis] - 1
+    head = np.take(prefix, np.arange(m), axis=axis)
+    if operator in ('<', '<='):
+        return head
+    total = np.take(prefix, [m], axis=axis)
+    return total - head
+
+
+def threshold_grid_search(factor_a, factor_b, return_values, operator_a='>', operator_b='>', n_bins=50,
+                          min_samples=30, top_k=10, metric='sharpe'):
+    """
+    对两个过滤因子的组合条件"因子A operator_a 阈值A 且 因子B operator_b 阈值B"做二维阈值网格搜索
+
+    两个因子各自按候选阈值编码，把收益率、收益率平方、盈利次数和样本数累加到一张二维直方图，
+    再沿两个方向做累计和，每个网格单元（阈值A, 阈值B）保留样本的统计量都是累计和中的一个元素，
+    计算量为O(n + 网格单元数)，不需要对每个单元重新过滤数据。
+    逐行计算指标并用容量为top_k的堆保留最优单元，结果数量与网格大小无关。
+
+    Args:
+        factor_a, factor_b: 两个过滤因子数组
+        return_values: 收益率数组（任一因子或收益率缺失的行被剔除）
+        operator_a, operator_b: 两个因子的过滤操作符，'>'、'>='、'<'或'<='
+        n_bins: 每个因子的候选阈值取n_bins+1个等分位点，None时取全部不同取值
+        min_samples: 保留样本数少于该值的网格单元不参与排名
+        top_k: 返回的最优单元数量
+        metric: 排名指标，'sharpe'、'mean_return'、'win_rate'、'count'或'std_return'
+
+    Returns:
+        list: 按指标降序排列的最优单元，每项为包含threshold_a、threshold_b、count、mean_return、
+              std_return、win_rate、sharpe的字典
+    """
+    for operator in (operator_a, operator_b):
+        if operator not in THRESHOLD_OPERATORS:
+            raise ValueError(f"不支持的阈值搜索操作符: {operator}，可选: {', '.join(THRESHOLD_OPERATORS)}")
+    if metric not in THRESHOLD_METRIC_COLUMNS:
+        raise ValueError(f"不支持的排名指标: {metric}，可选: {', '.join(THRESHOLD_METRIC_COLUMNS)}")
+
+    factor_a = pd.to_numeric(pd.Series(factor_a), errors='coerce').values.astype(np.float64)
+    factor_b = pd.to_numeric(pd.Series(factor_b), errors='coerce').values.astype(np.float64)
+    return_values = np.asarray(return_values, dtype=np.float64)
+    valid = np.isfinite(factor_a) & np.isfinite(factor_b) & np.isfinite(return_values)
+    factor_a, factor_b, return_values = factor_a[valid], factor_b[valid], return_values[valid]
+
+    thresholds_a = _threshold_candidates(factor_a, n_bins)
+    thresholds_b = _threshold_candidates(factor_b, n_bins)
+    m_a, m_b = len(thresholds_a), len(thresholds_b)
+    if m_a == 0 or m_b == 0 or top_k <= 0:
+        return []
+
+    # 二维直方图：stats[0..3]分别为样本数、收益和、收益平方和、盈利次数
+    cells = _threshold_codes(factor_a, thresholds_a, operator_a) * (m_b + 1) + \
+        _threshold_codes(factor_b, thresholds_b, operator_b)
+    size = (m_a + 1) * (m_b + 1)
+    stats = np.stack([
+        np.bincount(cells, minlength=size),
+        np.bincount(cells, weights=return_values, minlength=size),
+        np.bincount(cells, weights=return_values ** 2, minlength=size),
+        np.bincount(cells, weights=(return_values > 0).astype(np.float64), minlength=size)
+    ]).reshape(4, m_a + 1, m_b + 1)
+    stats = _directional_cumsum(stats, 1, operator_a)
+
+    heap = []
+    for i in range(m_a):
+        count, sum_returns, sum_squares, wins = _directional_cumsum(stats[:, i, :], 1, operator_b)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_return = sum_returns / count
+            variance = np.maximum(sum_squares - sum_returns * mean_return, 0.0) / (count - 1)
+            std_return = np.where(count > 1, np.sqrt(variance), np.nan)
+            row_stats = {
+                'count': count,
+                'mean_return': mean_return,
+                'std_return': std_return,
+                'win_rate': wins / count * 100,
+                'sharpe': np.where(std_return > 0, mean_return / std_return, np.nan)
+            }
+        score = row_stats[metric]
+        candidates = np.flatnonzero((count >= max(min_samples, 1)) & np.isfinite(score))
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-score[candidates], top_k - 1)[:top_k]]
+        for j in candidates:
+            # 分数相同时阈值位置靠前的单元优先（网格位置唯一，比较不会用到后面的字典）
+            item = (score[j], -(i * m_b + j), {
+                'threshold_a': thresholds_a[i],
+                'threshold_b': thresholds_b[j],
+                'count': int(count[j]),
+                **{key: values[j] for key, values in row_stats.items() if key != 'count'}
+            })
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+
+    return [cell for _, _, cell in sorted(heap, key=lambda item: item[:2], reverse=True)]
+
+
+def calculate_standard_annual_return(total_return_rate, observation_years, method='standard_compound'):
+    """
+    标准复利年化收益率计算 - 优化版本
+    
+    Args:
+        total_return_rate: 总收益率（例如：0.2058表示20.58%的总收益）
+        observation_years: 观测期年数（例如：5.18年）
+        method: 计算方法，'standard_compound'（标准复利）或'log_based'（对数方法）
+        
+    Returns:
+        tuple: (年化收益率, 计算详情字典)
+    
+    数学公式:
+    标准复利年化: (1 + 总收益率)^(1/年数) - 1
+    对数方法: exp(ln(1+总收益率)/年数) - 1（数值稳定性更好）
+    
+    示例验证:
+    如果日收益率5.8%，交易85天，总收益约为120.58%
+    观测期5.18年，则年化收益率 = (1.2058)^(1/5.18) - 1 ≈ 160.77%
+    """
+    try:
+        # 输入参数验证
+        if total_return_rate is None or observation_years is None:
+            return np.nan, {'error': '输入参数包含None值'}
+        
+        if not np.isfinite(total_return_rate) or not np.isfinite(observation_years):
+            return np.nan, {'error': '输入参数包含无穷大或NaN值'}
+        
+        if total_return_rate <= -1:
+            return np.nan, {'error': f'总收益率不能小于-100%，实际值: {total_return_rate}'}
+        
+        if observation_years <= 0:
+            return np.nan, {'error': f'观测期年数必须大于0，实际值: {observation_years}'}
+        
+        if observation_years > 100:
+            return np.nan, {'error': f'观测期年数过大，可能导致数值不稳定: {observation_years}'}
+        
+        # 转换为最终价值倍数
+        final_value = total_return_rate + 1
+        
+        # 检查最终价值是否合理
+        if final_value <= 0:
+            return np.nan, {'error': f'最终价值倍数必须为正数，实际值: {final_value}'}
+        
+        # 根据方法选择计算方式
+        if method == 'log_based':
+            # 对数方法：数值稳定性更好
+            log_final_value = np.log(final_value)
+            if not np.isfinite(log_final_value):
+                return np.nan, {'error': '对数计算溢出，数值不稳定'}
+            
+            annual_log_return = log_final_value / observation_years
+            annual_return_rate = np.exp(annual_log_return) - 1
+            
+            calculation_details = {
+                'method': 'log_based',
+                'final_value': final_value,
+                'log_final_value': log_final_value,
+                'annual_log_return': annual_log_return,
+                'observation_years': observation_years
+            }
+            
+        else:
+            # 标准复利方法：直接幂运算
+            annual_return_rate = final_value ** (1/observation_years) - 1
+            
+            calculation_details = {
+                'method': 'standard_compound',
+                'final_value': final_value,
+                'observation_years': observation_years,
+                'calculation': f'{final_value}^(1/{observation_years}) - 1'
+            }
+        
+        # 数值稳定性检查
+        if not np.isfinite(annual_return_rate):
+            return np.nan, {'error': '年化收益率计算结果数值不稳定'}
+        
+        # 合理性检查：年化收益率不应该过于极端
+        if abs(annual_return_rate) > 10:  # 年化收益率超过1000%
+            return np.nan, {'error': f'年化收益率过于极端: {annual_return_rate:.2%}'}
+        
+        # 添加计算质量评估
+        calculation_details.update({
+            'annual_return_rate': annual_return_rate,
+            'annual_return_percent': annual_return_rate * 100,
+            'quality_assessment': {
+                'numerical_stability': 'stable' if abs(annual_return_rate) < 5 else ('moderate' if abs(annual_return_rate) < 10 else 'unstable'),
+                'return_magnitude': 'extreme_high' if annual_return_rate > 1 else ('high' if annual_return_rate > 0.5 else ('positive' if annual_return_rate > 0 else 'negative')),
+                'calculation_reliable': abs(annual_return_rate) < 5  # 超过500%的年化收益率需要额外验证
+            }
+        })
+        
+        # 反向验证计算结果（可选验证）
+        reconstructed_total_return = (1 + annual_return_rate) ** observation_years - 1
+        verification_error = abs(reconstructed_total_return - total_return_rate)
+        calculation_details['verification'] = {
+            'reconstructed_total_return': reconstructed_total_return,
+            'original_total_return': total_return_rate,
+            'verification_error': verification_error,
+            'verification_passed': verification_error < 1e-6
+        }
+        
+        return annual_return_rate, calculation_details
+        
+    except Exception as e:
+        return np.nan, {
+            'error': f'标准复利年化计算错误: {str(e)}',
+            'total_return_rate': total_return_rate,
+            'observation_years': observation_years
+        }
+
+def safe_calculate_annual_return(total_return, years, method='standard_compound'):
+    """
+    修复4: 安全版本的年化计算函数，确保输入类型正确
+    防止类型转换错误，提高代码健壮性
+    
+    Args:
+        total_return: 总收益率（任意数值类型）
+        years: 观测年数（任意数值类型）
+        method: 计算方法
+        
+    Returns:
+        tuple: (年化收益率, 计算详情字典)
+    """
+    try:
+        # 类型转换与验证
+        if not isinstance(total_return, (int, float, np.number)):
+            print(f"  警告: 总收益率类型 {type(total_return)} 不兼容，尝试转换...")
+            if isinstance(total_return, str):
+                total_return = float(total_return)
+            else:
+                total_return = 0.0  # 使用默认值
+                
+        if not isinstance(years, (int, float, np.number)):
+            print(f"  警告: 观测年数类型 {type(years)} 不兼容，尝试转换...")
+            if isinstance(years, str):
+                years = float(years)
+            else:
+                years = 1.0  # 使用默认值
+        
+        # 调用原始计算函数
+        return calculate_standard_annual_return(total_return, years, method)
+    except Exception as e:
+        print(f"  年化计算出错: {str(e)}")
+        return np.nan, {'error': f'年化计算失败: {str(e)}'}
+
+def validate_annual_return_calculation(annual_return, observation_years, original_total_return, tolerance=0.01):
+    """
+    验证年化收益率计算的正确性（反向验证）- 优化版本
+    
+    Args:
+        annual_return: 年化收益率
+        observation_years: 观测期年数
+        original_total_return: 原始总收益率
+        tolerance: 相对误差容忍度，默认为1%
+        
+    Returns:
+        dict: 验证结果，包含详细分析信息
     """
     try:
         # 输入参数验证
@@ -1185,18 +2418,471 @@ def validate_annual_return_calculation(annual_return, observation_years, origina
             'observation_years': observation_years
         }
 
+
+# ==================== 数据文件列式缓存 ====================
+# Excel解析（openpyxl）是启动时最慢的一步：首次读取后把每一列保存为一个.npy文件，
+# 之后的运行直接内存映射这些文件，并且只读取需要的列。
+
+# 缓存目录名（位于数据文件所在目录下）
+TABLE_CACHE_DIR = '.yinzifenxi_cache'
+# 缓存格式版本，格式变化时递增使旧缓存失效
+TABLE_CACHE_VERSION = 1
+# 读取缓存时可能出现的错误（文件缺失或损坏）；出现这些错误时退回直接读取数据文件
+TABLE_CACHE_ERRORS = (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError)
+
+
+def _file_sha256(file_path, chunk_size=1 << 20):
+    """分块计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _table_cache_path(file_path, cache_dir=None):
+    """数据文件对应的缓存目录"""
+    file_path = os.path.abspath(file_path)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(file_path), TABLE_CACHE_DIR)
+    return os.path.join(cache_dir, os.path.basename(file_path))
+
+
+def _write_table_cache(df, cache_path, fingerprint):
+    """
+    把DataFrame按列写成.npy文件和manifest.json
+
+    数值、布尔和日期列直接保存；字符串列保存为整数编码和取值表两个数组（均可内存映射）；
+    其余类型（如混合类型的object列）以pickle方式保存，读取时不做内存映射。
+    先写入临时目录再整体替换，避免并发或中断时留下不完整的缓存。
+    """
+    parent = os.path.dirname(cache_path)
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix='.tmp_', dir=parent)
+    try:
+        columns = []
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            entry = {'name': name, 'dtype': str(series.dtype), 'index': i}
+            kind = series.dtype.kind
+            if kind in 'biufcmM' and not isinstance(series.dtype, pd.DatetimeTZDtype) \
+                    and not pd.api.types.is_extension_array_dtype(series.dtype):
+                entry['kind'] = 'array'
+                np.save(os.path.join(tmp_path, f'{i}.npy'), series.to_numpy())
+            elif series.dropna().map(type).eq(str).all():
+                codes, uniques = pd.factorize(series)
+                entry['kind'] = 'string'
+                np.save(os.path.join(tmp_path, f'{i}.codes.npy'), codes.astype(np.int32))
+                np.save(os.path.join(tmp_path, f'{i}.values.npy'), np.asarray(uniques, dtype=str))
+            else:
+                entry['kind'] = 'pickle'
+                np.save(os.path.join(tmp_path, f'{i}.npy'), series.to_numpy(dtype=object), allow_pickle=True)
+            columns.append(entry)
+
+        manifest = dict(fingerprint, version=TABLE_CACHE_VERSION, n_rows=len(df), columns=columns)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        shutil.rmtree(cache_path, ignore_errors=True)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return manifest
+
+
+def _read_table_cache(cache_path, manifest, columns=None):
+    """按manifest读取缓存中的列（columns为None时读取全部列）
+
+    数值数组以写时复制方式内存映射，构造DataFrame时不复制，按需从磁盘读入；字符串和对象列在读取时解码到内存。
+    """
+    entries = manifest['columns']
+    if columns is not None:
+        wanted = set(columns)
+        entries = [entry for entry in entries if entry['name'] in wanted]
+
+    data = {}
+    for entry in entries:
+        i = entry['index']
+        if entry['kind'] == 'array':
+            # 普通ndarray视图，数据仍在内存映射中
+            data[entry['name']] = np.asarray(np.load(os.path.join(cache_path, f'{i}.npy'), mmap_mode='c'))
+        elif entry['kind'] == 'string':
+            codes = np.load(os.path.join(cache_path, f'{i}.codes.npy'), mmap_mode='c')
+            uniques = np.load(os.path.join(cache_path, f'{i}.values.npy')).astype(object)
+            values = np.full(len(codes), np.nan, dtype=object)
+            present = codes >= 0
+            values[present] = uniques[codes[present]]
+            data[entry['name']] = pd.Series(values, dtype=entry['dtype'])
+        else:
+            values = np.load(os.path.join(cache_path, f'{i}.npy'), allow_pickle=True)
+            data[entry['name']] = pd.Series(values, dtype=entry['dtype'])
+    return pd.DataFrame(data, columns=[entry['name'] for entry in entries], copy=False)
+
+
+def _valid_table_manifest(manifest_file, file_path, stat):
+    """返回与数据文件一致的缓存manifest，没有缓存或缓存已失效时返回None"""
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != TABLE_CACHE_VERSION:
+        return None
+    if manifest['size'] != stat.st_size or manifest['mtime_ns'] != stat.st_mtime_ns:
+        if manifest['size'] != stat.st_size or manifest['sha256'] != _file_sha256(file_path):
+            return None
+        # 文件仅修改时间变化（如被touch），更新缓存记录后继续使用
+        manifest['mtime_ns'] = stat.st_mtime_ns
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+def load_table_cached(file_path, columns=None, cache_dir=None, reader=None):
+    """
+    读取数据文件，使用按列保存的二进制缓存避免重复解析Excel
+
+    缓存以文件大小、修改时间和内容SHA-256为键：大小和修改时间都一致时直接使用缓存；
+    否则重新计算内容哈希，内容未变（如文件仅被touch）时更新缓存记录后继续使用，
+    内容变化时重新解析文件并重建缓存。缓存读写失败时退回直接读取文件，解析文件本身的错误直接抛出。
+
+    Args:
+        file_path: 数据文件路径
+        columns: 需要读取的列名列表，None时读取全部列（只有这些列会被读入内存）
+        cache_dir: 缓存根目录，默认为数据文件所在目录下的TABLE_CACHE_DIR
+        reader: 解析原始文件的函数，默认为pd.read_excel
+
+    Returns:
+        DataFrame: 读取的数据
+    """
+    reader = reader or pd.read_excel
+    cache_path = _table_cache_path(file_path, cache_dir)
+    manifest_file = os.path.join(cache_path, 'manifest.json')
+    stat = os.stat(file_path)
+
+    try:
+        manifest = _valid_table_manifest(manifest_file, file_path, stat)
+        if manifest is not None:
+            return _read_table_cache(cache_path, manifest, columns)
+    except TABLE_CACHE_ERRORS as e:
+        print(f"警告: 数据缓存不可用（{e}），直接读取数据文件")
+
+    # 解析文件的错误直接抛出，不当作缓存错误重试
+    df = reader(file_path)
+    try:
+        fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': _file_sha256(file_path)}
+        _write_table_cache(df, cache_path, fingerprint)
+    except Exception as e:
+        # 写入失败不影响已解析的数据
+        print(f"警告: 无法写入数据缓存（{e}）")
+    return df if columns is None else df[[c for c in df.columns if c in set(columns)]]
+
+
+# ==================== 原始数据预处理（两个分析器共用） ====================
+
+# 可能以百分比字符串（如"-14.5%"）保存的列
+PERCENTAGE_COLUMNS = [
+    '日最大跌幅百分比', '信号当日收盘涨跌幅', '信号后一日开盘涨跌幅',
+    '次日开盘后总体下跌幅度', '前10日最大涨幅', '当日回调', '持股2日收益率'
+]
+# 转为分类类型（category）的标识列
+CATEGORY_COLUMNS = ['股票代码', '股票名称']
+# 信号日期对应的整数日序号列（1970-01-01起的天数，信号日期缺失时为int64最小值）
+SIGNAL_DAY_COL = '信号日序号'
+
+
+def _is_text_dtype(series):
+    """是否为object或字符串类型的列"""
+    return series.dtype == object or (pd.api.types.is_string_dtype(series.dtype) and
+                                      not isinstance(series.dtype, pd.CategoricalDtype))
+
+
+def prepare_analysis_data(data, factors, return_col, float_dtype=None):
+    """
+    原始数据的统一预处理：百分比字符串解析、数值转换、分类类型压缩和日期转换
+
+    只替换需要转换的列，其余列与输入共享内存，不复制整个数据框；输入已经处理过时原样返回，
+    因此FactorAnalysis处理后的结果可以直接交给ParameterizedFactorAnalyzer，不会重复解析。
+
+    - 所有百分比字符串列拼接后一次完成去除"%"和数值转换，再除以100拆回各列
+    - 非数值型因子列转换为数值（无法解析的值为NaN），收益率列去除"%"后转换为数值
+    - 股票代码、股票名称转为分类类型（仅在占用内存更少时）
+    - 信号日期转换为datetime，并一次性计算整数日序号列SIGNAL_DAY_COL
+    - float_dtype为np.float32时把所有浮点列压缩为float32（默认保持原精度）
+
+    Args:
+        data: 原始数据框（不会被修改）
+        factors: 因子列名列表
+        return_col: 收益率列名
+        float_dtype: 浮点列的目标类型，None时不改变
+
+    Returns:
+        tuple: (处理后的数据框, 报告字典)，报告包含percent_columns（从百分比字符串转换的列）、
+               numeric_columns（{列名: 原类型}，转换为数值的列）、category_columns、
+               memory_before、memory_after（发生变化的列转换前后占用的字节数）
+    """
+    changes = {}
+    report = {'percent_columns': [], 'numeric_columns': {}, 'category_columns': []}
+
+    # 百分比字符串列：所有列拼接后去重，每个不同的字符串只解析一次
+    percent_columns = [col for col in PERCENTAGE_COLUMNS if col in data.columns and _is_text_dtype(data[col])]
+    if percent_columns:
+        text = np.concatenate([data[col].astype(str).to_numpy(dtype=object) for col in percent_columns])
+        codes, uniques = pd.factorize(text)
+        parsed_uniques = pd.to_numeric(pd.Series(uniques, dtype=object).str.replace('%', '', regex=False),
+                                       errors='coerce').to_numpy(dtype=np.float64) / 100
+        # 缺失值的编码为-1
+        parsed = np.where(codes >= 0, parsed_uniques[codes] if len(parsed_uniques) else np.nan, np.nan)
+        for col, values in zip(percent_columns, parsed.reshape(len(percent_columns), len(data))):
+            changes[col] = pd.Series(values, index=data.index)
+        report['percent_columns'] = percent_columns
+
+    # 其余非数值型因子列和收益率列
+    for col in list(factors) + [return_col]:
+        if col not in data.columns or col in changes or pd.api.types.is_numeric_dtype(data[col]):
+            continue
+        values = data[col]
+        if col == return_col and _is_text_dtype(values):
+            values = values.astype(str).str.replace('%', '', regex=False)
+        changes[col] = pd.to_numeric(values, errors='coerce')
+        report['numeric_columns'][col] = str(data[col].dtype)
+
+    # 标识列转为分类类型（字符串列总是转换；数值列在不同取值较少、分类编码更省内存时转换）
+    for col in CATEGORY_COLUMNS:
+        if col not in data.columns or isinstance(data[col].dtype, pd.CategoricalDtype):
+            continue
+        series = data[col]
+        if not _is_text_dtype(series):
+            n_unique = series.nunique()
+            code_size = 1 if n_unique < 2 ** 7 else (2 if n_unique < 2 ** 15 else 4)
+            if n_unique * series.dtype.itemsize + len(series) * code_size >= series.memory_usage(index=False):
+                continue
+        changes[col] = series.astype('category')
+        report['category_columns'].append(col)
+
+    # 信号日期只转换一次，同时得到整数日序号
+    if '信号日期' in data.columns:
+        dates = data['信号日期']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = changes['信号日期'] = pd.to_datetime(dates, errors='coerce')
+        if SIGNAL_DAY_COL not in data.columns:
+            changes[SIGNAL_DAY_COL] = pd.Series(dates.values.astype('datetime64[D]').astype(np.int64),
+                                                index=data.index)
+
+    if float_dtype is not None:
+        for col in data.columns:
+            series = changes.get(col, data[col])
+            if pd.api.types.is_float_dtype(series.dtype) and series.dtype != float_dtype:
+                changes[col] = series.astype(float_dtype)
+
+    if not changes:
+        df = data
+    else:
+        # 浅复制后整列替换，未变化的列不复制
+        df = data.copy(deep=False)
+        for col, values in changes.items():
+            df[col] = values
+
+    # 只统计发生变化的列（其余列与输入共享内存）
+    report['memory_before'] = int(sum(data[col].memory_usage(index=False, deep=True)
+                                      for col in changes if col in data.columns))
+    report['memory_after'] = int(sum(df[col].memory_usage(index=False, deep=True) for col in changes))
+    return df, report
+
+
+def format_memory_report(report):
+    """格式化预处理报告中的内存占用变化"""
+    before, after = report['memory_before'], report['memory_after']
+    saved = before - after
+    ratio = saved / before * 100 if before else 0.0
+    return f"转换列内存占用: {before / 1024:.1f} KB -> {after / 1024:.1f} KB（节省 {saved / 1024:.1f} KB, {ratio:.1f}%）"
+
+
+class PreparedDataset:
+    """
+    预处理后的只读数据集，FactorAnalysis和ParameterizedFactorAnalyzer共用
+
+    由prepare_analysis_data生成，创建后不再修改：每个实例有唯一的版本号version，
+    数据变化时应创建新的数据集（版本号随之变化），可作为缓存键的一部分。
+    各分析器需要的有效数据由按列缓存的有效值掩码筛选得到，相同列组合的筛选结果只生成一次并共享，
+    不再各自复制原始数据、重复解析。
+    """
+
+    _version_counter = itertools.count(1)
+
+    def __init__(self, frame, factors, return_col, report=None, source=None):
+        """
+        Args:
+            frame: prepare_analysis_data处理后的数据框（之后不应再被修改）
+            factors: 因子列名列表
+            return_col: 收益率列名
+            report: prepare_analysis_data返回的报告字典
+            source: 生成frame的原始数据框（仅保存引用，用于判断数据集是否由某个数据框生成）
+        """
+        self._frame = frame
+        self._source = source
+        self.factors = tuple(factors)
+        self.return_col = return_col
+        self.report = report or {}
+        self.version = next(PreparedDataset._version_counter)
+        self._valid = {}
+        self._views = {}
+
+    @classmethod
+    def from_data(cls, data, factors, return_col, float_dtype=None):
+        """从原始数据框创建数据集（data已是PreparedDataset时原样返回）"""
+        if isinstance(data, cls):
+            return data
+        frame, report = prepare_analysis_data(data, factors, return_col, float_dtype=float_dtype)
+        return cls(frame, factors, return_col, report, source=data)
+
+    @property
+    def frame(self):
+        """预处理后的完整数据框（只读，不要修改）"""
+        return self._frame
+
+    def __len__(self):
+        return len(self._frame)
+
+    def is_derived_from(self, data):
+        """data是否为本数据集的原始数据框或预处理后的数据框"""
+        return data is self._frame or (data is not None and data is self._source)
+
+    def column(self, name):
+        """列的只读numpy数组"""
+        values = self._frame[name].to_numpy().view()
+        values.flags.writeable = False
+        return values
+
+    @property
+    def dates(self):
+        """信号日期数组（datetime64）"""
+        return self.column('信号日期')
+
+    @property
+    def day_numbers(self):
+        """信号日期的整数日序号数组（信号日期缺失时为int64最小值）"""
+        return self.column(SIGNAL_DAY_COL)
+
+    def valid_mask(self, columns):
+        """columns中各列均非缺失的行掩码（按列缓存，只读）"""
+        mask = np.ones(len(self._frame), dtype=bool)
+        for col in columns:
+            if col not in self._valid:
+                valid = self._frame[col].notna().to_numpy()
+                valid.flags.writeable = False
+                self._valid[col] = valid
+            mask &= self._valid[col]
+        mask.flags.writeable = False
+        return mask
+
+    def view(self, columns):
+        """
+        columns中各列均非缺失的行组成的数据框（与dropna(subset=columns)结果相同）
+
+        相同列组合的结果只生成一次，多个分析器得到的是同一个对象；没有缺失值时直接返回完整数据框。
+        """
+        key = tuple(columns)
+        if key not in self._views:
+            mask = self.valid_mask(key)
+            self._views[key] = self._frame if mask.all() else self._frame[mask]
+        return self._views[key]
+
+
+# IC额外统计量 -> 对应的可选计算项（在FactorAnalysis._ic_options返回的元组中的位置）
+IC_EXTRA_STAT_OPTIONS = {
+    'kendall_tau': 0,
+    'robust_corr': 1,
+    'wilcoxon_test': 2,
+    'mann_whitney_u': 2,
+    'bootstrap_ci': 3
+}
+
+
+class AnalysisMemo:
+    """
+    单次运行内的计算结果缓存（IC值、分组收益等）
+
+    键的第一项是数据版本号（见FactorAnalysis.data_version），数据被替换后旧结果不会再被命中。
+    同一个键下可以保存多个结果（如IC计算的不同可选统计量组合），由调用方传入accept判断哪个结果可用。
+    按类别统计命中和未命中次数，用于确认重复计算已被消除。
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self.hits = {}
+        self.misses = {}
+
+    def lookup(self, kind, key, accept=None):
+        """
+        查找缓存结果
+
+        Args:
+            kind: 结果类别（如'ic'、'group_returns'）
+            key: 键元组，第一项为数据版本号
+            accept: 判断函数accept(option)，返回True表示该结果可用；为None时接受第一个结果
+
+        Returns:
+            tuple: (option, value)，未命中时返回None
+        """
+        for option, value in self._entries.get((kind, key), ()):
+            if accept is None or accept(option):
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                return option, value
+        self.misses[kind] = self.misses.get(kind, 0) + 1
+        return None
+
+    def store(self, kind, key, value, option=None):
+        """保存结果，option为结果附带的计算选项（供lookup的accept判断）"""
+        self._entries.setdefault((kind, key), []).append((option, value))
+
+    def merge(self, other, version):
+        """
+        合并另一个缓存的结果和计数（如子进程中的计算结果），其条目的数据版本号替换为version
+        """
+        for (kind, key), entries in other._entries.items():
+            self._entries.setdefault((kind, (version,) + key[1:]), []).extend(entries)
+        for counts, other_counts in ((self.hits, other.hits), (self.misses, other.misses)):
+            for kind, count in other_counts.items():
+                counts[kind] = counts.get(kind, 0) + count
+
+    def discard_version(self, version):
+        """删除某个数据版本的全部结果（临时数据分析结束后调用）"""
+        for entry_key in [k for k in self._entries if k[1][0] == version]:
+            del self._entries[entry_key]
+
+    def clear(self):
+        """清空缓存结果和计数"""
+        self._entries.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+    def stats(self):
+        """各类别的命中统计 {类别: {'hits': 命中次数, 'misses': 未命中次数}}"""
+        kinds = list(dict.fromkeys(list(self.misses) + list(self.hits)))
+        return {kind: {'hits': self.hits.get(kind, 0), 'misses': self.misses.get(kind, 0)} for kind in kinds}
+
+    def render(self):
+        """单行命中统计"""
+        return ", ".join(f"{kind} 命中{counts['hits']}次/未命中{counts['misses']}次"
+                         for kind, counts in self.stats().items()) or "无"
+
+
 class FactorAnalysis:
-    def __init__(self, file_path=None, data=None):
+    def __init__(self, file_path=None, data=None, verbosity=VERBOSITY_NORMAL):
         """
         初始化因子分析类
         
         Args:
             file_path: 数据文件路径（Excel或CSV）
-            data: 直接传入的DataFrame数据
+            data: 直接传入的DataFrame数据或PreparedDataset（已预处理的共享数据集）
+            verbosity: 输出详细程度（VERBOSITY_QUIET/NORMAL/DEBUG），DEBUG时逐日打印IC计算信息
         """
         # 使用传入的文件路径，如果没有则使用默认文件
         self.file_path = file_path or DEFAULT_DATA_FILE
-        self.data = data
+        # 预处理后的共享数据集（preprocess_data中创建，或直接传入）
+        self.dataset = data if isinstance(data, PreparedDataset) else None
+        self.data = data.frame if isinstance(data, PreparedDataset) else data
+        self.verbosity = verbosity
         self.factors = [
              '信号发出时上市天数',
              '日最大跌幅百分比',
@@ -1208,6 +2894,8 @@ class FactorAnalysis:
          ]
         self.return_col = '持股2日收益率'
         self.analysis_results = {}
+        # 带条件的因子分析结果，按条件描述字符串索引
+        self.filtered_analysis_results = {}
         
         # 初始化异常统计数据
         self.anomaly_stats = {
@@ -1219,11 +2907,27 @@ class FactorAnalysis:
             'data_cleaning': {},
             'ic_calculation': {}
         }
-        
+        # 每日IC计算的结构化诊断记录
+        self.ic_diagnostics = ICDiagnostics()
+        # 运行期内的IC和分组收益结果缓存，键中包含processed_data的版本号
+        self.memo = AnalysisMemo()
+        self.data_version = None
+
         # 如果没有直接传入数据且有文件路径，则加载数据
         if self.data is None and self.file_path:
             self.load_data()
-    
+
+    @property
+    def processed_data(self):
+        """预处理后参与分析的数据（未预处理时不存在该属性）"""
+        return self._processed_data
+
+    @processed_data.setter
+    def processed_data(self, value):
+        # 每次替换数据都分配新的版本号，memo中旧版本的结果不会再被命中
+        self._processed_data = value
+        self.data_version = next(PreparedDataset._version_counter)
+
     def _calculate_adaptive_annual_returns(self, avg_returns, characteristics, method_info):
         """
         执行自适应年化计算 - 优化版本
@@ -1396,13 +3100,31 @@ class FactorAnalysis:
                 'deprecated_methods': []
             }
     
-    def load_data(self):
-        """从文件加载数据"""
+    def required_columns(self):
+        """分析需要的列：标识列、日期列、所有因子和收益率列（可作为load_data的columns参数）"""
+        return ['股票代码', '股票名称', '信号日期'] + list(self.factors) + [self.return_col]
+    
+    def load_data(self, columns=None, use_cache=True):
+        """
+        从文件加载数据
+        
+        Args:
+            columns: 只读取这些列（如required_columns()），None时读取全部列
+            use_cache: Excel文件是否使用列式缓存（见load_table_cached），首次读取后不再重复解析Excel
+        """
+        if not os.path.exists(self.file_path):
+            print(f"数据加载失败: 数据文件不存在: {self.file_path}")
+            return False
+        # 列投影：文件中不存在的列忽略，由preprocess_data统一检查
+        usecols = None if columns is None else (lambda name: name in set(columns))
         try:
             if self.file_path.endswith('.csv'):
-                self.data = pd.read_csv(self.file_path, encoding='utf-8-sig')
+                self.data = pd.read_csv(self.file_path, encoding='utf-8-sig', usecols=usecols)
             elif self.file_path.endswith('.xlsx') or self.file_path.endswith('.xls'):
-                self.data = pd.read_excel(self.file_path)
+                if use_cache:
+                    self.data = load_table_cached(self.file_path, columns=columns)
+                else:
+                    self.data = pd.read_excel(self.file_path, usecols=usecols)
             else:
                 raise ValueError("仅支持CSV和Excel文件格式")
             
@@ -1524,9 +3246,6 @@ class FactorAnalysis:
             return False
         
         try:
-            # 复制数据
-            df = self.data.copy()
-            
             # 初始化异常数据统计信息字典
             self.anomaly_stats = {
                 'missing_values': {},
@@ -1541,44 +3260,20 @@ class FactorAnalysis:
             for factor in self.factors:
                 required_cols.append(factor)
             
-            missing_cols = [col for col in required_cols if col not in df.columns]
+            missing_cols = [col for col in required_cols if col not in self.data.columns]
             if missing_cols:
                 print(f"错误：缺少必要的列: {missing_cols}")
                 return False
             
-            # 处理百分比字符串列（转换百分比）
-            percentage_columns = [
-                '日最大跌幅百分比', '信号当日收盘涨跌幅', '信号后一日开盘涨跌幅', 
-                '次日开盘后总体下跌幅度', '前10日最大涨幅', '当日回调', '持股2日收益率'
-            ]
-            
-            # 处理包含百分比符号的数值列
-            for col in percentage_columns:
-                if col in df.columns:
-                    # 如果列是字符串类型且包含%
-                    if df[col].dtype == 'object':
-                        try:
-                            # 转换百分比字符串为数值（去除%并除以100）
-                            df[col] = pd.to_numeric(df[col].astype(str).str.replace('%', ''), errors='coerce') / 100
-                            print(f"已转换列 '{col}' 从百分比字符串到数值")
-                        except Exception as e:
-                            print(f"转换列 '{col}' 时出错: {e}")
-                    # 注释掉以下代码，不再对已经是数值型的百分比列进行除以100操作
-                    # else:
-                    #     # 如果已经是数值但可能在0-1范围外，标准化到合理范围
-                    #     try:
-                    #         if df[col].abs().max() > 1.0:
-                    #             df[col] = df[col] / 100
-                    #             print(f"已转换列 '{col}' 从百分比数值到小数")
-                    #     except Exception as e:
-                    #         print(f"标准化列 '{col}' 时出错: {e}")
-            
-            # 确保日期列正确处理
-            if '信号日期' in df.columns:
-                try:
-                    df['信号日期'] = pd.to_datetime(df['信号日期'], errors='coerce')
-                except:
-                    print("警告：无法转换信号日期列")
+            # 百分比字符串、数值转换、分类类型和日期转换（结果保存为与ParameterizedFactorAnalyzer共用的数据集）
+            # 注意：已经是数值型的百分比列不再除以100
+            if self.dataset is None or not self.dataset.is_derived_from(self.data):
+                self.dataset = PreparedDataset.from_data(self.data, self.factors, self.return_col)
+                for col in self.dataset.report['percent_columns']:
+                    print(f"已转换列 '{col}' 从百分比字符串到数值")
+                print(format_memory_report(self.dataset.report))
+            df = self.dataset.frame
+            report = self.dataset.report
             
             # 处理数值型因子并记录异常信息
             for factor in self.factors:
@@ -1590,14 +3285,9 @@ class FactorAnalysis:
                     'params': {'winsorize': winsorize, 'winsorize_limits': winsorize_limits}
                 }
                 
-                # 尝试转换为数值型
-                if not pd.api.types.is_numeric_dtype(df[factor]):
-                    try:
-                        original_dtype = str(df[factor].dtype)
-                        df[factor] = pd.to_numeric(df[factor], errors='coerce')
-                        print(f"  因子 {factor} 从 {original_dtype} 转换为数值型")
-                    except:
-                        print(f"警告：无法将因子 {factor} 转换为数值型")
+                # 非数值型因子已由prepare_analysis_data转换为数值型
+                if factor in report['numeric_columns']:
+                    print(f"  因子 {factor} 从 {report['numeric_columns'][factor]} 转换为数值型")
                 
                 # 记录缺失值信息
                 missing_count = df[factor].isna().sum()
@@ -1634,16 +3324,9 @@ class FactorAnalysis:
                     print(f"  对因子 {factor} 进行 {factor_method} 处理")
                     df = self.apply_factor_processing(df, factor, factor_method, winsorize, winsorize_limits)
             
-            # 处理收益率列
-            if not pd.api.types.is_numeric_dtype(df[self.return_col]):
-                try:
-                    # 如果是百分比字符串，先去除百分号再转换
-                    if df[self.return_col].dtype == 'object':
-                        df[self.return_col] = df[self.return_col].str.replace('%', '')
-                    df[self.return_col] = pd.to_numeric(df[self.return_col], errors='coerce')
-                    print(f"收益率列 {self.return_col} 转换为数值型")
-                except:
-                    print(f"警告：无法将 {self.return_col} 转换为数值型")
+            # 收益率列（百分比字符串已去除百分号）
+            if self.return_col in report['numeric_columns']:
+                print(f"收益率列 {self.return_col} 转换为数值型")
             
             # 记录收益率列的缺失值和异常值
             missing_return_count = df[self.return_col].isna().sum()
@@ -1659,8 +3342,12 @@ class FactorAnalysis:
             
             # 注意：根据用户要求，我们不删除任何数据，只记录异常信息
             # 仅删除收益率和因子列的缺失值行，以确保分析有意义的数据
+            # （未处理因子时直接使用数据集按掩码筛选的共享结果，不复制数据）
             original_len = len(df)
-            df = df.dropna(subset=[self.return_col] + self.factors)
+            if process_factors:
+                df = df.dropna(subset=[self.return_col] + self.factors)
+            else:
+                df = self.dataset.view([self.return_col] + self.factors)
             self.anomaly_stats['missing_values']['total_removed'] = original_len - len(df)
             
             if len(df) < original_len:
@@ -1676,8 +3363,6 @@ class FactorAnalysis:
             if removed_count > 0:
                 print(f"数据预处理完成：保留 {final_count}/{original_len} 行有效数据")
             
-            self.processed_data = df
-
             self.processed_data = df
             return True
             
@@ -1685,8 +3370,82 @@ class FactorAnalysis:
             print(f"数据预处理失败: {e}")
             return False
     
+    def calculate_ic_matrix(self, factors=None, return_cols=None, use_pearson=False):
+        """
+        一次性计算多个因子对多个收益率列的每日IC值
+        
+        日期分组只做一次，收益率列的组内排序在各因子之间复用，
+        每增加一个因子只增加一次组内排序的开销
+        
+        Args:
+            factors: 因子列名列表，默认为self.factors
+            return_cols: 收益率列名列表，默认为[self.return_col]
+            use_pearson: 是否使用Pearson相关系数，默认为False（使用Spearman）
+            
+        Returns:
+            dict: daily_ic为每日IC表（列为(因子, 收益率列)），details为每个组合的逐日筛选结果
+        """
+        df = self.processed_data if hasattr(self, 'processed_data') and self.processed_data is not None else self.data
+        factors = [f for f in (factors or self.factors) if f in df.columns]
+        return_cols = [c for c in (return_cols or [self.return_col]) if c in df.columns]
+        
+        details = compute_daily_ic_matrix(
+            df['信号日期'].values,
+            {factor: df[factor].values for factor in factors},
+            {col: df[col].values for col in return_cols},
+            use_pearson=use_pearson
+        )
+        
+        daily_ic = pd.DataFrame(
+            {key: result['daily_ic'] for key, result in details.items()},
+            index=next(iter(details.values()))['dates'] if details else None
+        )
+        if details:
+            daily_ic.columns = pd.MultiIndex.from_tuples(list(details.keys()), names=['因子', '收益率列'])
+            daily_ic.index.name = '信号日期'
+        
+        return {'daily_ic': daily_ic, 'details': details}
+    
+    def calculate_rolling_ic(self, factor_col, window_sizes=(30, 60, 120, 250), use_pearson=False,
+                             min_periods=None, daily_result=None):
+        """
+        计算每日IC序列的滚动均值、标准差和IR
+        
+        每日IC只计算一次，各窗口的统计量由累计和差分得到，多个窗口长度的开销与单个窗口基本相同
+        
+        Args:
+            factor_col: 因子列名
+            window_sizes: 窗口大小列表（有效IC的交易日数）
+            use_pearson: 是否使用Pearson相关系数，默认为False（使用Spearman）
+            min_periods: 窗口内至少需要的有效IC数量，默认为窗口大小
+            daily_result: calculate_ic_matrix中已算好的该因子每日IC结果，传入时不再重新计算
+            
+        Returns:
+            pd.DataFrame: 以信号日期为索引，包含每日IC及各窗口的滚动IC均值、IC标准差和IR
+        """
+        if daily_result is None:
+            details = self.calculate_ic_matrix(factors=[factor_col], use_pearson=use_pearson)['details']
+            daily_result = details.get((factor_col, self.return_col))
+        if daily_result is None:
+            return pd.DataFrame()
+        
+        # 与calculate_ic相同，只使用实际计算出IC的交易日
+        computed = ~np.isnan(daily_result['daily_ic'])
+        ic_values = daily_result['daily_ic'][computed]
+        stats = rolling_ic_statistics(ic_values, window_sizes, min_periods=min_periods)
+        
+        columns = {'IC': ic_values}
+        for window_size in window_sizes:
+            columns[f'IC均值_{window_size}日'] = stats[window_size]['mean']
+            columns[f'IC标准差_{window_size}日'] = stats[window_size]['std']
+            columns[f'IR_{window_size}日'] = stats[window_size]['ir']
+        result = pd.DataFrame(columns, index=daily_result['dates'][computed])
+        result.index.name = '信号日期'
+        return result
+    
     def calculate_ic(self, factor_col, use_pearson=False, use_robust_corr=False, use_kendall=False, 
-                     use_nonparam_test=False, compute_bootstrap_ci=False, n_bootstrap=1000):
+                     use_nonparam_test=False, compute_bootstrap_ci=False, n_bootstrap=1000,
+                     daily_result=None, random_state=None):
         """
         计算因子IC值，支持多种稳健性统计方法
         
@@ -1698,10 +3457,62 @@ class FactorAnalysis:
             use_nonparam_test: 是否进行非参数检验，默认为False
             compute_bootstrap_ci: 是否计算Bootstrap置信区间，默认为False
             n_bootstrap: Bootstrap重抽样次数，默认1000次
+            daily_result: calculate_ic_matrix中已算好的该因子每日IC结果，传入时不再重新计算
+            random_state: Bootstrap随机种子或numpy.random.Generator，用于结果复现
             
         Returns:
             tuple: (IC均值, IC标准差, t统计量, p值, 额外统计结果字典)
+        
+        同一版本数据上相同因子、相关系数类型的结果保存在self.memo中：再次调用时直接返回，
+        已算过更多额外统计量的结果也可用于只需要其中一部分的调用（额外统计结果字典只保留本次需要的项）。
+        """
+        options = self._ic_options(use_robust_corr, use_kendall, use_nonparam_test, compute_bootstrap_ci,
+                                   n_bootstrap, random_state)
+        # 未预处理（使用原始数据）或Bootstrap使用外部随机数生成器时结果不可复用
+        cacheable = getattr(self, '_processed_data', None) is not None and (
+            not compute_bootstrap_ci or random_state is None or isinstance(random_state, (int, np.integer)))
+        if not cacheable:
+            return self._calculate_ic_uncached(factor_col, use_pearson, use_robust_corr, use_kendall,
+                                               use_nonparam_test, compute_bootstrap_ci, n_bootstrap,
+                                               daily_result, random_state)
+        
+        key = (self.data_version, factor_col, self.return_col, "Pearson" if use_pearson else "Spearman")
+        cached = self.memo.lookup('ic', key, accept=lambda cached_options: self._ic_options_cover(cached_options, options))
+        if cached is not None:
+            cached_options, result = cached
+            if cached_options == options:
+                return result
+            extra_stats = {name: value for name, value in result[4].items()
+                           if name not in IC_EXTRA_STAT_OPTIONS or options[IC_EXTRA_STAT_OPTIONS[name]]}
+            return result[:4] + (extra_stats,)
+        
+        result = self._calculate_ic_uncached(factor_col, use_pearson, use_robust_corr, use_kendall,
+                                             use_nonparam_test, compute_bootstrap_ci, n_bootstrap,
+                                             daily_result, random_state)
+        self.memo.store('ic', key, result, option=options)
+        return result
+    
+    @staticmethod
+    def _ic_options(use_robust_corr, use_kendall, use_nonparam_test, compute_bootstrap_ci, n_bootstrap, random_state):
         """
+        calculate_ic额外统计量的计算选项元组（位置见IC_EXTRA_STAT_OPTIONS）
+        
+        Kendall's Tau在use_kendall或use_robust_corr时计算；Bootstrap选项为(重抽样次数, 随机种子)，不计算时为False
+        """
+        return (bool(use_kendall or use_robust_corr), bool(use_robust_corr), bool(use_nonparam_test),
+                (n_bootstrap, random_state) if compute_bootstrap_ci else False)
+    
+    @staticmethod
+    def _ic_options_cover(cached_options, options):
+        """已缓存结果的计算选项是否包含本次需要的全部额外统计量（Bootstrap参数需完全相同）"""
+        for cached_option, option in zip(cached_options[:3], options[:3]):
+            if option and not cached_option:
+                return False
+        return not options[3] or cached_options[3] == options[3]
+    
+    def _calculate_ic_uncached(self, factor_col, use_pearson, use_robust_corr, use_kendall, use_nonparam_test,
+                               compute_bootstrap_ci, n_bootstrap, daily_result, random_state):
+        """calculate_ic的实际计算（不使用缓存），参数含义见calculate_ic"""
         # 使用预处理后的数据，确保因子处理生效
         df = self.processed_data if hasattr(self, 'processed_data') and self.processed_data is not None else self.data.copy()
         
@@ -1713,28 +3524,19 @@ class FactorAnalysis:
         corr_type = "Pearson" if use_pearson else "Spearman"
         print(f"计算因子 {factor_col} 的 {corr_type} IC值")
         
-        # 计算平均每日样本数量并应用动态筛选策略
-        daily_sample_counts = []
-        for date, group in df.groupby('信号日期'):
-            valid_data = group.dropna(subset=[factor_col, self.return_col])
-            daily_sample_counts.append(len(valid_data))
-        
-        avg_daily_samples = np.mean(daily_sample_counts) if daily_sample_counts else 0
-        
-        # 根据平均每日样本数量选择不同的样本筛选方式
-        if avg_daily_samples >= 5:
-            min_samples_per_day = 5
-            mode = "高样本量模式"
-        elif avg_daily_samples >= 3:
-            min_samples_per_day = 3
-            mode = "中样本量模式"
-        else:
-            min_samples_per_day = 2
-            mode = "低样本量模式"
+        # 向量化计算每日IC：按日期只排序一次，所有交易日的秩和筛选条件一次算出
+        if daily_result is None:
+            daily_result = compute_daily_ic(df['信号日期'].values, df[factor_col].values,
+                                            df[self.return_col].values, use_pearson=use_pearson)
+        avg_daily_samples = daily_result['avg_daily_samples']
+        min_samples_per_day = daily_result['min_samples_per_day']
+        mode = daily_result['screening_mode']
         
-        # 尝试按日期分组计算每日IC值
-        daily_ics = []
-        skipped_dates = 0
+        # 每日IC筛选结果以结构化方式记录，说明文字在生成报告时按需渲染
+        if not hasattr(self, 'ic_diagnostics'):
+            self.ic_diagnostics = ICDiagnostics()
+        self.ic_diagnostics.record(factor_col, daily_result)
+        verbosity = getattr(self, 'verbosity', VERBOSITY_NORMAL)
         
         # 初始化异常统计
         if not hasattr(self, 'anomaly_stats'):
@@ -1745,144 +3547,35 @@ class FactorAnalysis:
         
         self.anomaly_stats['ic_calculation'][factor_col] = {
             'total_dates': len(df['信号日期'].unique()),
-            'processed_dates': 0,
-            'skipped_dates': 0,
-            'skipped_reasons': [],
+            'processed_dates': self.ic_diagnostics.processed_dates(factor_col),
+            'skipped_dates': self.ic_diagnostics.skipped_dates(factor_col),
+            'skip_counts': self.ic_diagnostics.counts(factor_col),
             'avg_daily_samples': avg_daily_samples,
-            'screening_mode': mode,
-            'min_samples_per_day': min_samples_per_day
-        }
-        
-        try:
-            # 按日期分组
-            for date, group in df.groupby('信号日期'):
-                # 确保daily_ics始终是列表类型，防止"len() of unsized object"错误
-                daily_ics = ensure_list(daily_ics, "daily_ics")
-                
-                # 确保每组有足够的数据点
-                valid_data = group.dropna(subset=[factor_col, self.return_col])
-                
-                # 重要：保持原始数据不变，只进行缺失值处理
-                # 不进行任何异常值修改或数据清洗，确保结果的真实性
-                
-                if len(valid_data) >= min_samples_per_day:
-                    # 检查因子值变异性
-                    factor_values = valid_data[factor_col]
-                    return_values = valid_data[self.return_col]
-                    factor_variability = factor_values.nunique()
-                    return_variability = return_values.nunique()
-                    
-                    # 增加变异性检查，避免除零错误
-                    factor_std = factor_values.std()
-                    return_std = return_values.std()
-                    
-                    # 根据动态策略调整变异性要求
-                    # 首先检查标准差是否为零
-                    if factor_std <= 0 or return_std <= 0:
-                        # 如果因子值或收益率值无变异性，尝试使用整体数据计算
-                        try:
-                            # 获取该日期的所有有效数据（不仅仅是当前日期的数据）
-                            all_valid_data = df.dropna(subset=[factor_col, self.return_col])
-                            
-                            if len(all_valid_data) >= 3:  # 至少需要3个样本点
-                                # 使用整体数据计算IC，而不是按日期计算
-                                overall_ic = np.corrcoef(all_valid_data[factor_col], all_valid_data[self.return_col])[0, 1]
-                                if not np.isnan(overall_ic) and np.isfinite(overall_ic):
-                                    # 在append之前确保daily_ics是列表类型
-                                    daily_ics = ensure_list(daily_ics, "daily_ics")
-                                    daily_ics.append(overall_ic)
-                                    self.anomaly_stats['ic_calculation'][factor_col]['processed_dates'] += 1
-                                    reason = f"日期 {date}: 使用整体数据计算IC (因子std: {factor_std:.6f}, 收益率std: {return_std:.6f})"
-                                    print(f"  {reason}")
-                                    continue
-                        except Exception as e:
-                            print(f"  日期 {date}: 使用整体数据计算IC时出错 - {str(e)}")
-                        
-                        # 如果无法使用整体数据计算，记录原因并跳过
-                        if factor_std <= 0:
-                            reason = f"日期 {date}: 因子值标准差为零 (无变异性)"
-                        else:
-                            reason = f"日期 {date}: 收益率值标准差为零 (无变异性)"
-                            
-                        self.anomaly_stats['ic_calculation'][factor_col]['skipped_reasons'].append(reason)
-                        print(f"  {reason}")
-                        skipped_dates += 1
-                        continue
-                    
-                    # 根据平均每日样本数量动态设置变异性要求
-                    if avg_daily_samples >= 5:
-                        min_factor_variability = 5
-                        min_return_variability = 5
-                    elif avg_daily_samples >= 3:
-                        min_factor_variability = 3
-                        min_return_variability = 3
-                    else:
-                        min_factor_variability = 2
-                        min_return_variability = 2
-                    
-                    # 然后检查变异性要求
-                    if (factor_variability >= min_factor_variability and
-                        return_variability >= min_return_variability):
-                        try:
-                            # 根据参数选择相关系数计算方法
-                            if use_pearson:
-                                # 使用Pearson相关系数，增加类型安全检查
-                                factor_values_clean = np.asarray(factor_values, dtype=float)
-                                return_values_clean = np.asarray(return_values, dtype=float)
-                                # 移除NaN值
-                                mask = ~(np.isnan(factor_values_clean) | np.isnan(return_values_clean))
-                                factor_values_clean = factor_values_clean[mask]
-                                return_values_clean = return_values_clean[mask]
-                                
-                                if len(factor_values_clean) >= 2:
-                                    daily_ic = np.corrcoef(factor_values_clean, return_values_clean)[0, 1]
-                                else:
-                                    daily_ic = np.nan
-                            else:
-                                # 使用自定义的Spearman相关系数计算函数，确保数学准确性
-                                daily_ic = custom_spearman_corr(factor_values, return_values)
-                            
-                            if not np.isnan(daily_ic) and np.isfinite(daily_ic):
-                                # 添加调试信息：检查daily_ic的类型和形状
-                                print(f"    调试: daily_ic类型={type(daily_ic)}, 值={daily_ic}, 形状={getattr(daily_ic, 'shape', 'N/A')}")
-                                
-                                # 确保daily_ic是标量值
-                                if hasattr(daily_ic, 'shape') and daily_ic.shape:
-                                    # 如果是数组，取第一个元素
-                                    daily_ic = daily_ic.item() if daily_ic.size > 0 else np.nan
-                                    print(f"    调试: 转换为标量后daily_ic={daily_ic}")
-                                
-                                # 在append之前确保daily_ics是列表类型
-                                daily_ics = ensure_list(daily_ics, "daily_ics")
-                                daily_ics.append(daily_ic)
-                                self.anomaly_stats['ic_calculation'][factor_col]['processed_dates'] += 1
-                            else:
-                                # 记录计算结果为NaN或无穷大的情况
-                                reason = f"日期 {date}: 计算结果为NaN或无穷大 (因子std: {factor_std:.6f}, 收益率std: {return_std:.6f})"
-                                self.anomaly_stats['ic_calculation'][factor_col]['skipped_reasons'].append(reason)
-                                skipped_dates += 1
-                                print(f"  {reason}")
-                        except Exception as e:
-                            error_msg = f"日期 {date}: 计算错误 - {str(e)}"
-                            self.anomaly_stats['ic_calculation'][factor_col]['skipped_reasons'].append(error_msg)
-                            print(f"  {error_msg}")
-                            skipped_dates += 1
-                            continue
+            'screening_mode': mode,
+            'min_samples_per_day': min_samples_per_day
+        }
+        
+        try:
+            # 计算出IC的交易日（含使用整体数据的交易日）
+            status = daily_result['status']
+            computed = (status == IC_STATUS_OK) | (status == IC_STATUS_OVERALL_FALLBACK)
+            daily_ics = list(daily_result['daily_ic'][computed])
+            
+            if verbosity >= VERBOSITY_DEBUG:
+                for i in np.flatnonzero(status != IC_STATUS_INSUFFICIENT):
+                    if status[i] == IC_STATUS_OK:
+                        daily_ic = daily_result['daily_ic'][i]
+                        print(f"    调试: daily_ic类型={type(daily_ic)}, 值={daily_ic}, 形状={getattr(daily_ic, 'shape', 'N/A')}")
                     else:
-                        # 记录跳过的日期及原因
-                        if factor_variability < min_factor_variability:
-                            reason = f"日期 {date}: 因子值变异性不足 (唯一值: {factor_variability}, 要求: {min_factor_variability})"
-                            self.anomaly_stats['ic_calculation'][factor_col]['skipped_reasons'].append(reason)
-                            print(f"  {reason}")
-                        elif return_variability < min_return_variability:
-                            reason = f"日期 {date}: 收益率值变异性不足 (唯一值: {return_variability}, 要求: {min_return_variability})"
-                            self.anomaly_stats['ic_calculation'][factor_col]['skipped_reasons'].append(reason)
-                            print(f"  {reason}")
-                        skipped_dates += 1
-                else:
-                    reason = f"日期 {date}: 有效数据点不足 (需要≥{min_samples_per_day}，实际: {len(valid_data)})"
-                    self.anomaly_stats['ic_calculation'][factor_col]['skipped_reasons'].append(reason)
-                    skipped_dates += 1
+                        reason = format_daily_ic_reason(
+                            daily_result['dates'][i], status[i], daily_result['sample_counts'][i],
+                            daily_result['factor_std'][i], daily_result['return_std'][i],
+                            daily_result['factor_nunique'][i], daily_result['return_nunique'][i],
+                            min_samples_per_day
+                        )
+                        print(f"  {reason}")
+            elif verbosity >= VERBOSITY_NORMAL:
+                print(f"  每日IC筛选: {self.ic_diagnostics.summary_line(factor_col)}")
         
             # 如果成功计算了每日IC值
             daily_ics = ensure_list(daily_ics, "daily_ics")
@@ -1906,10 +3599,8 @@ class FactorAnalysis:
                 if use_kendall or use_robust_corr:
                     # 计算所有有效IC值的Kendall's Tau
                     daily_ics = ensure_list(daily_ics, "daily_ics")
-                    if HAS_SCIPY and daily_ics and len(daily_ics) > 0:
-                        from scipy.stats import kendalltau
-                        kt, _ = kendalltau(range(len(daily_ics)), daily_ics)
-                        extra_stats['kendall_tau'] = kt
+                    if daily_ics and len(daily_ics) > 0:
+                        extra_stats['kendall_tau'] = kendall_tau_corr(np.arange(len(daily_ics)), daily_ics)
                 
                 if use_robust_corr:
                     daily_ics = ensure_list(daily_ics, "daily_ics")
@@ -1926,8 +3617,9 @@ class FactorAnalysis:
                 if compute_bootstrap_ci:
                     daily_ics = ensure_list(daily_ics, "daily_ics")
                     if daily_ics and len(daily_ics) > 0:
-                        # 对IC均值计算Bootstrap置信区间
-                        bootstrap_results = bootstrap_confidence_interval(daily_ics, None, n_bootstrap=n_bootstrap)
+                        # 对IC均值计算Bootstrap置信区间（每日IC存在自相关，使用平稳Bootstrap）
+                        bootstrap_results = bootstrap_confidence_interval(daily_ics, None, n_bootstrap=n_bootstrap,
+                                                                          random_state=random_state, method='stationary')
                         extra_stats['bootstrap_ci'] = bootstrap_results
                 
                 print(f"IC计算完成：{valid_dates}/{total_dates} 个有效交易日")
@@ -2107,7 +3799,8 @@ class FactorAnalysis:
                                     extra_stats['mann_whitney_u'] = mann_whitney_u_test(factor_data, return_data)
                                 
                                 if compute_bootstrap_ci:
-                                    bootstrap_results = bootstrap_confidence_interval(factor_data, return_data, n_bootstrap=n_bootstrap)
+                                    bootstrap_results = bootstrap_confidence_interval(factor_data, return_data, n_bootstrap=n_bootstrap,
+                                                                                      random_state=random_state)
                                     extra_stats['bootstrap_ci'] = bootstrap_results
                                 
                                 return (overall_ic, ic_std, t_stat, p_value, extra_stats)
@@ -2139,6 +3832,25 @@ class FactorAnalysis:
         Returns:
             dict: 包含分组收益和多空收益的字典
         """
+        results = self.calculate_group_returns_multi(factor_col, n_groups_list=(n_groups,))
+        return results.get(n_groups) if results else None
+    
+    def calculate_group_returns_multi(self, factor_col, n_groups_list=(5, 10, 20)):
+        """
+        一次计算多种等分方式的分组收益
+        
+        因子只排序一次，各等分方式的分组号由排序位置直接算出，
+        每组都是排序后数组上的一段连续切片；年化算法的数据特征分析也只做一次。
+        
+        Args:
+            factor_col: 因子列名
+            n_groups_list: 分组数量列表
+            
+        Returns:
+            dict: {分组数量: calculate_group_returns格式的结果}，数据无效时返回None
+        
+        同一版本数据上已算过的分组结果从self.memo中直接返回，只计算缺少的等分方式。
+        """
         # 使用预处理后的数据，确保因子处理生效
         df = self.processed_data if hasattr(self, 'processed_data') and self.processed_data is not None else self.data.copy()
         
@@ -2147,134 +3859,147 @@ class FactorAnalysis:
             print(f"警告: 数据为空或列名不存在")
             return None
         
-        print(f"使用预处理后的数据进行分组，总样本数: {len(df)}")
+        # 未预处理（使用原始数据）时不使用缓存
+        cacheable = getattr(self, '_processed_data', None) is not None
+        n_groups_list = list(dict.fromkeys(n_groups_list))
+        results = {}
+        if cacheable:
+            for n_groups in n_groups_list:
+                cached = self.memo.lookup('group_returns', (self.data_version, factor_col, self.return_col, n_groups))
+                if cached is not None:
+                    results[n_groups] = cached[1]
+        missing = [n_groups for n_groups in n_groups_list if n_groups not in results]
+        if not missing:
+            return results
         
-        # 统计分组收益计算的样本筛选情况
-        total_samples = len(df)
-        df_clean = df[df[factor_col].notna()].copy()
-        valid_samples = len(df_clean)
-        removed_samples = total_samples - valid_samples
+        print(f"使用预处理后的数据进行分组，总样本数: {len(df)}")
         
-        if len(df_clean) == 0:
+        # 去除因子值为空的行
+        valid = df[factor_col].notna().values
+        if not valid.any():
             print(f"警告: 去除因子值为空的行后没有剩余数据")
             return None
         
-        # 使用简单的等分分组方式
-        # 1. 将因子数据从小到大排列
-        # 2. 平均分成n_groups份
-        df_clean = df_clean.sort_values(by=factor_col)
+        # 将因子数据从小到大排列（只排序一次，排序方式与sort_values相同）
+        factor_values = df[factor_col].values[valid]
+        return_values = df[self.return_col].values[valid].astype(np.float64)
+        order = np.argsort(factor_values, kind='quicksort')
+        sorted_factor = factor_values[order]
+        sorted_returns = return_values[order]
         
-        # 计算每个样本应该属于哪个分组
-        total_samples = len(df_clean)
-        group_size = total_samples // n_groups
-        remainder = total_samples % n_groups
+        # 年化算法的数据特征分析与因子和分组方式无关，在第一次使用时计算
+        annualization = {}
+        
+        for n_groups in missing:
+            results[n_groups] = self._build_group_returns_table(sorted_factor, sorted_returns, n_groups, annualization)
+            if cacheable:
+                self.memo.store('group_returns', (self.data_version, factor_col, self.return_col, n_groups),
+                                results[n_groups])
+        return {n_groups: results[n_groups] for n_groups in n_groups_list}
+    
+    def _build_group_returns_table(self, sorted_factor, sorted_returns, n_groups, annualization):
+        """
+        根据已排序的因子值和收益率生成一种等分方式的分组收益表
         
-        # 创建分组标签
-        groups = []
-        for i in range(n_groups):
-            # 前remainder个分组每个多分配1个样本
-            group_count = group_size + (1 if i < remainder else 0)
-            groups.extend([i+1] * group_count)
+        Args:
+            sorted_factor: 按因子值升序排列的因子值
+            sorted_returns: 与sorted_factor对应的收益率
+            n_groups: 分组数量
+            annualization: 年化分析结果缓存（在多种等分方式之间共享）
+            
+        Returns:
+            dict: 包含分组收益和多空收益的字典
+        """
+        total_samples = len(sorted_factor)
+        labels = quantile_group_labels(total_samples, n_groups)
         
-        # 分配分组标签
-        df_clean['分组'] = groups[:total_samples]  # 确保长度匹配
+        # 每组在排序后数组中的区间
+        sizes = np.bincount(labels, minlength=n_groups + 1)[1:]
+        ends = np.cumsum(sizes)
+        starts = ends - sizes
+        present = sizes > 0
         
         # 验证分组样本数量分布
-        group_counts = df_clean['分组'].value_counts().sort_index()
-        if len(group_counts) > 0:
-            min_count = group_counts.min()
-            max_count = group_counts.max()
-            # 如果样本数量差异超过10%，发出警告
-            if max_count > min_count * 1.1:
-                print(f"警告: 分组样本数量分布不均，最小: {min_count}, 最大: {max_count}")
-        
-        # 计算每组的平均收益、标准差和样本数量
-        # 同时计算每组因子值的最小值和最大值
-        group_stats = df_clean.groupby('分组').agg({
-            self.return_col: ['mean', 'std', 'count'],
-            factor_col: ['min', 'max']
-        }).reset_index()
-        
-        # 重命名列
-        group_stats.columns = ['分组', '平均收益', '收益标准差', '样本数量', '因子最小值', '因子最大值']
-        
-        # 创建参数区间列
-        # 使用更统一的格式化方法，避免显示不一致
-        # 注释掉对百分比因子的特殊处理，统一使用原始数据
-        # percentage_columns = [
-        #     '日最大跌幅百分比', '信号当日收盘涨跌幅', '信号后一日开盘涨跌幅', 
-        #     '次日开盘后总体下跌幅度', '前10日最大涨幅', '当日回调', '持股2日收益率'
-        # ]
-        
-        # 注释掉对百分比因子的特殊处理，统一使用原始数据
-        # if factor_col in percentage_columns:
-        #     # 对于百分比因子，将值乘以100恢复为原始百分比形式
-        #     group_stats['参数区间'] = group_stats.apply(lambda x: f"{x['因子最小值']*100:.4f}-{x['因子最大值']*100:.4f}", axis=1)
-        # else:
-        #     # 对于非百分比因子，保持原样
-        #     group_stats['参数区间'] = group_stats.apply(lambda x: f"{x['因子最小值']:.4f}-{x['因子最大值']:.4f}", axis=1)
-            
+        min_count = sizes[present].min()
+        max_count = sizes[present].max()
+        # 如果样本数量差异超过10%，发出警告
+        if max_count > min_count * 1.1:
+            print(f"警告: 分组样本数量分布不均，最小: {min_count}, 最大: {max_count}")
+        
+        # 计算每组的平均收益、标准差和样本数量；因子已排序，最小/最大值即每组首尾元素
+        return_stats = pd.Series(sorted_returns).groupby(labels).agg(['mean', 'std', 'count'])
+        group_stats = pd.DataFrame({
+            '分组': return_stats.index.values,
+            '平均收益': return_stats['mean'].values,
+            '收益标准差': return_stats['std'].values,
+            '样本数量': return_stats['count'].values,
+            '因子最小值': sorted_factor[starts[present]],
+            '因子最大值': sorted_factor[ends[present] - 1]
+        })
+        
         # 使用原始数据，不进行任何转换，修改为使用"到"分隔符避免Excel解析错误
-        group_stats['参数区间'] = group_stats.apply(lambda x: f"{x['因子最小值']:.4f}到{x['因子最大值']:.4f}", axis=1)
+        group_stats['参数区间'] = [f"{low:.4f}到{high:.4f}" for low, high in
+                               zip(group_stats['因子最小值'], group_stats['因子最大值'])]
         
-        # 检测并警告异常大的区间跨度
-        for idx, row in group_stats.iterrows():
-            span = row['因子最大值'] - row['因子最小值']
-            # 计算所有组的平均跨度
-            avg_span = group_stats['因子最大值'].mean() - group_stats['因子最小值'].mean()
-            # 如果某组跨度超过平均跨度的3倍，发出警告
-            if span > 3 * avg_span and span > 0:
-                print(f"警告: 第{int(row['分组'])}组的参数区间跨度异常大: {span:.4f}")
+        # 检测并警告异常大的区间跨度（超过所有组平均跨度的3倍）
+        spans = group_stats['因子最大值'].values - group_stats['因子最小值'].values
+        avg_span = group_stats['因子最大值'].mean() - group_stats['因子最小值'].mean()
+        wide = (spans > 3 * avg_span) & (spans > 0)
+        for group_num, span in zip(group_stats['分组'].values[wide], spans[wide]):
+            print(f"警告: 第{int(group_num)}组的参数区间跨度异常大: {span:.4f}")
         
         # 保留需要的列
         avg_returns = group_stats[['分组', '平均收益', '收益标准差', '样本数量', '参数区间']]
         
         # 简化的分组完成提示
-        total_samples = avg_returns['样本数量'].sum()
-        print(f"分组完成，共 {n_groups} 组，总样本数: {total_samples}")
+        print(f"分组完成，共 {n_groups} 组，总样本数: {avg_returns['样本数量'].sum()}")
         
         # 确保分组从1到n_groups连续
-        expected_groups = list(range(1, n_groups + 1))
-        for g in expected_groups:
-            if g not in avg_returns['分组'].values:
-                print(f"警告: 未找到分组 {g}，创建默认记录")
-                new_row = pd.DataFrame({
-                    '分组': [g],
-                    '平均收益': [0.0],
-                    '收益标准差': [0.0],
-                    '样本数量': [0]
-                })
-                avg_returns = pd.concat([avg_returns, new_row], ignore_index=True)
+        for g in np.flatnonzero(~present) + 1:
+            print(f"警告: 未找到分组 {g}，创建默认记录")
+            new_row = pd.DataFrame({
+                '分组': [g],
+                '平均收益': [0.0],
+                '收益标准差': [0.0],
+                '样本数量': [0]
+            })
+            avg_returns = pd.concat([avg_returns, new_row], ignore_index=True)
         
         # 按分组排序
         avg_returns = avg_returns.sort_values('分组').reset_index(drop=True)
         
-        # 计算t统计量和p值
+        # 逐组计算t统计量、p值、胜率、最大回撤、夏普率和索提诺比率（每组是一段连续切片）
         t_stats = []
         p_values = []
+        win_rates = []
+        max_drawdowns = []
+        sharpe_ratios = []
+        sortino_ratios = []
         
-        for _, row in avg_returns.iterrows():
-            group_num = row['分组']
-            # 从原始数据中获取该分组的数据
-            group_data = df_clean[df_clean['分组'] == group_num][self.return_col]
+        for group_num, mean_return, return_std in zip(avg_returns['分组'].values, avg_returns['平均收益'].values,
+                                                      avg_returns['收益标准差'].values):
+            group_data = sorted_returns[starts[group_num - 1]:ends[group_num - 1]]
+            n_rows = len(group_data)
             
-            if len(group_data) > 1:
+            t_stat = np.nan
+            p_value = np.nan
+            if n_rows > 1:
                 # 计算样本标准差
-                std = group_data.std(ddof=1)
+                std = _sample_std(group_data)
                 if std > 0:
                     # 计算t统计量
-                    t_stat = row['平均收益'] / (std / np.sqrt(len(group_data)))
+                    t_stat = mean_return / (std / np.sqrt(n_rows))
                     
                     # 计算p值
                     if HAS_SCIPY:
                         from scipy.stats import t
-                        p_value = 2 * (1 - t.cdf(abs(t_stat), len(group_data) - 1))
+                        p_value = 2 * (1 - t.cdf(abs(t_stat), n_rows - 1))
                         # 为非常小的p值设置最小值，避免显示为0
                         p_value = max(p_value, 1e-10)
                     else:
                         # 不使用scipy时，使用数学公式计算
                         import math
-                        dof = len(group_data) - 1
+                        dof = n_rows - 1
                         
                         # 对于大自由度，可以使用正态近似
                         if dof > 30:
@@ -2285,71 +4010,32 @@ class FactorAnalysis:
                             p_value = 2 * math.exp(-t_stat**2 / 2)
                         # 为非常小的p值设置最小值
                         p_value = max(p_value, 1e-10)
-                else:
-                    t_stat = np.nan
-                    p_value = np.nan
-            else:
-                t_stat = np.nan
-                p_value = np.nan
-            
             t_stats.append(t_stat)
             p_values.append(p_value)
-        
-        avg_returns['T统计量'] = t_stats
-        avg_returns['P值'] = p_values
-        
-        # 计算每个分组的胜率、最大回撤、夏普率和索提诺比率
-        win_rates = []
-        max_drawdowns = []
-        sharpe_ratios = []
-        sortino_ratios = []
-        
-        for _, row in avg_returns.iterrows():
-            group_num = row['分组']
-            # 从原始数据中获取该分组的数据
-            group_data = df_clean[df_clean['分组'] == group_num][self.return_col]
             
-            if len(group_data) > 0:
-                # 计算胜率：收益为正的样本占比
-                positive_count = (group_data > 0).sum()
-                win_rate = positive_count / len(group_data) if len(group_data) > 0 else 0
-                win_rates.append(win_rate)
-                
-                # 计算最大回撤
-                if len(group_data) > 1:
-                    cumulative_returns = (1 + group_data).cumprod()
-                    running_max = cumulative_returns.expanding().max()
-                    drawdown = (cumulative_returns - running_max) / running_max
-                    max_drawdown = abs(drawdown.min())
-                    max_drawdowns.append(max_drawdown)
-                else:
-                    max_drawdowns.append(0.0)
-                
-                # 计算单期夏普率（用于年化转换）
-                if row['收益标准差'] > 0:
-                    single_period_sharpe = row['平均收益'] / row['收益标准差']
-                    sharpe_ratios.append(single_period_sharpe)
-                else:
-                    sharpe_ratios.append(0.0)
-                
-                # 计算单期索提诺比率（用于年化转换）
-                downside_returns = group_data[group_data < 0]
-                if len(downside_returns) > 0 and len(downside_returns) > 1:
-                    downside_std = downside_returns.std(ddof=1)
-                    if downside_std > 0:
-                        single_period_sortino = row['平均收益'] / downside_std
-                        sortino_ratios.append(single_period_sortino)
-                    else:
-                        sortino_ratios.append(0.0)
-                else:
-                    sortino_ratios.append(0.0)
-            else:
+            if n_rows == 0:
                 win_rates.append(0.0)
                 max_drawdowns.append(0.0)
                 sharpe_ratios.append(0.0)
                 sortino_ratios.append(0.0)
+                continue
+            
+            # 计算胜率：收益为正的样本占比
+            win_rates.append((group_data > 0).sum() / n_rows)
+            
+            # 计算最大回撤
+            max_drawdowns.append(_max_drawdown(group_data) if n_rows > 1 else 0.0)
+            
+            # 计算单期夏普率（用于年化转换）
+            sharpe_ratios.append(mean_return / return_std if return_std > 0 else 0.0)
+            
+            # 计算单期索提诺比率（用于年化转换）
+            downside_returns = group_data[group_data < 0]
+            downside_std = _sample_std(downside_returns) if len(downside_returns) > 1 else 0.0
+            sortino_ratios.append(mean_return / downside_std if downside_std > 0 else 0.0)
         
-        # 添加新的列到结果中
+        avg_returns['T统计量'] = t_stats
+        avg_returns['P值'] = p_values
         avg_returns['胜率'] = win_rates
         avg_returns['最大回撤'] = max_drawdowns
         avg_returns['夏普率'] = sharpe_ratios  # 添加单期夏普比率
@@ -2359,11 +4045,13 @@ class FactorAnalysis:
         # 自动分析原始数据特征，智能选择年化算法
         print(f"  [分析] 开始自适应年化计算分析...")
         
-        # 步骤1: 自动分析原始数据特征
-        data_characteristics = self._analyze_data_characteristics()
-        
-        # 步骤2: 基于数据特征选择最优年化算法
-        annualization_method = self._select_optimal_annualization_method(data_characteristics)
+        if not annualization:
+            # 步骤1: 自动分析原始数据特征
+            annualization['characteristics'] = self._analyze_data_characteristics()
+            # 步骤2: 基于数据特征选择最优年化算法
+            annualization['method'] = self._select_optimal_annualization_method(annualization['characteristics'])
+        data_characteristics = annualization['characteristics']
+        annualization_method = annualization['method']
         
         # 步骤3: 执行年化计算
         annual_results = self._calculate_adaptive_annual_returns(avg_returns, data_characteristics, annualization_method)
@@ -2392,17 +4080,10 @@ class FactorAnalysis:
         # 打印详细分析结果
         self._print_annualization_analysis(data_characteristics, annualization_method, annual_results)
         
-        # 计算多空收益（高分组 - 低分组）
+        # 计算多空收益（高分组 - 低分组），分组已按1..n_groups排序
         long_short_return = np.nan
         if len(avg_returns) >= 2:
-            max_group = avg_returns['分组'].max()
-            min_group = avg_returns['分组'].min()
-            
-            max_return = avg_returns.loc[avg_returns['分组'] == max_group, '平均收益'].values[0]
-            min_return = avg_returns.loc[avg_returns['分组'] == min_group, '平均收益'].values[0]
-            
-            # 计算高因子组与低因子组的收益差
-            long_short_return = max_return - min_return
+            long_short_return = avg_returns['平均收益'].iloc[-1] - avg_returns['平均收益'].iloc[0]
             print(f"  多空收益（高-低分组）: {long_short_return:.4f}")
         
         return {
@@ -2417,17 +4098,28 @@ class FactorAnalysis:
         Returns:
             dict: 数据特征分析结果
         """
+        # 子进程中没有原始数据，使用主进程分析好的结果（见_factor_analysis_worker）
+        if getattr(self, '_data_characteristics', None) is not None:
+            return dict(self._data_characteristics)
+        
         df = self.data
         characteristics = {}
         
         # 计算交易频率和持股周期
         if '信号日期' in df.columns and '持股2日收益率' in df.columns:
-            df_sorted = df.sort_values('信号日期')
-            date_diff = df_sorted['信号日期'].diff().dt.days
-            
-            # 去除NaN值
-            date_diff_clean = date_diff.dropna()
-            avg_interval = date_diff_clean.mean()
+            dataset = getattr(self, 'dataset', None)
+            if dataset is not None and dataset.is_derived_from(df):
+                # 按日期排序后相邻信号间隔的均值 = (最大日序号 - 最小日序号) / 间隔数，不需要排序
+                days = dataset.day_numbers[dataset.valid_mask(['信号日期'])]
+                n_intervals = len(days) - 1
+                total_days = int(days.max() - days.min()) if len(days) > 0 else 0
+                avg_interval = total_days / n_intervals if n_intervals > 0 else np.nan
+            else:
+                df_sorted = df.sort_values('信号日期')
+                date_diff_clean = df_sorted['信号日期'].diff().dt.days.dropna()
+                n_intervals = len(date_diff_clean)
+                avg_interval = date_diff_clean.mean()
+                total_days = (df_sorted['信号日期'].max() - df_sorted['信号日期'].min()).days if n_intervals > 0 else 0
             
             # 计算实际年交易频率
             if avg_interval > 0:
@@ -2436,14 +4128,12 @@ class FactorAnalysis:
                 actual_trades_per_year = 365  # 默认值
                 
             # 观测期长度
-            if len(date_diff_clean) > 0:
-                total_days = (df_sorted['信号日期'].max() - df_sorted['信号日期'].min()).days
+            if n_intervals > 0:
                 observation_period = total_days / 365.25
             else:
                 observation_period = 1  # 默认值
             
-            # 持股周期分析（基于收益率数据推断）
-            returns = df['持股2日收益率'].dropna()
+            # 持股周期（2日持有）
             holding_period = 2  # 从数据特征知道是2日持有
             
             characteristics = {
@@ -2770,6 +4460,7 @@ class FactorAnalysis:
         
         # 使用scipy计算更详细的统计信息（仅当scipy可用时）
         if HAS_SCIPY:
+            stats = _scipy_stats()
             # 计算Jarque-Bera正态性检验
             jb_stat, jb_pvalue = stats.jarque_bera(factor_data)
             stats_info['Jarque-Bera统计量'] = jb_stat
@@ -2798,12 +4489,16 @@ class FactorAnalysis:
     
     # 移除了验证函数，优化计算逻辑确保结果正确
     
-    def run_factor_analysis(self, use_pearson=False):
+    def run_factor_analysis(self, use_pearson=False, max_workers=None):
         """
         运行所有因子的分析
         
+        各因子之间相互独立，max_workers大于1时用进程池并行分析（见_run_factors_in_processes），
+        所有因子结束后结果和输出按因子顺序合并，与顺序分析相同；子进程中失败的因子改为在本进程中分析。
+        
         Args:
             use_pearson: 是否使用Pearson相关系数计算IC值，默认为False（使用Spearman相关系数）
+            max_workers: 并行分析因子的进程数，None或1时顺序分析
         """
         if not self.preprocess_data():
             return False
@@ -2836,81 +4531,182 @@ class FactorAnalysis:
         print(f"\n开始因子分析，使用 {self.return_col} 作为收益率计算标准")
         print(f"使用 {corr_type} 相关系数计算IC值")
         
-        for factor in self.factors:
-            print(f"\n=== 分析因子: {factor} ===")
-            
-            # 检查因子是否存在且有效
-            if factor not in self.processed_data.columns:
-                print(f"跳过因子 {factor}: 数据中不存在该因子")
-                continue
-            
-            # 计算因子基本统计
-            stats_info = self.calculate_factor_stats(factor)
-            print(f"分析因子: {factor}")
-            
-            # 计算IC值 - 启用所有新增的稳健性统计方法
-            ic_mean, ic_std, t_stat, p_value, extra_stats = self.calculate_ic(
-                factor, 
-                use_pearson=use_pearson,
-                use_robust_corr=True,    # 启用稳健相关系数
-                use_kendall=True,        # 启用Kendall's Tau
-                use_nonparam_test=True,  # 启用非参数检验
-                compute_bootstrap_ci=True # 启用Bootstrap置信区间
-            )
-            
-            # 显示额外的统计信息
-            if extra_stats:
-                print(f"  额外稳健性统计信息:")
-                for key, value in extra_stats.items():
-                    if isinstance(value, tuple):
-                        print(f"    {key}: {value}")
-                    elif isinstance(value, list) and len(value) > 0:
-                        print(f"    {key}: {len(value)}个Bootstrap样本")
-                    else:
-                        print(f"    {key}: {value:.3f}")
-            
-            # 添加缺失值检查和警告
-            if np.isnan(ic_std):
-                print(f"  警告: {factor} 的IC标准差计算失败或缺失")
-                ir = np.nan
+        if max_workers and max_workers > 1 and len(self.factors) > 1:
+            try:
+                outcomes = self._run_factors_in_processes(use_pearson, max_workers)
+            except Exception as e:
+                # 进程池未能启动，还没有输出或合并任何因子的结果
+                print(f"  警告: 多进程因子分析失败，改为顺序分析: {e}")
             else:
-                # 直接按数学定义计算IR值，不添加任何人为限制
-                ir = ic_mean / ic_std if ic_std != 0 else np.nan
-                if np.isnan(ir) or not np.isfinite(ir):
-                    print(f"  警告: {factor} 的IR值计算异常（可能是IC标准差为0）")
-            
-            print(f"IC分析结果: IC均值={ic_mean:.3f}, IR值={ir:.3f}")
-            
-            # 计算分组收益
-            group_results = self.calculate_group_returns(factor)
-            if group_results:
-                print(f"\n分组收益分析:")
-                print(group_results['avg_returns'].to_string(index=False, float_format='%.3f'))
-                print(f"\n多空收益(最高组-最低组): {group_results['long_short_return']:.3f}")
-            
-            # 保存分析结果
-            self.analysis_results[factor] = {
-                'stats_info': stats_info,
-                'ic_mean': ic_mean,
-                'ic_std': ic_std,
-                'ir': ir,
-                't_stat': t_stat,
-                'p_value': p_value,
-                'group_results': group_results
-            }
-            
-            # 注释掉自动生成CSV文件的代码，将在用户选择因子后再生成
-            # if group_results and 'avg_returns' in group_results:
-            #     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            #     safe_factor_name = factor.replace('/', '_').replace('\\', '_').replace(':', '_')
-            #     csv_filename = f'十等分分组收益_{safe_factor_name}_{timestamp}.csv'
-            #     group_results['avg_returns'].to_csv(csv_filename, index=False, encoding='utf-8-sig')
-            #     print(f"  因子 {factor} 的分组收益表格已保存至: {csv_filename}")
+                self._merge_factor_outcomes(outcomes, use_pearson)
+                print("因子分析完成")
+                return True
+        
+        # 所有因子的每日IC一次算出，日期分组和收益率排序只做一次
+        ic_details = self.calculate_ic_matrix(use_pearson=use_pearson)['details']
+        
+        for factor in self.factors:
+            results = self._analyze_single_factor(factor, use_pearson=use_pearson,
+                                                  daily_result=ic_details.get((factor, self.return_col)))
+            if results is not None:
+                self.analysis_results[factor] = results
         
         print("因子分析完成")
         
         return True
     
+    def _analyze_single_factor(self, factor, use_pearson=False, daily_result=None):
+        """
+        分析单个因子：基本统计、IC值（含稳健性统计）和5/10/20等分分组收益
+        
+        Args:
+            factor: 因子列名
+            use_pearson: 是否使用Pearson相关系数计算IC值
+            daily_result: calculate_ic_matrix中已算好的该因子每日IC结果，None时由calculate_ic计算
+        
+        Returns:
+            dict: 保存到analysis_results的分析结果，因子不存在时返回None
+        """
+        print(f"\n=== 分析因子: {factor} ===")
+        
+        # 检查因子是否存在且有效
+        if factor not in self.processed_data.columns:
+            print(f"跳过因子 {factor}: 数据中不存在该因子")
+            return None
+        
+        # 计算因子基本统计
+        stats_info = self.calculate_factor_stats(factor)
+        print(f"分析因子: {factor}")
+        
+        # 计算IC值 - 启用所有新增的稳健性统计方法
+        ic_mean, ic_std, t_stat, p_value, extra_stats = self.calculate_ic(
+            factor, 
+            use_pearson=use_pearson,
+            use_robust_corr=True,    # 启用稳健相关系数
+            use_kendall=True,        # 启用Kendall's Tau
+            use_nonparam_test=True,  # 启用非参数检验
+            compute_bootstrap_ci=True, # 启用Bootstrap置信区间
+            daily_result=daily_result
+        )
+        
+        # 显示额外的统计信息
+        if extra_stats:
+            print(f"  额外稳健性统计信息:")
+            for key, value in extra_stats.items():
+                if key == 'bootstrap_ci':
+                    print(f"    {key}: [{value[0]:.3f}, {value[1]:.3f}] ({len(value[2])}个Bootstrap样本)")
+                elif isinstance(value, tuple):
+                    print(f"    {key}: {value}")
+                elif isinstance(value, list) and len(value) > 0:
+                    print(f"    {key}: {len(value)}个Bootstrap样本")
+                else:
+                    print(f"    {key}: {value:.3f}")
+        
+        # 添加缺失值检查和警告
+        if np.isnan(ic_std):
+            print(f"  警告: {factor} 的IC标准差计算失败或缺失")
+            ir = np.nan
+        else:
+            # 直接按数学定义计算IR值，不添加任何人为限制
+            ir = ic_mean / ic_std if ic_std != 0 else np.nan
+            if np.isnan(ir) or not np.isfinite(ir):
+                print(f"  警告: {factor} 的IR值计算异常（可能是IC标准差为0）")
+        
+        print(f"IC分析结果: IC均值={ic_mean:.3f}, IR值={ir:.3f}")
+        
+        # 计算分组收益：因子只排序一次，同时得到5/10/20等分结果
+        group_tables = self.calculate_group_returns_multi(factor, n_groups_list=(5, 10, 20)) or {}
+        group_results = group_tables.get(5)
+        if group_results:
+            print(f"\n分组收益分析:")
+            print(group_results['avg_returns'].to_string(index=False, float_format='%.3f'))
+            print(f"\n多空收益(最高组-最低组): {group_results['long_short_return']:.3f}")
+        
+        # 注释掉自动生成CSV文件的代码，将在用户选择因子后再生成
+        # if group_results and 'avg_returns' in group_results:
+        #     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        #     safe_factor_name = factor.replace('/', '_').replace('\\', '_').replace(':', '_')
+        #     csv_filename = f'十等分分组收益_{safe_factor_name}_{timestamp}.csv'
+        #     group_results['avg_returns'].to_csv(csv_filename, index=False, encoding='utf-8-sig')
+        #     print(f"  因子 {factor} 的分组收益表格已保存至: {csv_filename}")
+        
+        return {
+            'stats_info': stats_info,
+            'ic_mean': ic_mean,
+            'ic_std': ic_std,
+            'ir': ir,
+            't_stat': t_stat,
+            'p_value': p_value,
+            'group_results': group_results,
+            'group_tables': group_tables
+        }
+    
+    def _run_factors_in_processes(self, use_pearson, max_workers):
+        """
+        用进程池并行分析各因子，等待所有因子结束后返回各因子的结果
+        
+        分析需要的列按列写成临时目录中的.npy文件（格式同列式缓存，见_write_table_cache），
+        子进程以内存映射方式读取各自因子的列，不再为每个任务序列化整个数据框。
+        每个子进程读取整列而不是行区间，直接复用列式缓存的读写即可，
+        不需要shujuchuli.SharedFrame那样按共享内存段和行区间重建分块。
+        这里不打印也不合并任何结果，由_merge_factor_outcomes按因子顺序处理。
+        
+        Returns:
+            dict: 因子 -> _factor_analysis_worker的返回值，子进程中失败的因子对应其异常
+        """
+        factors = [factor for factor in self.factors if factor in self.processed_data.columns]
+        shared_columns = [col for col in dict.fromkeys(['信号日期', SIGNAL_DAY_COL, '持股2日收益率', self.return_col] + factors)
+                          if col in self.processed_data.columns]
+        tmp_dir = tempfile.mkdtemp(prefix='yinzifenxi_factors_')
+        try:
+            cache_path = os.path.join(tmp_dir, 'columns')
+            manifest = _write_table_cache(self.processed_data[shared_columns], cache_path, {})
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(factors)), mp_context=context) as executor:
+                characteristics = self._analyze_data_characteristics()
+                futures = {factor: executor.submit(_factor_analysis_worker, cache_path, manifest, factor, self.return_col,
+                                                   use_pearson, getattr(self, 'verbosity', VERBOSITY_NORMAL),
+                                                   characteristics)
+                           for factor in factors}
+                outcomes = {}
+                for factor, future in futures.items():
+                    try:
+                        outcomes[factor] = future.result()
+                    except Exception as e:
+                        outcomes[factor] = e
+                return outcomes
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    def _merge_factor_outcomes(self, outcomes, use_pearson):
+        """
+        按因子顺序打印子进程的输出，并把分析结果、IC统计、诊断记录和计算结果缓存合并回本对象
+        
+        子进程中失败的因子在本进程中重新分析，其他因子的结果只输出和合并一次。
+        
+        Args:
+            outcomes: _run_factors_in_processes的返回值
+            use_pearson: 是否使用Pearson相关系数计算IC值
+        """
+        for factor in self.factors:
+            if factor not in outcomes:
+                print(f"\n=== 分析因子: {factor} ===")
+                print(f"跳过因子 {factor}: 数据中不存在该因子")
+                continue
+            outcome = outcomes[factor]
+            if isinstance(outcome, Exception):
+                print(f"\n  警告: 因子 {factor} 在子进程中分析失败，改为顺序分析: {outcome}")
+                results = self._analyze_single_factor(factor, use_pearson=use_pearson)
+                if results is not None:
+                    self.analysis_results[factor] = results
+                continue
+            output, results, ic_stats, diagnostics, memo = outcome
+            print(output, end='')
+            self.analysis_results[factor] = results
+            self.anomaly_stats.setdefault('ic_calculation', {}).update(ic_stats)
+            self.ic_diagnostics.merge(diagnostics)
+            self.memo.merge(memo, self.data_version)
+    
     def plot_factor_distribution(self):
         """
         绘制因子分布图
@@ -2928,6 +4724,7 @@ class FactorAnalysis:
         n_cols = min(2, n_factors)
         n_rows = (n_factors + n_cols - 1) // n_cols
         
+        plt, sns = _plotting()
         plt.figure(figsize=(12, 4 * n_rows))
         
         for i, factor in enumerate(self.factors):
@@ -2964,6 +4761,7 @@ class FactorAnalysis:
         n_cols = min(2, n_factors)
         n_rows = (n_factors + n_cols - 1) // n_cols
         
+        plt, sns = _plotting()
         plt.figure(figsize=(12, 4 * n_rows))
         
         for i, (factor, results) in enumerate(self.analysis_results.items()):
@@ -4418,6 +6216,14 @@ class FactorAnalysis:
                 f.write(scoring_standards)
                 f.write("\n")
                 
+                # 5. IC计算诊断（由结构化诊断记录按需生成）
+                diagnostics_text = self.ic_diagnostics.render() if hasattr(self, 'ic_diagnostics') else ""
+                if diagnostics_text:
+                    f.write("5. IC计算诊断\n")
+                    f.write("=" * 50 + "\n\n")
+                    f.write(diagnostics_text)
+                    f.write("\n")
+                
                 # 显式刷新缓冲区
                 f.flush()
                 
@@ -4527,6 +6333,100 @@ class FactorAnalysis:
         
         return summary_df
     
+    def search_filter_threshold(self, factor_name, operator='>', min_samples=30, sort_by='夏普比率'):
+        """
+        搜索过滤条件"factor_name operator 阈值"的最优阈值
+        
+        因子只排序一次，用累计和一次得到所有候选阈值（因子的每个不同取值）下保留样本的
+        样本数、平均收益、胜率和夏普比率，不需要对每个候选阈值重新运行分析。
+        
+        Args:
+            factor_name: 过滤因子名称
+            operator: 过滤操作符，'>'、'>='、'<'或'<='
+            min_samples: 保留样本数少于该值的阈值不输出
+            sort_by: 结果表的排序列（降序），None时按阈值升序
+        
+        Returns:
+            DataFrame: 每个候选阈值一行，"过滤条件"列可直接传给run_filtered_factor_analysis；
+                       因子不存在时返回None
+        """
+        df = getattr(self, 'processed_data', None)
+        if df is None:
+            df = self.data
+        if df is None or factor_name not in df.columns:
+            print(f"错误：因子 '{factor_name}' 在数据中不存在")
+            return None
+        
+        result = threshold_search(df[factor_name].values, df[self.return_col].values,
+                                  operator=operator, min_samples=min_samples)
+        table = pd.DataFrame({
+            '因子名称': factor_name,
+            '操作符': operator,
+            '阈值': result['threshold'],
+            '样本数': result['count'],
+            '样本占比': result['count'] / len(df) * 100 if len(df) else np.nan,
+            '平均收益': result['mean_return'],
+            '收益标准差': result['std_return'],
+            '胜率': result['win_rate'],
+            '夏普比率': result['sharpe']
+        })
+        table['过滤条件'] = [{factor_name: (operator, threshold)} for threshold in table['阈值']]
+        if sort_by is not None and len(table) > 0:
+            table = table.sort_values(sort_by, ascending=False, kind='mergesort').reset_index(drop=True)
+        
+        print(f"因子 {factor_name} {operator} 阈值搜索: {len(table)} 个候选阈值（每个阈值至少 {min_samples} 个样本）")
+        return table
+    
+    def search_filter_threshold_grid(self, factor_a, factor_b, operator_a='>', operator_b='>', n_bins=50,
+                                     min_samples=30, top_k=10, sort_by='夏普比率'):
+        """
+        搜索两个过滤因子组合条件"factor_a operator_a 阈值A 且 factor_b operator_b 阈值B"的最优阈值组合
+        
+        用二维累计和一次评估整个阈值网格，只保留排名前top_k的网格单元。
+        
+        Args:
+            factor_a, factor_b: 两个过滤因子名称
+            operator_a, operator_b: 两个因子的过滤操作符，'>'、'>='、'<'或'<='
+            n_bins: 每个因子的候选阈值取n_bins+1个等分位点，None时取全部不同取值
+            min_samples: 保留样本数少于该值的阈值组合不参与排名
+            top_k: 返回的最优阈值组合数量
+            sort_by: 排名列（降序），'夏普比率'、'平均收益'、'胜率'、'样本数'或'收益标准差'
+        
+        Returns:
+            DataFrame: 每个阈值组合一行，"过滤条件"列可直接传给run_filtered_factor_analysis；
+                       因子不存在时返回None
+        """
+        df = getattr(self, 'processed_data', None)
+        if df is None:
+            df = self.data
+        for factor_name in (factor_a, factor_b):
+            if df is None or factor_name not in df.columns:
+                print(f"错误：因子 '{factor_name}' 在数据中不存在")
+                return None
+        
+        metric = {column: key for key, column in THRESHOLD_METRIC_COLUMNS.items()}.get(sort_by)
+        if metric is None:
+            print(f"错误：不支持的排名列 '{sort_by}'，可选: {', '.join(THRESHOLD_METRIC_COLUMNS.values())}")
+            return None
+        
+        cells = threshold_grid_search(df[factor_a].values, df[factor_b].values, df[self.return_col].values,
+                                      operator_a=operator_a, operator_b=operator_b, n_bins=n_bins,
+                                      min_samples=min_samples, top_k=top_k, metric=metric)
+        table = pd.DataFrame([{
+            '因子A': factor_a,
+            '操作符A': operator_a,
+            '阈值A': cell['threshold_a'],
+            '因子B': factor_b,
+            '操作符B': operator_b,
+            '阈值B': cell['threshold_b'],
+            **{column: cell[key] for key, column in THRESHOLD_METRIC_COLUMNS.items()},
+            '过滤条件': {factor_a: (operator_a, cell['threshold_a']), factor_b: (operator_b, cell['threshold_b'])}
+        } for cell in cells])
+        
+        print(f"因子 {factor_a} {operator_a} 阈值A 且 {factor_b} {operator_b} 阈值B 网格搜索: "
+              f"保留按{sort_by}排名前 {len(table)} 个阈值组合（每个组合至少 {min_samples} 个样本）")
+        return table
+    
     def run_filtered_factor_analysis(self, filter_conditions, use_pearson=False):
         """
         运行带参数的因子分析
@@ -4535,15 +6435,84 @@ class FactorAnalysis:
             filter_conditions: 过滤条件字典，格式为 {factor_name: (operator, value)}
                               例如：{"信号发出时上市天数": (">", 1200), "信号当日收盘涨跌幅": ("<", -19.9)}
                               支持的操作符：'>', '<', '>=', '<=', '==', '!='
+                              search_filter_threshold结果表的"过滤条件"列可直接传入
             use_pearson: 是否使用Pearson相关系数计算IC值，默认为False（使用Spearman相关系数）
         
         Returns:
             bool: 分析是否成功
         """
+        if getattr(self, 'processed_data', None) is None and not self.preprocess_data():
+            return False
+        df = self.processed_data
+        
+        # 用布尔掩码组合所有条件，不修改原数据
+        mask = np.ones(len(df), dtype=bool)
+        for factor_name, (operator, value) in filter_conditions.items():
+            if factor_name not in df.columns:
+                print(f"错误：过滤因子 '{factor_name}' 在数据中不存在")
+                return False
+            if operator not in FILTER_OPERATORS:
+                print(f"错误：不支持的操作符 '{operator}'，支持的操作符：{', '.join(FILTER_OPERATORS)}")
+                return False
+            factor_values = pd.to_numeric(df[factor_name], errors='coerce').values
+            mask &= FILTER_OPERATORS[operator](factor_values, value)
+        
+        condition_str = ' 且 '.join(f"{factor_name} {operator} {value}"
+                                   for factor_name, (operator, value) in filter_conditions.items())
+        filtered_data = df[mask]
+        print(f"\n=== 带条件的因子分析: {condition_str} ===")
+        print(f"满足条件的样本数: {len(filtered_data)} / {len(df)}")
+        if len(filtered_data) == 0:
+            print("错误：没有满足条件的样本")
+            return False
+        
+        # 在过滤后的数据上复用IC和分组收益计算，结束后恢复分析器状态
+        saved_ic_stats = dict(self.anomaly_stats.get('ic_calculation', {}))
+        saved_diagnostics = self.ic_diagnostics
+        saved_version = self.data_version
+        self.processed_data = filtered_data
+        filtered_version = self.data_version
+        self.ic_diagnostics = ICDiagnostics()
+        filtered_analysis_results = {}
+        try:
+            ic_details = self.calculate_ic_matrix(use_pearson=use_pearson)['details']
+            for factor in self.factors:
+                if factor not in filtered_data.columns:
+                    continue
+                ic_mean, ic_std, t_stat, p_value, _ = self.calculate_ic(
+                    factor, use_pearson=use_pearson, daily_result=ic_details.get((factor, self.return_col)))
+                ir = ic_mean / ic_std if not np.isnan(ic_std) and ic_std != 0 else np.nan
+                filtered_analysis_results[factor] = {
+                    'ic_mean': ic_mean,
+                    'ic_std': ic_std,
+                    'ir': ir,
+                    't_stat': t_stat,
+                    'p_value': p_value,
+                    'group_results': self.calculate_group_returns(factor)
+                }
+        finally:
+            # 恢复原数据及其版本号，原数据的缓存结果继续有效；过滤数据的缓存结果不再需要
+            self.processed_data = df
+            self.data_version = saved_version
+            self.memo.discard_version(filtered_version)
+            self.ic_diagnostics = saved_diagnostics
+            self.anomaly_stats['ic_calculation'] = saved_ic_stats
+        
+        if not filtered_analysis_results:
+            print("错误：过滤后没有可分析的因子")
+            return False
+        
+        self.filtered_analysis_results[condition_str] = filtered_analysis_results
+        self._generate_filtered_summary_report(filtered_analysis_results, condition_str)
+        return True
     
-    def optimize_factor_parameter(self, factor_name, operator, initial_value, optimize_metric='long_short_return', use_pearson=False):
+    def optimize_factor_parameter(self, factor_name, operator, initial_value, optimize_metric='long_short_return',
+                                  use_pearson=False, n_bins=10, max_workers=None):
         """
-        优化因子参数，只保留10等分数据测试
+        优化因子参数，只保留等分数据测试
+        
+        数据按因子值只排序一次，各等分区间是排序结果上的切片，不复制数据、不修改self.processed_data；
+        区间之间可并行计算。
         
         Args:
             factor_name: 要优化的因子名称
@@ -4551,25 +6520,32 @@ class FactorAnalysis:
             initial_value: 初始参数值（实际已不再使用，保留兼容性）
             optimize_metric: 优化指标
             use_pearson: 是否使用Pearson相关系数计算IC值，默认为False（使用Spearman相关系数）
+            n_bins: 等分数量，默认10等分（可用20、50等更细的划分）
+            max_workers: 并行计算区间的线程数，None时顺序计算
         
         Returns:
-            dict: 包含10等分测试结果的字典
+            dict: 包含等分测试结果的字典
         """
         # 创建日志文件名
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         log_filename = f"参数优化_{factor_name}_decile_test_{timestamp}.txt"
         
-        # 日志函数
-        def log(message):
-            print(message)
-            with open(log_filename, 'a', encoding='utf-8') as f:
-                f.write(message + '\n')
-        
-        # 保存原始数据
-        original_processed_data = self.processed_data.copy()
+        with open(log_filename, 'a', encoding='utf-8') as log_file:
+            # 日志函数（整个优化过程只打开一次日志文件）
+            def log(message):
+                print(message)
+                log_file.write(message + '\n')
+            
+            return self._run_parameter_sweep(factor_name, optimize_metric, use_pearson, n_bins, max_workers,
+                                             timestamp, log_filename, log)
+    
+    def _run_parameter_sweep(self, factor_name, optimize_metric, use_pearson, n_bins, max_workers,
+                             timestamp, log_filename, log):
+        """执行等分测试并记录日志（optimize_factor_parameter的实现）"""
+        df = self.processed_data
         
         # 检查因子是否存在且为数值型
-        if factor_name not in self.processed_data.columns:
+        if factor_name not in df.columns:
             error_msg = f"错误：因子 '{factor_name}' 在数据中不存在"
             log(error_msg)
             return None
@@ -4581,144 +6557,62 @@ class FactorAnalysis:
         log(f"优化指标: {optimize_metric}")
         log("="*80)
         
-        # 开始10等分数据测试
+        # 开始等分数据测试
         log("\n" + "="*80)
-        log(f"开始10等分数据测试")
+        log(f"开始{n_bins}等分数据测试")
         log("="*80)
         
-        # 按因子值从小到大排序并平均分成10份
-        temp_data = original_processed_data.copy()
-        if not pd.api.types.is_numeric_dtype(temp_data[factor_name]):
-            temp_data[factor_name] = pd.to_numeric(temp_data[factor_name], errors='coerce')
+        total_data_count = int(pd.to_numeric(df[factor_name], errors='coerce').notna().sum())
+        log(f"数据总量: {total_data_count} 行")
         
-        # 去除NaN值
-        temp_data = temp_data.dropna(subset=[factor_name])
+        if total_data_count == 0:
+            log(f"警告: 因子值范围内没有足够的数据进行{n_bins}等分测试")
+            return None
         
-        total_data_count = len(temp_data)
-        log(f"数据总量: {total_data_count} 行")
+        # 按因子值排序并平均分成n_bins份，各区间独立计算
+        decile_performances = sweep_factor_bins(
+            df['信号日期'].values, df[factor_name].values, df[self.return_col].values,
+            n_bins=n_bins, use_pearson=use_pearson, max_workers=max_workers
+        )
         
-        # 如果数据量足够，进行10等分测试
-        if total_data_count > 0:
-            # 按因子值排序
-            temp_data_sorted = temp_data.sort_values(by=factor_name)
-            
-            # 平均分成10份
-            n_bins = 10
-            bin_size = len(temp_data_sorted) // n_bins
-            decile_performances = []
-            
-            for i in range(n_bins):
-                # 计算每个分位的数据范围
-                start_idx = i * bin_size
-                end_idx = len(temp_data_sorted) if i == n_bins - 1 else (i + 1) * bin_size
-                
-                # 获取该分位的数据
-                decile_data = temp_data_sorted.iloc[start_idx:end_idx].copy()
-                
-                # 获取该分位的因子值范围
-                decile_min = decile_data[factor_name].min()
-                decile_max = decile_data[factor_name].max()
-                
-                log(f"\n=== 第 {i+1} 等分测试（共{len(decile_data)}行） ===")
-                log(f"因子值范围: {decile_min:.3f} 到 {decile_max:.3f}")
-                
-                # 临时更新处理后的数据
-                self.processed_data = decile_data
-                
-                # 计算性能指标
-                try:
-                    ic_mean, ic_std, _, _, _ = self.calculate_ic(factor_name, use_pearson=use_pearson)
-                    ir = ic_mean / ic_std if not np.isnan(ic_std) and ic_std != 0 else 0.0
-                except Exception as e:
-                    log(f"  计算IC值时出错: {str(e)}")
-                    ic_mean = 0.0
-                    ir = 0.0
-                
-                try:
-                    group_results = self.calculate_group_returns(factor_name)
-                    long_short_return = group_results.get('long_short_return', 0.0) if group_results else 0.0
-                    if np.isnan(long_short_return):
-                        long_short_return = 0.0
-                except Exception as e:
-                    log(f"  计算分组收益时出错: {str(e)}")
-                    long_short_return = 0.0
-                
-                # 计算胜率
-                try:
-                    win_rate = 0.0
-                    if group_results and 'avg_returns' in group_results:
-                        avg_returns = group_results['avg_returns']
-                        if not avg_returns.empty:
-                            positive_groups = (avg_returns['mean_return'] > 0).sum()
-                            if len(avg_returns) > 0:
-                                win_rate = (positive_groups / len(avg_returns)) * 100
-                except Exception as e:
-                    log(f"  计算胜率时出错: {str(e)}")
-                    win_rate = 0.0
-                
-                # 存储分位性能
-                decile_performances.append({
-                    'decile': i + 1,
-                    'factor_min': decile_min,
-                    'factor_max': decile_max,
-                    'data_count': len(decile_data),
-                    'long_short_return': long_short_return,
-                    'ir': ir,
-                    'ic_mean': ic_mean,
-                    'win_rate': win_rate
-                })
-                
-                # 记录测试结果
-                log(f"  多空收益: {long_short_return:.3f}%")
-                log(f"  IR值: {ir:.3f}")
-                log(f"  IC均值: {ic_mean:.3f}")
-                log(f"  胜率: {win_rate:.1f}%")
-            
-            # 恢复原始数据
-            self.processed_data = original_processed_data.copy()
-            
-            # 保存10等分测试结果到CSV
-            if decile_performances:
-                decile_df = pd.DataFrame(decile_performances)
-                decile_df = decile_df.fillna(0)
-                
-                decile_csv_filename = f"十等分测试_{factor_name}_{timestamp}.csv"
-                decile_df.to_csv(decile_csv_filename, index=False, encoding='utf-8-sig')
-                
-                # 找出表现最好的分位
-                if optimize_metric == 'long_short_return':
-                    best_decile = max(decile_performances, key=lambda x: x['long_short_return'])
-                elif optimize_metric == 'ir':
-                    best_decile = max(decile_performances, key=lambda x: x['ir'])
-                else:
-                    best_decile = max(decile_performances, key=lambda x: x['win_rate'])
-                
-                log(f"\n最佳表现分位: 第 {best_decile['decile']} 等分")
-                log(f"因子值范围: {best_decile['factor_min']:.3f} 到 {best_decile['factor_max']:.3f}")
-                log(f"多空收益: {best_decile['long_short_return']:.3f}%")
-                
-                # 存储初始结果
-                results = {
-                    'best_decile': best_decile,
-                    'all_deciles': decile_performances,
-                    'csv_file': decile_csv_filename
-                }
-                
-                # 记录参数优化结束信息
-                log("\n" + "="*80)
-                log(f"参数优化结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                log(f"日志文件保存路径: {log_filename}")
-                
-                # 恢复原始数据
-                self.processed_data = original_processed_data
-                
-                return results
-            else:
-                log("警告: 没有生成有效的10等分测试结果")
-                return None
+        for performance in decile_performances:
+            log(f"\n=== 第 {performance['decile']} 等分测试（共{performance['data_count']}行） ===")
+            log(f"因子值范围: {performance['factor_min']:.3f} 到 {performance['factor_max']:.3f}")
+            log(f"  多空收益: {performance['long_short_return']:.3f}%")
+            log(f"  IR值: {performance['ir']:.3f}")
+            log(f"  IC均值: {performance['ic_mean']:.3f}")
+            log(f"  胜率: {performance['win_rate']:.1f}%")
+        
+        # 保存等分测试结果到CSV
+        decile_df = pd.DataFrame(decile_performances)
+        decile_df = decile_df.fillna(0)
+        
+        csv_prefix = "十等分测试" if n_bins == 10 else f"{n_bins}等分测试"
+        decile_csv_filename = f"{csv_prefix}_{factor_name}_{timestamp}.csv"
+        decile_df.to_csv(decile_csv_filename, index=False, encoding='utf-8-sig')
+        
+        # 找出表现最好的分位
+        if optimize_metric == 'long_short_return':
+            best_decile = max(decile_performances, key=lambda x: x['long_short_return'])
+        elif optimize_metric == 'ir':
+            best_decile = max(decile_performances, key=lambda x: x['ir'])
         else:
-            log("警告: 因子值范围内没有足够的数据进行10等分测试")
-            return None
+            best_decile = max(decile_performances, key=lambda x: x['win_rate'])
+        
+        log(f"\n最佳表现分位: 第 {best_decile['decile']} 等分")
+        log(f"因子值范围: {best_decile['factor_min']:.3f} 到 {best_decile['factor_max']:.3f}")
+        log(f"多空收益: {best_decile['long_short_return']:.3f}%")
+        
+        # 记录参数优化结束信息
+        log("\n" + "="*80)
+        log(f"参数优化结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        log(f"日志文件保存路径: {log_filename}")
+        
+        return {
+            'best_decile': best_decile,
+            'all_deciles': decile_performances,
+            'csv_file': decile_csv_filename
+        }
     
     def _generate_filtered_summary_report(self, filtered_analysis_results, condition_str):
         """
@@ -4790,12 +6684,42 @@ class FactorAnalysis:
 
 
 # 删除重复的main函数定义，只保留末尾的完整版本
+def _factor_analysis_worker(cache_path, manifest, factor, return_col, use_pearson, verbosity, characteristics):
+    """
+    进程池中分析单个因子（见FactorAnalysis._run_factors_in_processes）
+    
+    从内存映射的列文件中只读取该因子需要的列，输出写入字符串由主进程按因子顺序打印。
+    年化算法使用的原始数据特征（characteristics）由主进程分析后传入。
+    
+    Returns:
+        tuple: (输出文字, 分析结果, IC计算统计, ICDiagnostics, AnalysisMemo)
+    """
+    frame = _read_table_cache(cache_path, manifest, columns=['信号日期', SIGNAL_DAY_COL, '持股2日收益率', return_col, factor])
+    analyzer = FactorAnalysis(data=frame, verbosity=verbosity)
+    analyzer.processed_data = frame
+    analyzer.factors = [factor]
+    analyzer.return_col = return_col
+    analyzer._data_characteristics = characteristics
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        results = analyzer._analyze_single_factor(factor, use_pearson=use_pearson)
+    return (output.getvalue(), results, analyzer.anomaly_stats['ic_calculation'],
+            analyzer.ic_diagnostics, analyzer.memo)
+
+
 class ParameterizedFactorAnalyzer:
     """专门针对带参数因子的综合分析器"""
     
     def __init__(self, data, file_path=None):
-        """初始化综合因子分析器"""
-        self.data = data
+        """
+        初始化综合因子分析器
+        
+        Args:
+            data: 原始DataFrame，或FactorAnalysis预处理后的PreparedDataset（共用，不再重复解析）
+            file_path: 数据文件路径
+        """
+        self.dataset = data if isinstance(data, PreparedDataset) else None
+        self.data = data.frame if isinstance(data, PreparedDataset) else data
         self.file_path = file_path
         self.factors = [
              '信号发出时上市天数',
@@ -4817,12 +6741,15 @@ class ParameterizedFactorAnalyzer:
             # 不返回值，让对象仍可被创建但处于无效状态
     
     def load_data(self):
-        """从文件加载数据"""
+        """从文件加载数据（Excel文件使用列式缓存）"""
+        if not os.path.exists(self.file_path):
+            print(f"数据加载失败: 数据文件不存在: {self.file_path}")
+            return False
         try:
             if self.file_path.endswith('.csv'):
                 self.data = pd.read_csv(self.file_path, encoding='utf-8-sig')
             elif self.file_path.endswith('.xlsx') or self.file_path.endswith('.xls'):
-                self.data = pd.read_excel(self.file_path)
+                self.data = load_table_cached(self.file_path)
             else:
                 raise ValueError("仅支持CSV和Excel文件格式")
             
@@ -4844,45 +6771,17 @@ class ParameterizedFactorAnalyzer:
             return False
         
         try:
-            # 复制数据
-            df = self.data.copy()
-            
-            # 处理百分比字符串列（转换百分比）
-            percentage_columns = [
-                '日最大跌幅百分比', '信号当日收盘涨跌幅', '信号后一日开盘涨跌幅', 
-                '次日开盘后总体下跌幅度', '前10日最大涨幅', '当日回调', '持股2日收益率'
-            ]
-            
-            for col in percentage_columns:
-                if col in df.columns:
-                    # 如果列是字符串类型且包含%
-                    if df[col].dtype == 'object':
-                        try:
-                            df[col] = pd.to_numeric(df[col].astype(str).str.replace('%', ''), errors='coerce') / 100
-                            print(f"已转换列 '{col}' 从百分比字符串到数值")
-                        except Exception as e:
-                            print(f"转换列 '{col}' 时出错: {e}")
-            
-            # 处理收益率列
-            if not pd.api.types.is_numeric_dtype(df[self.return_col]):
-                try:
-                    if df[self.return_col].dtype == 'object':
-                        df[self.return_col] = df[self.return_col].str.replace('%', '')
-                    df[self.return_col] = pd.to_numeric(df[self.return_col], errors='coerce')
+            # 与FactorAnalysis共用的预处理；传入PreparedDataset时直接使用，不重复解析
+            if self.dataset is None or not self.dataset.is_derived_from(self.data):
+                self.dataset = PreparedDataset.from_data(self.data, self.factors, self.return_col)
+                for col in self.dataset.report['percent_columns']:
+                    print(f"已转换列 '{col}' 从百分比字符串到数值")
+                if self.return_col in self.dataset.report['numeric_columns']:
                     print(f"收益率列 {self.return_col} 转换为数值型")
-                except:
-                    print(f"警告：无法将 {self.return_col} 转换为数值型")
-            
-            # 确保日期列正确处理
-            if '信号日期' in df.columns:
-                try:
-                    df['信号日期'] = pd.to_datetime(df['信号日期'], errors='coerce')
-                except:
-                    print("警告：无法转换信号日期列")
             
-            # 删除缺失值
-            original_len = len(df)
-            df = df.dropna(subset=[self.return_col] + self.factors)
+            # 删除缺失值（按掩码筛选，与FactorAnalysis相同列组合时共用同一结果）
+            original_len = len(self.dataset)
+            df = self.dataset.view([self.return_col] + self.factors)
             print(f"数据预处理完成，分析使用 {len(df)} 行有效数据 (删除了 {original_len - len(df)} 行缺失值)")
             
             self.processed_data = df
@@ -5431,6 +7330,11 @@ class ParameterizedFactorAnalyzer:
 # 主函数示例
 def main():
     """主函数"""
+    # 检查数据文件（导入模块时不再检查）
+    if not check_data_file(DEFAULT_DATA_FILE):
+        sys.exit(1)
+    report_optional_dependencies()
+    
     # 初始化日志记录器
     logger = Logger()
     sys.stdout = logger  # 重定向输出到日志记录器
@@ -5452,6 +7356,9 @@ def main():
     # 使用Spearman相关系数
     use_pearson = False
     
+    # 并行分析因子的进程数（None时顺序分析；数据量大且有多个CPU核时可设为核数）
+    max_workers = None
+    
     # 使用标准处理方式
     process_factors = True
     factor_method = 'standardize'
@@ -5472,7 +7379,7 @@ def main():
     # 执行全因子分析
     print("\n执行全因子分析...")
     try:
-        analyzer.run_factor_analysis(use_pearson=use_pearson)
+        analyzer.run_factor_analysis(use_pearson=use_pearson, max_workers=max_workers)
         
         # 生成汇总报告
         if hasattr(analyzer, 'analysis_results') and analyzer.analysis_results:
@@ -5500,7 +7407,7 @@ def main():
             # 计算IC
             ic_mean, ic_std, t_stat, p_value, _ = analyzer.calculate_ic(factor_name, use_pearson=use_pearson)
             
-            # 计算分组收益
+            # 计算分组收益（全因子分析中已算好的10等分结果由analyzer.memo直接返回）
             group_results = analyzer.calculate_group_returns(factor_name, n_groups=10)
             
             if group_results:
@@ -5536,6 +7443,9 @@ def main():
         except Exception as e:
             print(f"分析因子 '{factor_name}' 时出错: {str(e)}")
     
+    # IC和分组收益在全因子分析与10等分分析之间的复用情况
+    print(f"\n计算结果缓存: {analyzer.memo.render()}")
+    
     # 汇总分析结果
     print("\n=== 因子分析结果已保存 ===")
     
@@ -5546,7 +7456,9 @@ def main():
     
     try:
         # 创建带参数因子分析器
-        parameterized_analyzer = ParameterizedFactorAnalyzer(analyzer.data.copy())
+        # 直接使用FactorAnalysis预处理后的共享数据集，不再复制和重复解析原始数据
+        parameterized_analyzer = ParameterizedFactorAnalyzer(
+            analyzer.dataset if analyzer.dataset is not None else analyzer.data)
         
         # 预处理数据
         if parameterized_analyzer.preprocess_data():
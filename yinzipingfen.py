@@ -15,7 +15,7 @@ from sklearn.linear_model import LinearRegression
 import warnings
 
 # 导入基础系统组件
-from jichuxitong import ConfigManager, CacheManager, ErrorHandler, FactorAnalysisError, DataProcessingError, exception_handler, cache_result
+from jichuxitong import ConfigManager, CacheManager, ErrorHandler, FactorAnalysisError, DataProcessingError, exception_handler, cache_result, data_fingerprint
 
 class ScoringMethod(ABC):
     """抽象评分方法"""
@@ -243,9 +243,7 @@ class FactorScorer:
             raise AnalysisError(f"未知的评分方法: {method}")
         
         # 尝试从缓存加载
-        cache_key = f"factor_score_{method}_{hash(str(factor_data.values.tobytes()))}"
-        if return_data is not None:
-            cache_key += f"_{hash(str(return_data.values.tobytes()))}"
+        cache_key = f"factor_score_{method}_{data_fingerprint(factor_data, return_data)}"
         
         cached_result = self.cache.get(cache_key)
         if cached_result is not None:
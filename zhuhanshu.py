@@ -181,8 +181,10 @@ def generate_visualizations(results: Dict[str, Any], args):
     # 创建可视化器
     config = ConfigManager(args.config, args.env)
     cache = CacheManager(
-        config.get('cache.memory_size', 100),
-        config.get('cache.disk_size', 1000)
+        memory_size=config.get('cache.memory_size', 100),
+        disk_size=config.get('cache.disk_size', 1000),
+        memory_bytes=config.get('cache.memory_bytes', 256 * 1024 * 1024),
+        disk_bytes=config.get('cache.disk_bytes', 1024 * 1024 * 1024)
     )
     error_handler = ErrorHandler(config)
     
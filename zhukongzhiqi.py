@@ -10,7 +10,8 @@ from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import multiprocessing as mp
 
 # 导入基础系统组件
@@ -50,15 +51,23 @@ import seaborn as sns
 # from optimized_report_generator import ReportGenerator
 
 class AnalysisWorkflow:
-    """分析工作流"""
+    """分析工作流
+    
+    依赖全部完成的任务立即提交到线程池，互不依赖的任务并发执行。每个任务只接收共享数据和它声明的依赖任务的输出：
+    依赖输出以任务ID为键传入，输出为字典时其中的键也直接作为参数传入（多个依赖有同名键时按声明顺序，后者覆盖前者）。
+    每个任务的墙钟时间和CPU时间记录在task_timings中。
+    """
     
     def __init__(self, name: str, config_manager: ConfigManager, 
-                 task_scheduler=None):
+                 task_scheduler=None, max_workers: int = None):
         self.name = name
         self.config = config_manager
         self.scheduler = task_scheduler
+        self.max_workers = max_workers or self.config.get('workflow.max_workers', 4)
         self.tasks = {}
         self.dependencies = {}
+        self.task_timings = {}
+        self.last_run_seconds = None
     
     def add_task(self, task_id: str, task_func: Callable, 
                  dependencies: List[str] = None, **kwargs):
@@ -69,38 +78,101 @@ class AnalysisWorkflow:
         }
         self.dependencies[task_id] = dependencies or []
     
+    def _build_graph(self) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
+        """返回每个任务未完成的依赖数和每个任务的后继任务，依赖未知任务或存在循环依赖时抛出ValueError"""
+        pending = {task_id: len(self.dependencies[task_id]) for task_id in self.tasks}
+        dependents = {task_id: [] for task_id in self.tasks}
+        for task_id in self.tasks:
+            for dep in self.dependencies[task_id]:
+                if dep not in self.tasks:
+                    raise ValueError(f"任务 {task_id} 依赖的任务 {dep} 不存在于工作流 {self.name} 中")
+                dependents[dep].append(task_id)
+        
+        # 拓扑排序检查循环依赖
+        counts = dict(pending)
+        stack = [task_id for task_id, count in counts.items() if count == 0]
+        visited = 0
+        while stack:
+            visited += 1
+            for child in dependents[stack.pop()]:
+                counts[child] -= 1
+                if counts[child] == 0:
+                    stack.append(child)
+        if visited < len(self.tasks):
+            raise ValueError("Circular dependency detected in workflow")
+        return pending, dependents
+    
+    def _task_inputs(self, task_id: str, shared_data: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+        """共享数据加上声明的依赖任务的输出"""
+        task_data = dict(shared_data)
+        for dep in self.dependencies[task_id]:
+            output = results[dep]
+            if isinstance(output, dict):
+                task_data.update(output)
+            task_data[dep] = output
+        return task_data
+    
+    def _run_task(self, task_id: str, task_data: Dict[str, Any]) -> Any:
+        """执行单个任务并记录墙钟时间和所在线程的CPU时间"""
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            return self.tasks[task_id]['func'](**task_data)
+        finally:
+            self.task_timings[task_id] = {
+                'wall_seconds': time.perf_counter() - wall_start,
+                'cpu_seconds': time.thread_time() - cpu_start,
+                'thread': threading.current_thread().name
+            }
+    
     def execute(self, **shared_data) -> Dict[str, Any]:
-        """执行工作流"""
-        # 简化版工作流执行，按依赖顺序执行任务
+        """执行工作流；某个任务失败时不再提交新任务，等待已提交的任务结束后抛出第一个异常"""
+        pending, dependents = self._build_graph()
         results = {}
+        self.task_timings = {}
+        start = time.perf_counter()
         
-        # 获取所有任务
-        all_tasks = set(self.tasks.keys())
-        executed_tasks = set()
-        
-        # 按依赖顺序执行任务
-        while len(executed_tasks) < len(all_tasks):
-            # 找出可以执行的任务（所有依赖都已执行）
-            ready_tasks = []
-            for task_id in all_tasks - executed_tasks:
-                dependencies = self.dependencies[task_id]
-                if all(dep in executed_tasks for dep in dependencies):
-                    ready_tasks.append(task_id)
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix=f"workflow-{self.name}") as executor:
+            running = {}
             
-            if not ready_tasks:
-                raise ValueError("Circular dependency detected in workflow")
+            def submit(task_id):
+                task_data = self._task_inputs(task_id, shared_data, results)
+                running[executor.submit(self._run_task, task_id, task_data)] = task_id
             
-            # 执行准备好的任务
-            for task_id in ready_tasks:
-                task_info = self.tasks[task_id]
-                # 合并共享数据和之前的结果
-                task_data = {**shared_data, **results}
-                # 执行任务
-                result = task_info['func'](**task_data)
-                results[task_id] = result
-                executed_tasks.add(task_id)
-        
+            for task_id, count in pending.items():
+                if count == 0:
+                    submit(task_id)
+            
+            error = None
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_id = running.pop(future)
+                    try:
+                        results[task_id] = future.result()
+                    except Exception as e:
+                        logging.error(f"工作流 {self.name} 的任务 {task_id} 失败: {e}")
+                        error = error or e
+                        continue
+                    if error is None:
+                        for child in dependents[task_id]:
+                            pending[child] -= 1
+                            if pending[child] == 0:
+                                submit(child)
+        
+        self.last_run_seconds = time.perf_counter() - start
+        if error is not None:
+            raise error
         return results
+    
+    def get_task_timings(self) -> Dict[str, Any]:
+        """最近一次执行的任务耗时，以及任务墙钟时间之和与实际总耗时"""
+        return {
+            'tasks': dict(self.task_timings),
+            'sum_task_seconds': sum(timing['wall_seconds'] for timing in self.task_timings.values()),
+            'total_seconds': self.last_run_seconds
+        }
 
 class FactorAnalysisController:
     """因子分析控制器"""
@@ -110,8 +182,10 @@ class FactorAnalysisController:
         # 初始化核心组件
         self.config = ConfigManager(config_path, environment)
         self.cache = CacheManager(
-            self.config.get('cache.memory_size', 100),
-            self.config.get('cache.disk_size', 1000)
+            memory_size=self.config.get('cache.memory_size', 100),
+            disk_size=self.config.get('cache.disk_size', 1000),
+            memory_bytes=self.config.get('cache.memory_bytes', 256 * 1024 * 1024),
+            disk_bytes=self.config.get('cache.disk_bytes', 1024 * 1024 * 1024)
         )
         self.error_handler = ErrorHandler(self.config)
         
@@ -163,11 +237,11 @@ class FactorAnalysisController:
             dependencies=["preprocess_data"]
         )
         
-        # 添加因子评分任务
+        # 添加因子评分任务（只使用预处理后的数据，与因子分析任务并发执行）
         factor_analysis_workflow.add_task(
             "score_factors",
             self._score_factors_task,
-            dependencies=["analyze_factors"]
+            dependencies=["preprocess_data"]
         )
         
         # 添加因子排名任务
@@ -177,11 +251,11 @@ class FactorAnalysisController:
             dependencies=["score_factors"]
         )
         
-        # 添加报告生成任务
+        # 添加报告生成任务（需要预处理后的数据、因子评分和排名）
         factor_analysis_workflow.add_task(
             "generate_report",
             self._generate_report_task,
-            dependencies=["rank_factors"]
+            dependencies=["preprocess_data", "score_factors", "rank_factors"]
         )
         
         self.workflows["factor_analysis"] = factor_analysis_workflow
@@ -475,12 +549,12 @@ class FactorAnalysisController:
     def get_status(self) -> Dict[str, Any]:
         """获取系统状态"""
         return {
-            'config': self.config.get_all(),
-            'cache': {
-                'memory_size': self.cache.memory_cache_size,
-                'disk_size': self.cache.disk_cache_size
-            },
+            'config': self.config.config,
+            'cache': self.cache.get_stats(),
             'workflows': list(self.workflows.keys()),
+            'workflow_timings': {
+                name: workflow.get_task_timings() for name, workflow in self.workflows.items()
+            },
             'analysis_results': {
                 'factor_count': len(self.analysis_results.get('factor_data', {})),
                 'has_return_data': self.analysis_results.get('return_data') is not None,